@@ -0,0 +1,55 @@
+"""
+Acknowledgement of purchase orders in bulk.
+
+The orders are acknowledged with a single `UPDATE`, without loading model
+instances or sending `post_save`; the vendor aggregates, the
+response caches and the metric refresh outbox are updated once per vendor
+instead of once per order, and the change log once for all of them.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import invalidate_vendors
+from .changes import record_changes
+from .models import ChangeLogEntry, PurchaseOrder
+from .utils import lock_rows
+
+
+def acknowledge_purchase_orders(po_numbers, acknowledged_at=None):
+    """
+    Acknowledge the purchase orders that are not acknowledged yet.
+
+    Returns the `(acknowledged, already_acknowledged, not_found)` lists of
+    purchase order numbers, in the order they were given.
+    """
+    po_numbers = list(dict.fromkeys(po_numbers))
+    acknowledged_at = acknowledged_at or timezone.now()
+
+    with transaction.atomic():
+        # Locked so the orders found pending are the ones the update acknowledges.
+        rows = {
+            row['po_number']: row
+            for row in lock_rows(PurchaseOrder.objects.filter(po_number__in=po_numbers))
+            .values('id', 'po_number', *PurchaseOrder.PERFORMANCE_FIELDS)
+        }
+        pending = [row for row in rows.values() if row['acknowledgment_date'] is None]
+        if pending:
+            PurchaseOrder.objects.update_rows(
+                pending,
+                acknowledgment_date=acknowledged_at,
+                updated_at=acknowledged_at,
+            )
+            #NOTE: `update` does not send `post_save`.
+            invalidate_vendors({row['vendor_id'] for row in pending})
+            record_changes(
+                ChangeLogEntry.Kind.PURCHASE_ORDER,
+                ChangeLogEntry.Action.UPDATED,
+                ((row['id'], row['po_number'], row['vendor_id']) for row in pending),
+            )
+
+    pending_numbers = {row['po_number'] for row in pending}
+    return (
+        [po_number for po_number in po_numbers if po_number in pending_numbers],
+        [po_number for po_number in po_numbers if po_number in rows and po_number not in pending_numbers],
+        [po_number for po_number in po_numbers if po_number not in rows],
+    )
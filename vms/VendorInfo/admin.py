@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Vendor, PurchaseOrder, HistoricalPerformance
+from .models import Vendor, PurchaseOrder, HistoricalPerformance, VendorPerformanceAggregate
 
 
 admin.site.register(Vendor)
@@ -41,4 +41,6 @@ class HistoricalPerformanceAdmin(admin.ModelAdmin):
         'average_response_time', 
         'fulfillment_rate',
     )
-    search_fields = ('vendor__name__istartswith')
\ No newline at end of file
+    search_fields = ('vendor__name__istartswith')
+
+admin.site.register(VendorPerformanceAggregate)
@@ -0,0 +1,265 @@
+"""
+Async read endpoints for ASGI deployments.
+
+Under ASGI the DRF viewsets in `VendorInfo.views` each hold a worker thread
+for the whole request. These views serve the same responses natively with
+the async ORM, so a slow client or query only costs a coroutine. They are
+mounted under `async/` with the same paths, query parameters and payloads
+as their synchronous counterparts.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework.authentication import SessionAuthentication, TokenAuthentication
+from rest_framework.exceptions import APIException, AuthenticationFailed
+from rest_framework.pagination import Cursor
+from rest_framework.request import Request
+from rest_framework.status import (
+    HTTP_200_OK,
+    HTTP_400_BAD_REQUEST,
+    HTTP_401_UNAUTHORIZED,
+    HTTP_404_NOT_FOUND,
+)
+
+from .authentication import CachedBasicAuthentication
+from .cache import acached_vendor_response
+from .changes import MAX_LIMIT, changes_since
+from .filters import QueryParameterFilter, only_fields, parse_fields
+from .metrics import METRIC_FIELDS
+from .models import Vendor, PurchaseOrder
+from .pagination import IdCursorPagination
+from .renderers import ORJSONRenderer
+from .rollups import atrend
+from .serializers import VendorSerializer, PurchaseOrderSerializer
+from .views import (
+    VendorViewSet,
+    parse_change_query,
+    parse_expand,
+    parse_po_limit,
+    parse_trend_query,
+    purchase_orders_prefetch,
+)
+
+
+def _authenticate(request):
+    drf_request = Request(request)
+    authenticators = (CachedBasicAuthentication(), SessionAuthentication(), TokenAuthentication())
+    for authentication in authenticators:
+        user_auth = authentication.authenticate(drf_request)
+        if user_auth:
+            return user_auth[0]
+    return None
+
+
+async def authenticate(request):
+    """
+    The user authenticated by the request's token, basic credentials or
+    session, `None` if there are none.
+
+    Raises `AuthenticationFailed` on invalid credentials.
+    """
+    keyword = request.headers.get('Authorization', '').partition(' ')[0].lower()
+    if keyword not in ('basic', 'token') and settings.SESSION_COOKIE_NAME not in request.COOKIES:
+        return None
+    #NOTE: The credential cache, password hashing and the session backend are
+    #synchronous, they run in a worker thread.
+    return await sync_to_async(_authenticate)(request)
+
+
+def render(data, status=HTTP_200_OK):
+    return HttpResponse(
+        ORJSONRenderer().render(data),
+        content_type='application/json',
+        status=status,
+    )
+
+
+class AsyncAPIView(View):
+    """Authenticated read-only JSON view, subclasses implement `handle`."""
+    http_method_names = ['get', 'head', 'options']
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            user = await authenticate(request)
+        except AuthenticationFailed as error:
+            return self.unauthorized(error.detail)
+        if user is None:
+            return self.unauthorized('Authentication credentials were not provided.')
+
+        request.user = user
+        try:
+            return await self.handle(request, *args, **kwargs)
+        except APIException as error:
+            return render(error.detail, error.status_code)
+
+    def unauthorized(self, detail):
+        response = render(dict(detail=detail), HTTP_401_UNAUTHORIZED)
+        response['WWW-Authenticate'] = 'Basic realm="api"'
+        return response
+
+    async def handle(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+
+class VendorListView(AsyncAPIView):
+    """Takes the filters and `?fields=` of `VendorViewSet`, pages are always ordered by id."""
+
+    async def handle(self, request, *args, **kwargs):
+        #NOTE: Pages use the cursors of `IdCursorPagination`, which only ever
+        #carry a position since vendor ids are unique.
+        paginator = IdCursorPagination()
+        drf_request = Request(request)
+        page_size = paginator.get_page_size(drf_request)
+        cursor = paginator.decode_cursor(drf_request)
+        paginator.base_url = request.build_absolute_uri()
+
+        vendors = QueryParameterFilter().filter_queryset(
+            drf_request, Vendor.objects.order_by('id'), VendorViewSet,
+        )
+        fields = parse_fields(request.GET, VendorSerializer().fields)
+        if fields is not None:
+            vendors = only_fields(vendors, VendorSerializer(), fields)
+        if cursor and cursor.reverse:
+            vendors = vendors.filter(id__lt=cursor.position).order_by('-id')
+        elif cursor:
+            vendors = vendors.filter(id__gt=cursor.position)
+        expand = parse_expand(request.GET, default=False)
+        if fields is not None and 'purchase_orders' not in fields:
+            expand = False
+        if expand:
+            vendors = vendors.prefetch_related(purchase_orders_prefetch(parse_po_limit(request.GET)))
+
+        page = [vendor async for vendor in vendors[:page_size + 1]]
+        has_more = len(page) > page_size
+        page = page[:page_size]
+        if cursor and cursor.reverse:
+            page.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, cursor is not None
+
+        next_url = previous_url = None
+        if page and has_next:
+            next_url = paginator.encode_cursor(Cursor(offset=0, reverse=False, position=str(page[-1].id)))
+        if page and has_previous:
+            previous_url = paginator.encode_cursor(Cursor(offset=0, reverse=True, position=str(page[0].id)))
+
+        serializer = VendorSerializer(
+            page,
+            many=True,
+            context=dict(expand_purchase_orders=expand, fields=fields),
+        )
+        return render(dict(next=next_url, previous=previous_url, results=serializer.data))
+
+
+class VendorDetailView(AsyncAPIView):
+    """Takes the `?expand=`, `?po_limit=` and `?fields=` of `VendorViewSet`."""
+
+    @acached_vendor_response('async-vendor-detail')
+    async def handle(self, request, *args, **kwargs):
+        vendors = Vendor.objects.all()
+        fields = parse_fields(request.GET, VendorSerializer().fields)
+        if fields is not None:
+            vendors = only_fields(vendors, VendorSerializer(), fields)
+        try:
+            vendor = await vendors.aget(code=kwargs['code'])
+        except Vendor.DoesNotExist:
+            return render(dict(detail='No Vendor matches the given query.'), HTTP_404_NOT_FOUND)
+
+        expand = parse_expand(request.GET, default=True)
+        if fields is not None and 'purchase_orders' not in fields:
+            expand = False
+        if expand:
+            purchase_orders = PurchaseOrder.objects.filter(vendor=vendor).order_by('-id')
+            po_limit = parse_po_limit(request.GET)
+            if po_limit is not None:
+                purchase_orders = purchase_orders[:po_limit]
+            vendor.purchase_orders = [purchase_order async for purchase_order in purchase_orders]
+            for purchase_order in vendor.purchase_orders:
+                purchase_order.vendor = vendor
+
+        serializer = VendorSerializer(vendor, context=dict(expand_purchase_orders=expand, fields=fields))
+        return render(serializer.data)
+
+
+class PurchaseOrderDetailView(AsyncAPIView):
+    """Takes the `?fields=` of `PurchaseOrderViewSet`."""
+
+    async def handle(self, request, *args, **kwargs):
+        purchase_orders = PurchaseOrder.objects.select_related('vendor')
+        fields = parse_fields(request.GET, PurchaseOrderSerializer().fields)
+        if fields is not None:
+            purchase_orders = only_fields(purchase_orders, PurchaseOrderSerializer(), fields)
+        try:
+            purchase_order = await purchase_orders.aget(po_number=kwargs['po_number'])
+        except PurchaseOrder.DoesNotExist:
+            return render(dict(detail='No PurchaseOrder matches the given query.'), HTTP_404_NOT_FOUND)
+        return render(PurchaseOrderSerializer(purchase_order, context=dict(fields=fields)).data)
+
+
+class VendorPerformanceView(AsyncAPIView):
+
+    @acached_vendor_response('async-vendor-performance')
+    async def handle(self, request, *args, **kwargs):
+        try:
+            granularity, start, end = parse_trend_query(request.GET)
+        except ValueError as error:
+            return render(dict(message=str(error)), HTTP_400_BAD_REQUEST)
+
+        performance = await Vendor.objects.filter(
+            code=kwargs['code'],
+        ).values('id', *METRIC_FIELDS).afirst()
+        if not performance:
+            return render(dict(message='Vendor not found'), HTTP_404_NOT_FOUND)
+
+        vendor_id = performance.pop('id')
+        if granularity:
+            performance['trend'] = await atrend(vendor_id, granularity, start, end)
+        return render(performance)
+
+
+#NOTE: Comment lines keep idle streams from being closed by proxies.
+HEARTBEAT_INTERVAL = 15
+
+
+async def change_events(since, kinds):
+    """Server-sent `change` events of the changes after `since`, until `VMS_CHANGE_STREAM_TIMEOUT`."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.VMS_CHANGE_STREAM_TIMEOUT
+    renderer = ORJSONRenderer()
+    yield b': connected\n\n'
+    sent_at = loop.time()
+    while loop.time() < deadline:
+        page = await sync_to_async(changes_since)(since, MAX_LIMIT, kinds)
+        for change in page['results']:
+            yield b'id: %d\nevent: change\ndata: %s\n\n' % (change['seq'], renderer.render(change))
+            sent_at = loop.time()
+        since = page['next']
+        if page['has_more']:
+            continue
+        if loop.time() - sent_at >= HEARTBEAT_INTERVAL:
+            yield b': keep-alive\n\n'
+            sent_at = loop.time()
+        await asyncio.sleep(settings.VMS_CHANGE_STREAM_POLL_INTERVAL)
+
+
+class ChangeStreamView(AsyncAPIView):
+    """
+    The change feed as server-sent events, one per changed row with its
+    sequence number as the event id. Takes the `?since=` and `?kinds=` of
+    `ChangeFeedViewSet`, reconnecting clients resume from `Last-Event-ID`.
+    """
+
+    async def handle(self, request, *args, **kwargs):
+        try:
+            since, _, kinds = parse_change_query(request.GET, request.headers.get('Last-Event-ID'))
+        except ValueError as error:
+            return render(dict(message=str(error)), HTTP_400_BAD_REQUEST)
+        response = StreamingHttpResponse(change_events(since, kinds), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        #NOTE: Stops nginx from buffering the stream.
+        response['X-Accel-Buffering'] = 'no'
+        return response
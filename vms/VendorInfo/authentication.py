@@ -0,0 +1,100 @@
+"""
+Basic authentication with the verified credentials cached.
+
+A successful verification caches the id of the user under an HMAC of the
+credentials for `VMS_AUTH_CACHE_TIMEOUT` seconds, so later requests with the
+same credentials skip the password hash and only load the user by its
+primary key. The id is cached with the version of the account read before it
+was verified; saving or deleting the user replaces that version (see
+`VendorInfo.signals`), so a changed password or a deactivated account is
+never authenticated from the cache again. Nothing else of the user, e.g. its
+password hash, is cached.
+
+Tokens are not cached: DRF verifies them with the same single query that
+loads the user, so there is nothing to skip.
+
+The versions are replaced by whichever process writes, so with
+`VMS_AUTH_CACHE` left as `None` credentials are only cached when
+`VMS_CACHE_ALIAS` is shared by every process, see `VendorInfo.cache`.
+
+Invalid credentials are not cached and are verified every time.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils.crypto import salted_hmac
+from rest_framework.authentication import BasicAuthentication
+
+from .cache import get_cache, is_shared_cache
+
+
+def _user_version_key(user_id):
+    return f'vms:auth:user-version:{user_id}'
+
+
+def _credentials_key(kind, *credentials):
+    digest = salted_hmac('vms:auth', '\0'.join(credentials), algorithm='sha256').hexdigest()
+    return f'vms:auth:{kind}:{digest}'
+
+
+def auth_cache_enabled():
+    enabled = settings.VMS_AUTH_CACHE
+    return is_shared_cache() if enabled is None else enabled
+
+
+def user_version(user_id):
+    cache = get_cache()
+    key = _user_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # Never reused, so users cached before the counter was evicted are not trusted again.
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_user_version(user_id):
+    cache = get_cache()
+    try:
+        cache.incr(_user_version_key(user_id))
+    except ValueError:
+        cache.set(_user_version_key(user_id), time.time_ns(), timeout=None)
+
+
+def invalidate_user_credentials(user_id):
+    """Stop authenticating the user from the cache once the transaction commits."""
+    transaction.on_commit(lambda: _bump_user_version(user_id))
+
+
+class CachedBasicAuthentication(BasicAuthentication):
+    """`BasicAuthentication` caching the verified credentials, see the module docstring."""
+
+    def authenticate_credentials(self, userid, password, request=None):
+        def verify():
+            return super(CachedBasicAuthentication, self).authenticate_credentials(userid, password, request)
+
+        if not auth_cache_enabled():
+            return verify()
+        User = get_user_model()
+        cache = get_cache()
+        key = _credentials_key('basic', userid, password)
+        cached = cache.get(key)
+        if cached is not None:
+            user_id, version = cached
+            if version == user_version(user_id):
+                user = User._default_manager.filter(pk=user_id, is_active=True).first()
+                if user is not None:
+                    return user, None
+
+        user_id = User._default_manager.filter(**{User.USERNAME_FIELD: userid}).values_list('pk', flat=True).first()
+        if user_id is None:
+            return verify()
+        #NOTE: Read before the verification, so an account change committed
+        #while it runs leaves a version the cached credentials do not match.
+        version = user_version(user_id)
+        user_auth = verify()
+        if user_auth[0].pk == user_id:
+            cache.set(key, (user_id, version), settings.VMS_AUTH_CACHE_TIMEOUT)
+        return user_auth
@@ -0,0 +1,175 @@
+"""Helpers shared by the benchmark management commands."""
+import random
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from .identifiers import generate_unique_identifiers
+from .line_items import rebuild_line_items
+from .metrics import rebuild_aggregates
+from .models import Vendor, PurchaseOrder, HistoricalPerformance
+from .risk import rebuild_risk_features
+from .rollups import rebuild_rollups
+
+
+@contextmanager
+def temporary_database(verbosity=0, name=None):
+    """
+    Run the block against a freshly migrated test database.
+
+    `name` overrides the test database name, e.g. to put an SQLite test
+    database in a file instead of memory.
+    """
+    if name is not None:
+        connection.settings_dict['TEST']['NAME'] = name
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(
+        verbosity=verbosity, 
+        autoclobber=True, 
+        serialize=False,
+    )
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        teardown_test_environment()
+
+
+def seed_synthetic_data(vendors, purchase_orders, history, seed=0, batch_size=5000):
+    """
+    Create `vendors` vendors with `purchase_orders` purchase orders and
+    `history` performance snapshots each, then build the aggregates, rollups
+    and risk features from them.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+
+    codes = generate_unique_identifiers('code', vendors, Vendor.objects.all(), 'code')
+    Vendor.objects.bulk_create(
+        (
+            Vendor(
+                name=f'Vendor {index}', 
+                contact_details=f'vendor{index}@example.com', 
+                address=f'{index} Example Street', 
+                code=code,
+            )
+            for index, code in enumerate(codes)
+        ),
+        batch_size=batch_size,
+    )
+    vendor_ids = list(Vendor.objects.values_list('id', flat=True))
+
+    statuses = [
+        PurchaseOrder.PoStatus.COMPLETED,
+        PurchaseOrder.PoStatus.COMPLETED,
+        PurchaseOrder.PoStatus.PENDING,
+        PurchaseOrder.PoStatus.CANCELLED,
+    ]
+    rows = []
+    for vendor_id in vendor_ids:
+        po_numbers = generate_unique_identifiers(
+            'po_number', purchase_orders, PurchaseOrder.objects.all(), 'po_number',
+        )
+        for po_number in po_numbers:
+            status = rng.choice(statuses)
+            delivery_date = now + timedelta(days=rng.randint(-60, 30))
+            completed = status == PurchaseOrder.PoStatus.COMPLETED
+            rows.append(PurchaseOrder(
+                vendor_id=vendor_id,
+                po_number=po_number,
+                delivery_date=delivery_date,
+                items={'SKU-' + str(rng.randint(1, 500)): rng.randint(1, 20)},
+                quantity=rng.randint(1, 100),
+                status=status,
+                quality_rating=rng.randint(1, 5) if completed else 0.0,
+                acknowledgment_date=now + timedelta(hours=rng.randint(1, 72)) if rng.random() < 0.7 else None,
+                completion_date=delivery_date + timedelta(days=rng.randint(-3, 2)) if completed else None,
+            ))
+        if len(rows) >= batch_size:
+            PurchaseOrder.objects.bulk_create(rows, batch_size=batch_size)
+            rows = []
+    PurchaseOrder.objects.bulk_create(rows, batch_size=batch_size)
+
+    snapshots = []
+    for vendor_id in vendor_ids:
+        for day in range(history):
+            snapshots.append(HistoricalPerformance(
+                vendor_id=vendor_id,
+                date=now - timedelta(days=day),
+                on_time_delivery_rate=rng.uniform(50, 100),
+                quality_rating_avg=rng.uniform(1, 5),
+                average_response_time=rng.uniform(1, 72),
+                fulfillment_rate=rng.uniform(50, 100),
+            ))
+        if len(snapshots) >= batch_size:
+            HistoricalPerformance.objects.bulk_create(snapshots, batch_size=batch_size)
+            snapshots = []
+    HistoricalPerformance.objects.bulk_create(snapshots, batch_size=batch_size)
+
+    for _ in rebuild_line_items(batch_size):
+        pass
+    rebuild_aggregates(vendor_ids)
+    rebuild_rollups(vendor_ids)
+    rebuild_risk_features(vendor_ids)
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(percent / 100 * len(values) + 0.5) - 1))
+    return values[index]
+
+
+@contextmanager
+def count_queries():
+    """Count the statements executed on the default connection, without query logging limits."""
+    queries = []
+
+    def count_query(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count_query):
+        yield queries
+
+
+def measure(func, iterations, prepare=None):
+    """
+    Call `func` `iterations` times and return its latency percentiles (ms),
+    the highest number of queries of a call and the peak memory (KiB)
+    allocated by a call.
+
+    `prepare`, if given, is called untimed before every call and its result
+    passed to `func`.
+    """
+    timings = []
+    most_queries = 0
+    for _ in range(iterations):
+        args = (prepare(),) if prepare else ()
+        with count_queries() as queries:
+            started = time.perf_counter()
+            func(*args)
+            timings.append((time.perf_counter() - started) * 1000)
+        most_queries = max(most_queries, len(queries))
+
+    # Measured separately, tracing allocations distorts the timings.
+    args = (prepare(),) if prepare else ()
+    tracemalloc.start()
+    try:
+        func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return dict(
+        p50_ms=percentile(timings, 50),
+        p99_ms=percentile(timings, 99),
+        queries=most_queries,
+        peak_kib=peak / 1024,
+    )
@@ -0,0 +1,174 @@
+"""
+Read-through cache of vendor responses.
+
+Cached responses are keyed by the vendor code and a per-vendor version that
+is replaced whenever the vendor, its purchase orders or its performance
+history are written (see `VendorInfo.signals`), so stale entries are never
+read again and simply expire.
+
+The versions are replaced by whichever process writes, e.g. a management
+command or the metric refresh worker of another server process, so they must
+live in a cache shared by every process: `VMS_CACHE_ALIAS` should name a
+Redis, Memcached, database or file based cache. `VMS_RESPONSE_CACHE` is on
+by default, which suits the local memory cache of a single server process
+only, and the `VendorInfo.W001` check warns about it; set to `None`,
+responses are not cached at all when `VMS_CACHE_ALIAS` names a local memory
+(or dummy) cache.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from rest_framework.response import Response
+from rest_framework.status import HTTP_200_OK, HTTP_304_NOT_MODIFIED
+
+from .models import Vendor
+
+
+def get_cache():
+    return caches[settings.VMS_CACHE_ALIAS]
+
+
+def is_shared_cache():
+    """Whether the cache is seen by every process, unlike a local memory one."""
+    return not isinstance(get_cache(), (LocMemCache, DummyCache))
+
+
+def response_cache_enabled():
+    enabled = settings.VMS_RESPONSE_CACHE
+    return is_shared_cache() if enabled is None else enabled
+
+
+def _version_key(code):
+    return f'vms:vendor-version:{code}'
+
+
+def vendor_version(code):
+    cache = get_cache()
+    key = _version_key(code)
+    version = cache.get(key)
+    if version is None:
+        # A fresh, never reused version, so entries cached before the counter
+        # was evicted cannot be served again.
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+async def avendor_version(code):
+    cache = get_cache()
+    key = _version_key(code)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+def _bump_versions(codes):
+    cache = get_cache()
+    for code in codes:
+        try:
+            cache.incr(_version_key(code))
+        except ValueError:
+            cache.set(_version_key(code), time.time_ns(), timeout=None)
+
+
+def invalidate_vendor_codes(codes):
+    """Invalidate the cached responses of the vendors once the transaction commits."""
+    codes = set(codes)
+    if codes:
+        transaction.on_commit(lambda: _bump_versions(codes))
+
+
+def invalidate_vendors(vendor_ids):
+    vendor_ids = {vendor_id for vendor_id in vendor_ids if vendor_id is not None}
+    if vendor_ids:
+        invalidate_vendor_codes(
+            Vendor.objects.filter(pk__in=vendor_ids).values_list('code', flat=True)
+        )
+
+
+def _response_key(name, code, version, request):
+    """Cache key and ETag of a response, they vary with the query string."""
+    variant = hashlib.md5(
+        '&'.join(sorted(request.GET.urlencode().split('&'))).encode()
+    ).hexdigest()
+    key = f'vms:response:{name}:{code}:{version}:{variant}'
+    return key, '"{}"'.format(hashlib.md5(key.encode()).hexdigest())
+
+
+def cached_vendor_response(name):
+    """
+    Cache the successful responses of a view method keyed by the `code` URL kwarg.
+
+    Responses carry an ETag derived from the vendor version and the query
+    string; a matching `If-None-Match` is answered with 304 before the view
+    runs or anything is serialized.
+
+    Responses are neither cached nor tagged unless `response_cache_enabled()`.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            if not response_cache_enabled():
+                return method(self, request, *args, **kwargs)
+            code = kwargs['code']
+            key, etag = _response_key(name, code, vendor_version(code), request)
+
+            if etag in parse_etags(request.headers.get('If-None-Match', '')):
+                return Response(status=HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+            cache = get_cache()
+            data = cache.get(key)
+            if data is None:
+                response = method(self, request, *args, **kwargs)
+                if response.status_code != HTTP_200_OK:
+                    return response
+                cache.set(key, response.data, settings.VMS_RESPONSE_CACHE_TIMEOUT)
+            else:
+                response = Response(data, status=HTTP_200_OK)
+            response['ETag'] = etag
+            return response
+        return wrapper
+    return decorator
+
+
+def acached_vendor_response(name):
+    """
+    Async variant of `cached_vendor_response` for views returning JSON
+    `HttpResponse`s, the rendered body is cached.
+    """
+    def decorator(method):
+        @wraps(method)
+        async def wrapper(self, request, *args, **kwargs):
+            if not response_cache_enabled():
+                return await method(self, request, *args, **kwargs)
+            code = kwargs['code']
+            key, etag = _response_key(name, code, await avendor_version(code), request)
+
+            if etag in parse_etags(request.headers.get('If-None-Match', '')):
+                response = HttpResponseNotModified()
+                response['ETag'] = etag
+                return response
+
+            cache = get_cache()
+            content = await cache.aget(key)
+            if content is None:
+                response = await method(self, request, *args, **kwargs)
+                if response.status_code != HTTP_200_OK:
+                    return response
+                await cache.aset(key, response.content, settings.VMS_RESPONSE_CACHE_TIMEOUT)
+            else:
+                response = HttpResponse(content, content_type='application/json')
+            response['ETag'] = etag
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,143 @@
+"""
+Change feed of vendors, purchase orders and performance snapshots.
+
+Every write to them appends a `ChangeLogEntry` in the same transaction:
+instance saves and deletes from `VendorInfo.signals`, bulk writes and metric
+refreshes where they happen. Clients keep the sequence number of the last
+entry they saw and ask for the changes `since` it, with `GET changes` or
+the server-sent events of `async/changes/stream`, instead of polling whole
+listings.
+
+A page holds each changed row once, with the action of its latest entry and
+its current representation, `None` when the row no longer exists.
+
+Sequence numbers are drawn when an entry is inserted, not when its
+transaction commits, so on PostgreSQL a later entry can be visible before
+an earlier one. A client moving past it would never see the earlier one, so
+entries are only served once they are `VMS_CHANGE_SETTLE_SECONDS` old, and a
+page stops at the first one that is not. Entries of transactions still
+writing after that long may be skipped. SQLite runs one write transaction at
+a time, its entries are committed in sequence.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .fastpath import row_serializer
+from .models import ChangeLogEntry, HistoricalPerformance, PurchaseOrder, Vendor
+
+MAX_LIMIT = 1000
+
+KINDS = {
+    ChangeLogEntry.Kind.VENDOR: Vendor,
+    ChangeLogEntry.Kind.PURCHASE_ORDER: PurchaseOrder,
+    ChangeLogEntry.Kind.HISTORICAL_PERFORMANCE: HistoricalPerformance,
+}
+
+
+def record_changes(kind, action, rows):
+    """
+    Log `action` on the `(object_id, key, vendor_id)` rows of `kind`, must
+    run inside the transaction performing the write.
+    """
+    if not settings.VMS_CHANGE_LOG:
+        return
+    ChangeLogEntry.objects.bulk_create(
+        [
+            ChangeLogEntry(kind=kind, action=action, object_id=object_id, key=key, vendor_id=vendor_id)
+            for object_id, key, vendor_id in rows
+        ],
+        batch_size=settings.VMS_BULK_CREATE_BATCH_SIZE,
+    )
+
+
+def record_vendor_changes(vendor_ids):
+    """Log updates of the vendors, e.g. of their metrics with `update()`."""
+    if not settings.VMS_CHANGE_LOG:
+        return
+    record_changes(
+        ChangeLogEntry.Kind.VENDOR,
+        ChangeLogEntry.Action.UPDATED,
+        (
+            (vendor_id, code, vendor_id)
+            for vendor_id, code in Vendor.objects.filter(pk__in=vendor_ids).values_list('id', 'code')
+        ),
+    )
+
+
+def _current(kind, object_ids):
+    """Representation of the rows of `kind` that still exist, by id."""
+    #NOTE: Imported here, the serializers record changes when creating purchase orders.
+    from .serializers import (
+        HistoricalPerformanceSerializer,
+        PurchaseOrderSerializer,
+        VendorSerializer,
+    )
+
+    serializer_class = {
+        ChangeLogEntry.Kind.VENDOR: VendorSerializer,
+        ChangeLogEntry.Kind.PURCHASE_ORDER: PurchaseOrderSerializer,
+        ChangeLogEntry.Kind.HISTORICAL_PERFORMANCE: HistoricalPerformanceSerializer,
+    }[kind]
+    serializer = row_serializer(serializer_class, dict(expand_purchase_orders=False))
+    rows = list(serializer.values(KINDS[kind].objects.filter(pk__in=object_ids), 'id'))
+    return dict(zip((row['id'] for row in rows), serializer.serialize(rows)))
+
+
+def changes_since(since, limit, kinds=None):
+    """
+    The rows changed by the `limit` settled entries after the sequence
+    number `since`, of the `kinds` only if given, and the sequence number to
+    ask for the next changes from.
+    """
+    horizon = timezone.now() - timedelta(seconds=settings.VMS_CHANGE_SETTLE_SECONDS)
+    entries = ChangeLogEntry.objects.filter(id__gt=since).order_by('id')
+    if kinds is not None:
+        entries = entries.filter(kind__in=kinds)
+    entries = list(entries.values('id', 'kind', 'action', 'object_id', 'key', 'changed_at')[:limit + 1])
+    settled = next(
+        (index for index, entry in enumerate(entries) if entry['changed_at'] > horizon),
+        len(entries),
+    )
+    has_more = settled > limit
+    entries = entries[:min(settled, limit)]
+
+    #NOTE: The latest entry of a row wins, clients only need its current state.
+    latest = {}
+    for entry in entries:
+        latest.pop((entry['kind'], entry['object_id']), None)
+        latest[(entry['kind'], entry['object_id'])] = entry
+
+    current = {}
+    for kind in KINDS:
+        object_ids = [
+            object_id for (entry_kind, object_id), entry in latest.items()
+            if entry_kind == kind and entry['action'] != ChangeLogEntry.Action.DELETED
+        ]
+        if object_ids:
+            current[kind] = _current(kind, object_ids)
+
+    return dict(
+        results=[
+            dict(
+                seq=entry['id'],
+                kind=entry['kind'],
+                action=entry['action'],
+                key=entry['key'],
+                changed_at=entry['changed_at'],
+                data=current.get(entry['kind'], {}).get(entry['object_id']),
+            )
+            for entry in latest.values()
+        ],
+        next=entries[-1]['id'] if entries else since,
+        has_more=has_more,
+    )
+
+
+def prune_changes(days):
+    """Delete the entries older than `days` days, returns how many."""
+    deleted, _ = ChangeLogEntry.objects.filter(
+        changed_at__lt=timezone.now() - timedelta(days=days),
+    ).delete()
+    return deleted
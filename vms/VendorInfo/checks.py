@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+from .cache import is_shared_cache
+
+
+@register()
+def check_response_cache(app_configs, **kwargs):
+    """Vendor responses cached in a local memory cache are only invalidated by writes of the same process."""
+    if settings.VMS_RESPONSE_CACHE and not is_shared_cache():
+        return [
+            Warning(
+                'Vendor responses are cached in a local memory cache, writes of other '
+                'processes do not invalidate them.',
+                hint=(
+                    'Fine for a single server process. With several, or with metric refreshes '
+                    'processed by the management command, point VMS_CACHE_ALIAS to a shared '
+                    'cache or set VMS_RESPONSE_CACHE to None.'
+                ),
+                id='VendorInfo.W001',
+            )
+        ]
+    return []
@@ -0,0 +1,121 @@
+"""
+Streaming exports of purchase orders and performance history.
+
+Rows are read with `values_list(...).iterator()` and written out one at a
+time, so memory use does not depend on the size of the export.
+"""
+import csv
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import PurchaseOrder, HistoricalPerformance
+
+PURCHASE_ORDER_COLUMNS = (
+    ('po_number', 'po_number'),
+    ('vendor_code', 'vendor__code'),
+    ('order_date', 'order_date'),
+    ('delivery_date', 'delivery_date'),
+    ('items', 'items'),
+    ('quantity', 'quantity'),
+    ('status', 'status'),
+    ('quality_rating', 'quality_rating'),
+    ('issue_date', 'issue_date'),
+    ('acknowledgment_date', 'acknowledgment_date'),
+    ('completion_date', 'completion_date'),
+)
+
+HISTORICAL_PERFORMANCE_COLUMNS = (
+    ('vendor_code', 'vendor__code'),
+    ('date', 'date'),
+    ('on_time_delivery_rate', 'on_time_delivery_rate'),
+    ('quality_rating_avg', 'quality_rating_avg'),
+    ('average_response_time', 'average_response_time'),
+    ('fulfillment_rate', 'fulfillment_rate'),
+    ('sample_count', 'sample_count'),
+)
+
+
+def purchase_order_rows(vendor_code=None, status=None, start=None, end=None):
+    """Purchase order tuples in `PURCHASE_ORDER_COLUMNS` order, filtered on `order_date`."""
+    purchase_orders = PurchaseOrder.objects.all()
+    if vendor_code:
+        purchase_orders = purchase_orders.filter(vendor__code=vendor_code)
+    if status:
+        purchase_orders = purchase_orders.filter(status=status)
+    if start:
+        purchase_orders = purchase_orders.filter(order_date__gte=start)
+    if end:
+        purchase_orders = purchase_orders.filter(order_date__lt=end)
+    return (
+        purchase_orders.order_by('id')
+        .values_list(*(source for _, source in PURCHASE_ORDER_COLUMNS))
+        .iterator(chunk_size=settings.VMS_EXPORT_CHUNK_SIZE)
+    )
+
+
+def historical_performance_rows(vendor_code=None, start=None, end=None):
+    """Performance snapshot tuples in `HISTORICAL_PERFORMANCE_COLUMNS` order, filtered on `date`."""
+    snapshots = HistoricalPerformance.objects.all()
+    if vendor_code:
+        snapshots = snapshots.filter(vendor__code=vendor_code)
+    if start:
+        snapshots = snapshots.filter(date__gte=start)
+    if end:
+        snapshots = snapshots.filter(date__lt=end)
+    return (
+        snapshots.order_by('id')
+        .values_list(*(source for _, source in HISTORICAL_PERFORMANCE_COLUMNS))
+        .iterator(chunk_size=settings.VMS_EXPORT_CHUNK_SIZE)
+    )
+
+
+class _Echo:
+    """File-like object handing back what the csv writer writes."""
+
+    def write(self, value):
+        return value
+
+
+_encoder = DjangoJSONEncoder()
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if hasattr(value, 'isoformat'):
+        # Same representation as the NDJSON output and the API.
+        return _encoder.default(value)
+    return value
+
+
+def _batched(lines):
+    """Join lines into one chunk per `VMS_EXPORT_CHUNK_SIZE` rows, not one write each."""
+    lines = iter(lines)
+    while chunk := ''.join(islice(lines, settings.VMS_EXPORT_CHUNK_SIZE)):
+        yield chunk
+
+
+def stream_csv(columns, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([name for name, _ in columns])
+    yield from _batched(
+        writer.writerow([_csv_value(value) for value in row]) for row in rows
+    )
+
+
+def stream_ndjson(columns, rows):
+    names = [name for name, _ in columns]
+    yield from _batched(
+        _encoder.encode(dict(zip(names, row))) + '\n' for row in rows
+    )
+
+
+FORMATS = {
+    'csv': (stream_csv, 'text/csv'),
+    'ndjson': (stream_ndjson, 'application/x-ndjson'),
+}
@@ -0,0 +1,157 @@
+"""
+Read-only serialization from `values()` rows.
+
+The fields of a DRF serializer are compiled once into the columns to fetch
+and a function building a row's representation, so reads skip the model
+instances and the per-field machinery of `Serializer.to_representation`.
+The output is the same as the serializer's.
+"""
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from .instrumentation import timed
+from .models import PurchaseOrder
+
+#NOTE: Fields whose representation of a database value is the value itself.
+IDENTITY_FIELDS = (
+    serializers.ReadOnlyField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.IntegerField,
+    serializers.FloatField,
+    serializers.JSONField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+
+def iso_datetime(value, tzinfo):
+    """`DateTimeField.to_representation` of an aware datetime in `tzinfo`."""
+    value = value.astimezone(tzinfo).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def field_converter(field):
+    """
+    `convert(value, tzinfo)` giving the representation of a database value
+    for `field`, `None` when it is the value itself.
+    """
+    if isinstance(field, IDENTITY_FIELDS):
+        return None
+    if (
+        isinstance(field, serializers.DateTimeField)
+        and settings.USE_TZ
+        and not hasattr(field, 'timezone')
+        and getattr(field, 'format', api_settings.DATETIME_FORMAT) == ISO_8601
+    ):
+        #NOTE: The current time zone is looked up once per serialization
+        #instead of once per value.
+        return iso_datetime
+    return lambda value, tzinfo: field.to_representation(value)
+
+
+def compile_row_function(entries):
+    """
+    Function turning a `values()` row and the current time zone into a dict.
+
+    `entries` are `(name, key, convert)` triples: the item `name` of the
+    result is `row[key]`, passed through `convert` with the time zone
+    unless it is `None`.
+    """
+    namespace = {}
+    items = []
+    for index, (name, key, convert) in enumerate(entries):
+        value = f'row[{key!r}]'
+        if convert is not None:
+            namespace[f'convert_{index}'] = convert
+            value = f'(None if {value} is None else convert_{index}({value}, tzinfo))'
+        items.append(f'{name!r}: {value}')
+    source = 'def to_dict(row, tzinfo):\n    return {' + ', '.join(items) + '}\n'
+    exec(compile(source, '<row serializer>', 'exec'), namespace)
+    return namespace['to_dict']
+
+
+class RowSerializer:
+    """
+    The read side of `serializer` over `values()` rows.
+
+    Fields reading the whole instance (source `*`, e.g. method fields) are
+    read from the row under their own name, the caller adds them.
+    """
+
+    def __init__(self, serializer):
+        self.paths = []
+        entries = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if field.source == '*':
+                entries.append((name, name, None))
+                continue
+            path = field.source.replace('.', '__')
+            self.paths.append(path)
+            entries.append((name, path, field_converter(field)))
+        self.to_dict = compile_row_function(entries)
+
+    def values(self, queryset, *extra):
+        """`queryset` as the rows this serializer reads, with the `extra` columns."""
+        return queryset.values(*dict.fromkeys([*self.paths, *extra]))
+
+    @timed('serialize')
+    def serialize(self, rows):
+        to_dict = self.to_dict
+        tzinfo = timezone.get_current_timezone()
+        return [to_dict(row, tzinfo) for row in rows]
+
+
+@lru_cache(maxsize=256)
+def _row_serializer(serializer_class, fields, expand_purchase_orders):
+    return RowSerializer(serializer_class(context=dict(
+        fields=fields,
+        expand_purchase_orders=expand_purchase_orders,
+    )))
+
+
+def row_serializer(serializer_class, context):
+    """Compiled `RowSerializer` of `serializer_class` with the `fields` and `expand_purchase_orders` of `context`."""
+    fields = context.get('fields')
+    return _row_serializer(
+        serializer_class,
+        None if fields is None else frozenset(fields),
+        context.get('expand_purchase_orders', True),
+    )
+
+
+@timed('serialize')
+def purchase_orders_by_vendor(serializer, vendor_ids, po_limit=None):
+    """
+    Newest first serialized purchase orders of the vendors, at most `po_limit` each.
+
+    The representation of `VendorSerializer.purchase_orders`, `serializer` is
+    the `RowSerializer` of `PurchaseOrderSerializer`.
+    """
+    rows = serializer.values(
+        PurchaseOrder.objects.filter(vendor_id__in=vendor_ids).order_by('-id'),
+        'vendor_id',
+    )
+    if po_limit is not None:
+        #NOTE: Annotated after `values()`, Django 4.2 drops window annotations
+        #filtered on from the row before building the dicts otherwise.
+        rows = rows.annotate(
+            vendor_rank=Window(RowNumber(), partition_by=F('vendor_id'), order_by=F('id').desc()),
+        ).filter(vendor_rank__lte=po_limit)
+
+    grouped = defaultdict(list)
+    to_dict = serializer.to_dict
+    tzinfo = timezone.get_current_timezone()
+    for row in rows:
+        grouped[row['vendor_id']].append(to_dict(row, tzinfo))
+    return grouped
@@ -0,0 +1,107 @@
+"""
+Query parameter filtering, ordering and sparse fieldsets of the list endpoints.
+
+Filters and fieldsets are pushed down into the SQL: filters become `WHERE`
+clauses and columns (and joins) no requested field reads are left out of
+the `SELECT` with `.only()`.
+"""
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+
+def number(value):
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError('Must be a number.') from None
+
+
+def choice(values):
+    def parse(value):
+        if value not in values:
+            raise ValueError(f'Must be one of {", ".join(values)}.')
+        return value
+    return parse
+
+
+class QueryParameterFilter(BaseFilterBackend):
+    """
+    Filters on the view's `query_filters`, a mapping of query parameter to
+    `(lookup, parse)`, where `parse` turns the value of the parameter into
+    the value of the lookup or raises `ValueError`.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        lookups = {}
+        errors = {}
+        for param, (lookup, parse) in getattr(view, 'query_filters', {}).items():
+            value = request.query_params.get(param)
+            if not value:
+                continue
+            try:
+                lookups[lookup] = parse(value)
+            except ValueError as error:
+                errors[param] = str(error)
+        if errors:
+            raise ValidationError(errors)
+        return queryset.filter(**lookups)
+
+
+class KeysetOrderingFilter(OrderingFilter):
+    """
+    `?ordering=` on a single field, `IdCursorPagination` pages on it.
+
+    Cursor pagination only keeps the position of the first ordering field,
+    so further fields are ignored.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        return ordering[:1] if ordering else ordering
+
+
+def parse_fields(query_params, available):
+    """
+    Field names asked for with `?fields=a,b`, `None` when all of them are.
+
+    Names prefixed with `-` are left out, e.g. `?fields=-items` is every
+    field but `items`. Raises `ValidationError` on names not in `available`.
+    """
+    fields = query_params.get('fields')
+    if not fields:
+        return None
+    names = [field for field in fields.split(',') if field]
+    included = {name for name in names if not name.startswith('-')}
+    excluded = {name[1:] for name in names if name.startswith('-')}
+    unknown = (included | excluded) - set(available)
+    if unknown:
+        raise ValidationError(dict(fields=f'Unknown fields: {", ".join(sorted(unknown))}.'))
+    return (included or set(available)) - excluded
+
+
+def only_fields(queryset, serializer, fields, always=()):
+    """
+    Defer the columns of `queryset` that the `fields` of `serializer` do not read.
+
+    Relations spanned by the sources of the fields (e.g. `vendor.name`) are
+    joined with `select_related`, the others are not joined at all. Fields
+    reading the whole instance (source `*`) need every column.
+    """
+    paths = set(always)
+    for name in fields:
+        source = serializer.fields[name].source
+        if source == '*':
+            return queryset
+        paths.add(source.replace('.', '__'))
+
+    related = set()
+    for path in paths:
+        relation, _, _ = path.rpartition('__')
+        if relation:
+            related.add(relation)
+    # A relation that is joined must also be loaded.
+    paths |= related
+    queryset = queryset.select_related(None)
+    if related:
+        queryset = queryset.select_related(*related)
+    return queryset.only(*paths)
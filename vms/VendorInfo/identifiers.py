@@ -0,0 +1,178 @@
+"""
+Identifier engines for vendor codes and purchase order numbers.
+
+The engine is selected with the `VMS_IDENTIFIER_ENGINE` setting:
+
+- `RandomIdentifierEngine` draws random identifiers, uniqueness has to be
+  checked against the database before inserting.
+- `SequenceIdentifierEngine` encodes numbers from a database sequence that is
+  handed out to each process in blocks, every value is issued once so no
+  lookup is needed before inserting.
+
+Both produce the `iNRCNW` / `2024Apr-iNRCNW` formats of
+`generate_random_identifier`.
+"""
+import string
+import threading
+from functools import lru_cache
+
+from django.apps import apps
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models import F
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+from django.utils.module_loading import import_string
+
+from .utils import generate_random_identifier
+
+ALPHABET = string.ascii_letters + string.digits
+IDENTIFIER_LENGTH = 6
+KEYSPACE = len(ALPHABET) ** IDENTIFIER_LENGTH
+
+
+@lru_cache
+def _permutation(_for, secret_key):
+    """
+    `(multiplier, offset)` of the identifiers of `_for`, derived from the secret
+    key so each kind of identifier, and each deployment, is shuffled differently.
+
+    The multiplier is coprime with `KEYSPACE` (2**6 * 31**6), so
+    `(value * multiplier + offset) % KEYSPACE` is a bijection that keeps
+    consecutive values from producing similar looking codes. Changing the
+    secret key changes the identifiers issued next, which may then collide
+    with earlier ones; those are drawn again, see `save_with_identifier`.
+    """
+    digest = salted_hmac('vms:identifiers', _for, secret=secret_key, algorithm='sha256').digest()
+    multiplier = int.from_bytes(digest[:8], 'big') % KEYSPACE | 1
+    while multiplier % 31 == 0:
+        multiplier = (multiplier + 2) % KEYSPACE
+    return multiplier, int.from_bytes(digest[8:16], 'big') % KEYSPACE
+
+
+def encode_identifier(_for, value):
+    if not 0 <= value < KEYSPACE:
+        raise ValueError(f'Identifier sequence for {_for} is exhausted')
+
+    multiplier, offset = _permutation(_for, settings.SECRET_KEY)
+    value = (value * multiplier + offset) % KEYSPACE
+    characters = []
+    for _ in range(IDENTIFIER_LENGTH):
+        value, index = divmod(value, len(ALPHABET))
+        characters.append(ALPHABET[index])
+    code = ''.join(characters)
+
+    if _for == 'po_number':
+        now = timezone.now()
+        return f'{now.year}{now.strftime("%b")}-{code}'
+    return code
+
+
+class RandomIdentifierEngine:
+    unique = False
+
+    def generate(self, _for, count=1):
+        return [generate_random_identifier(_for) for _ in range(count)]
+
+    def discard(self, _for):
+        pass
+
+
+class SequenceIdentifierEngine:
+    """
+    Issues identifiers from blocks of a database sequence.
+
+    A block of `VMS_IDENTIFIER_BLOCK_SIZE` values is reserved with a single
+    `UPDATE` per sequence and then handed out from memory, so only one in
+    every block-size saves touches the `IdentifierBlock` table.
+    """
+    unique = True
+
+    def __init__(self, block_size=None):
+        self.block_size = block_size or settings.VMS_IDENTIFIER_BLOCK_SIZE
+        self._blocks = {}
+        self._lock = threading.Lock()
+
+    def generate(self, _for, count=1):
+        values = []
+        with self._lock:
+            while len(values) < count:
+                start, end = self._blocks.get(_for) or self._allocate(
+                    _for, max(self.block_size, count - len(values)),
+                )
+                taken = min(end - start, count - len(values))
+                values.extend(range(start, start + taken))
+                self._blocks[_for] = (start + taken, end) if start + taken < end else None
+        return [encode_identifier(_for, value) for value in values]
+
+    def discard(self, _for):
+        """
+        Drop the reserved block of `_for`.
+
+        Called when an issued identifier turns out to be taken, which can only
+        happen if the reservation was rolled back with an outer transaction or
+        for identifiers created before the engine was enabled.
+        """
+        with self._lock:
+            self._blocks.pop(_for, None)
+
+    def _allocate(self, _for, size):
+        IdentifierBlock = apps.get_model('VendorInfo', 'IdentifierBlock')
+        blocks = IdentifierBlock.objects.filter(name=_for)
+        with transaction.atomic():
+            if not blocks.update(next_value=F('next_value') + size):
+                IdentifierBlock.objects.get_or_create(name=_for)
+                blocks.update(next_value=F('next_value') + size)
+            end = blocks.values_list('next_value', flat=True).get()
+        return end - size, end
+
+
+_engine = None
+
+
+def get_identifier_engine():
+    global _engine
+    if _engine is None:
+        _engine = import_string(settings.VMS_IDENTIFIER_ENGINE)()
+    return _engine
+
+
+@receiver(setting_changed)
+def reset_identifier_engine(setting, **kwargs):
+    global _engine
+    if setting in ('VMS_IDENTIFIER_ENGINE', 'VMS_IDENTIFIER_BLOCK_SIZE'):
+        _engine = None
+
+
+def generate_unique_identifiers(_for, count, queryset, field, chunk_size=500):
+    """
+    Generate `count` distinct identifiers that are not used by `field` yet.
+
+    Engines that issue unique identifiers are trusted as is. Otherwise
+    candidates for the whole batch are checked against the database with a
+    single `IN` lookup per `chunk_size` identifiers, only the few that
+    collide are drawn again.
+    """
+    engine = get_identifier_engine()
+    if engine.unique:
+        return engine.generate(_for, count)
+
+    identifiers = set()
+    while len(identifiers) < count:
+        candidates = set()
+        while len(candidates) < count - len(identifiers):
+            candidate, = engine.generate(_for)
+            if candidate not in identifiers:
+                candidates.add(candidate)
+
+        candidates = list(candidates)
+        for start in range(0, len(candidates), chunk_size):
+            chunk = candidates[start:start + chunk_size]
+            taken = set(
+                queryset.filter(**{f'{field}__in': chunk})
+                .values_list(field, flat=True)
+            )
+            identifiers.update(identifier for identifier in chunk if identifier not in taken)
+    return list(identifiers)
@@ -0,0 +1,244 @@
+"""
+Per-request timing of the API.
+
+`RequestMetricsMiddleware` times every request and breaks the time down
+into database time (and query count), serialization and rendering. The
+breakdown is collected in a context variable, so it follows a request into
+the threads the async ORM runs it in, and aggregated per endpoint into
+histograms served in the Prometheus text format by `metrics_view`.
+
+Phases are exclusive: database time spent while serializing counts as
+database time only.
+
+Sampled requests (`VMS_PROFILE_SAMPLE_RATE`) run under cProfile and the
+profile of those slower than `VMS_PROFILE_THRESHOLD_MS` is dumped to
+`VMS_PROFILE_DIR`.
+
+Metrics are kept per process; streamed response bodies are produced after
+the middleware returns and are not included.
+"""
+import cProfile
+import random
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+
+PHASES = ('db', 'serialize', 'render')
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+_current = ContextVar('vms_request_stats', default=None)
+
+
+class RequestStats:
+    __slots__ = ('queries', 'seconds', 'timing')
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.timing = False
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper installed on every connection, see `VendorInfo.signals`."""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.seconds['db'] += time.perf_counter() - started
+        stats.queries += 1
+
+
+def timed(phase):
+    """
+    Add the time of the decorated function, less the database time within
+    it, to `phase` of the current request. Nested timed calls are counted
+    once, by the outermost.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            stats = _current.get()
+            if stats is None or stats.timing:
+                return func(*args, **kwargs)
+            stats.timing = True
+            db_seconds = stats.seconds['db']
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stats.timing = False
+                stats.seconds[phase] += (
+                    time.perf_counter() - started - (stats.seconds['db'] - db_seconds)
+                )
+        return wrapper
+    return decorator
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Registry:
+    """Histograms per `(metric, endpoint, method)`."""
+
+    METRICS = {
+        'vms_request_duration_seconds': ('Time to produce the response.', DURATION_BUCKETS),
+        'vms_request_db_seconds': ('Time spent executing queries.', DURATION_BUCKETS),
+        'vms_request_serialize_seconds': ('Time spent serializing, besides queries.', DURATION_BUCKETS),
+        'vms_request_render_seconds': ('Time spent rendering the response body.', DURATION_BUCKETS),
+        'vms_request_queries': ('Number of queries executed.', QUERY_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = defaultdict(dict)
+
+    def observe(self, endpoint, method, duration, stats):
+        values = dict(
+            vms_request_duration_seconds=duration,
+            vms_request_db_seconds=stats.seconds['db'],
+            vms_request_serialize_seconds=stats.seconds['serialize'],
+            vms_request_render_seconds=stats.seconds['render'],
+            vms_request_queries=stats.queries,
+        )
+        with self._lock:
+            for name, value in values.items():
+                histograms = self._histograms[name]
+                histogram = histograms.get((endpoint, method))
+                if histogram is None:
+                    histogram = histograms[endpoint, method] = Histogram(self.METRICS[name][1])
+                histogram.observe(value)
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def exposition(self):
+        """The histograms in the Prometheus text format."""
+        lines = []
+        with self._lock:
+            for name, (help_text, buckets) in self.METRICS.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for (endpoint, method), histogram in sorted(self._histograms[name].items()):
+                    labels = f'endpoint="{endpoint}",method="{method}"'
+                    for bound, count in zip(buckets, histogram.counts):
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+                    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                    lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+                    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def endpoint_name(request):
+    match = request.resolver_match
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route
+
+
+class RequestMetricsMiddleware:
+    """Times requests into `registry`, see the module docstring."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        profiler = self.start_profiler()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            duration = time.perf_counter() - started
+            if profiler is not None:
+                profiler.disable()
+            _current.reset(token)
+        self.finish(request, duration, stats, profiler)
+        return response
+
+    async def __acall__(self, request):
+        #NOTE: Not profiled, cProfile only sees the event loop thread.
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            duration = time.perf_counter() - started
+            _current.reset(token)
+        self.finish(request, duration, stats)
+        return response
+
+    def start_profiler(self):
+        rate = settings.VMS_PROFILE_SAMPLE_RATE
+        if not rate or random.random() >= rate:
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active (e.g. on another thread on Python 3.12+).
+            return None
+        return profiler
+
+    def finish(self, request, duration, stats, profiler=None):
+        endpoint = endpoint_name(request)
+        registry.observe(endpoint, request.method, duration, stats)
+        if profiler is not None and duration * 1000 >= settings.VMS_PROFILE_THRESHOLD_MS:
+            directory = settings.VMS_PROFILE_DIR
+            directory.mkdir(parents=True, exist_ok=True)
+            stamp = timezone.now().strftime('%Y%m%dT%H%M%S%f')
+            profiler.dump_stats(directory / f'{endpoint}-{request.method}-{stamp}.prof')
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint, only served with the `VMS_METRICS_TOKEN`
+    bearer token or to staff users logged in to a session.
+    """
+    #NOTE: Not gated on the client address, behind a proxy every request comes from the proxy.
+    keyword, _, token = request.headers.get('Authorization', '').partition(' ')
+    authorized = (
+        bool(settings.VMS_METRICS_TOKEN)
+        and keyword.lower() == 'bearer'
+        and constant_time_compare(token, settings.VMS_METRICS_TOKEN)
+    ) or request.user.is_staff
+    if not authorized:
+        raise Http404
+    return HttpResponse(registry.exposition(), content_type='text/plain; version=0.0.4')
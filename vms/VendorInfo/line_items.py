@@ -0,0 +1,106 @@
+"""
+Line items normalized from `PurchaseOrder.items`.
+
+`items` is free-form JSON. A mapping of SKU to a quantity (`{"SKU-1": 3}`)
+or to an object with a `quantity` and a `unit_price`, or a list of such
+objects with a `sku`, is stored as `PurchaseOrderLineItem` rows in the same
+transaction as the purchase order when `VMS_LINE_ITEMS` is on. Items of any
+other shape have no line items.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from .models import PurchaseOrder, PurchaseOrderLineItem
+
+SKU_MAX_LENGTH = PurchaseOrderLineItem._meta.get_field('sku').max_length
+
+
+def _quantity(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return None
+
+
+def _price(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+
+def parse_line_items(items):
+    """`(sku, quantity, unit_price)` of the SKUs in `items`, the last entry of a repeated SKU wins."""
+    if isinstance(items, dict):
+        entries = items.items()
+    elif isinstance(items, list):
+        entries = [(entry.get('sku'), entry) for entry in items if isinstance(entry, dict)]
+    else:
+        return []
+
+    line_items = {}
+    for sku, value in entries:
+        if not isinstance(sku, str) or not sku or len(sku) > SKU_MAX_LENGTH:
+            continue
+        if isinstance(value, dict):
+            line_items[sku] = (sku, _quantity(value.get('quantity')), _price(value.get('unit_price')))
+        else:
+            line_items[sku] = (sku, _quantity(value), None)
+    return list(line_items.values())
+
+
+def _line_items(rows):
+    for purchase_order_id, items in rows:
+        for sku, quantity, unit_price in parse_line_items(items):
+            yield PurchaseOrderLineItem(
+                purchase_order_id=purchase_order_id,
+                sku=sku,
+                quantity=quantity,
+                unit_price=unit_price,
+            )
+
+
+def sync_line_items(purchase_orders, created=False):
+    """
+    Replace the line items of the saved purchase orders with those of their
+    `items`. `created` skips deleting the line items of new purchase orders.
+    """
+    if not settings.VMS_LINE_ITEMS:
+        return
+    if not created:
+        PurchaseOrderLineItem.objects.filter(
+            purchase_order_id__in=[purchase_order.pk for purchase_order in purchase_orders],
+        ).delete()
+    PurchaseOrderLineItem.objects.bulk_create(
+        _line_items((purchase_order.pk, purchase_order.items) for purchase_order in purchase_orders),
+        batch_size=settings.VMS_BULK_CREATE_BATCH_SIZE,
+    )
+
+
+def rebuild_line_items(chunk_size=2000):
+    """
+    Replace the line items of every purchase order, `chunk_size` purchase
+    orders per transaction, e.g. to backfill them after turning on
+    `VMS_LINE_ITEMS`. Yields the number of purchase orders processed so far.
+    """
+    processed = 0
+    last_id = 0
+    while True:
+        rows = list(
+            PurchaseOrder.objects.filter(id__gt=last_id).order_by('id')
+            .values_list('id', 'items')[:chunk_size]
+        )
+        if not rows:
+            return
+        with transaction.atomic():
+            PurchaseOrderLineItem.objects.filter(
+                purchase_order_id__gte=rows[0][0], purchase_order_id__lte=rows[-1][0],
+            ).delete()
+            PurchaseOrderLineItem.objects.bulk_create(
+                _line_items(rows), batch_size=settings.VMS_BULK_CREATE_BATCH_SIZE,
+            )
+        processed += len(rows)
+        last_id = rows[-1][0]
+        yield processed
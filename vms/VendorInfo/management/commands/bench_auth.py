@@ -0,0 +1,69 @@
+import time
+from base64 import b64encode
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework.authentication import BasicAuthentication, SessionAuthentication
+from rest_framework.views import APIView
+
+from VendorInfo.authentication import CachedBasicAuthentication
+from VendorInfo.bench import seed_synthetic_data, temporary_database
+from VendorInfo.cache import get_cache
+from VendorInfo.models import PurchaseOrder
+
+MODES = {
+    'stock': (BasicAuthentication, SessionAuthentication),
+    'cached': (CachedBasicAuthentication, SessionAuthentication),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure purchase order requests per second of CPU time, i.e. per core, '
+        'authenticated with basic credentials, using DRF\'s authentication class '
+        'and the cached one of `VendorInfo.authentication`, '
+        'on a test database seeded with synthetic data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendors', type=int, default=10)
+        parser.add_argument('--purchase-orders', type=int, default=50, help='Per vendor.')
+        parser.add_argument('--seconds', type=float, default=2.0, help='CPU time per case.')
+
+    def handle(self, *args, **options):
+        #NOTE: A single process, the local memory cache sees every version bump.
+        with temporary_database(), override_settings(VMS_METRIC_REFRESH_MODE='manual', VMS_AUTH_CACHE=True):
+            seed_synthetic_data(options['vendors'], options['purchase_orders'], 0)
+            User.objects.create_user('bench', password='bench')
+            authorization = 'Basic ' + b64encode(b'bench:bench').decode()
+            po_number = PurchaseOrder.objects.values_list('po_number', flat=True).first()
+            routes = {
+                'purchase-order-list': '/api/vendors/vendor-purchase-order?page_size=20',
+                'purchase-order-detail': f'/api/vendors/vendor-purchase-order/{po_number}',
+            }
+
+            self.stdout.write(f'{"route":<24}{"stock req/s":>14}{"cached req/s":>14}{"speedup":>10}')
+            for route, path in routes.items():
+                rates = [
+                    self.requests_per_second(MODES[mode], path, authorization, options['seconds'])
+                    for mode in ('stock', 'cached')
+                ]
+                self.stdout.write(f'{route:<24}{rates[0]:>14.1f}{rates[1]:>14.1f}{rates[1] / rates[0]:>9.1f}x')
+
+    def requests_per_second(self, authentication_classes, path, authorization, seconds):
+        get_cache().clear()
+        client = Client(HTTP_AUTHORIZATION=authorization)
+        #NOTE: Views read their authentication classes from `APIView` when they
+        #are declared, so the setting cannot be overridden.
+        with mock.patch.object(APIView, 'authentication_classes', authentication_classes):
+            requests = 0
+            started = time.process_time()
+            while requests < 3 or time.process_time() - started < seconds:
+                response = client.get(path)
+                if response.status_code != 200:
+                    raise CommandError(f'{path}: {response.status_code} {response.content[:200]!r}')
+                requests += 1
+            return requests / (time.process_time() - started)
@@ -0,0 +1,61 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from VendorInfo.bench import measure, seed_synthetic_data, temporary_database
+from VendorInfo.cache import get_cache
+from VendorInfo.models import Vendor
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare fetching the performance of N vendors with N sequential '
+        '`vendor-performance/<code>/performance` calls and with one '
+        '`vendor-performance/compare` call, on a test database seeded with '
+        'synthetic data. Responses are not served from the cache.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendors', type=int, default=500)
+        parser.add_argument('--purchase-orders', type=int, default=20, help='Per vendor.')
+        parser.add_argument('--iterations', type=int, default=10)
+        parser.add_argument('--size', type=int, action='append', dest='sizes', help='Vendors per comparison.')
+
+    def handle(self, *args, **options):
+        sizes = options['sizes'] or [10, 100, 500]
+        with temporary_database(), override_settings(VMS_METRIC_REFRESH_MODE='manual'):
+            seed_synthetic_data(options['vendors'], options['purchase_orders'], 0)
+            client = APIClient()
+            client.force_authenticate(User.objects.create_user('bench', password='bench'))
+
+            def get(path):
+                response = client.get(path)
+                if response.status_code != 200:
+                    raise CommandError(f'{path}: {response.status_code} {response.content[:200]!r}')
+                return response
+
+            def sequential(codes):
+                for code in codes:
+                    get(f'/api/vendors/vendor-performance/{code}/performance')
+
+            def batch(codes):
+                get(f'/api/vendors/vendor-performance/compare?vendors={",".join(codes)}')
+
+            self.stdout.write(
+                f'{"vendors":>8}{"sequential p50 ms":>20}{"queries":>9}'
+                f'{"compare p50 ms":>17}{"queries":>9}{"speedup":>10}'
+            )
+            for size in sizes:
+                codes = list(Vendor.objects.order_by('id').values_list('code', flat=True)[:size])
+
+                def prepare():
+                    get_cache().clear()
+                    return codes
+
+                results = [measure(func, options['iterations'], prepare) for func in (sequential, batch)]
+                self.stdout.write(
+                    f'{len(codes):>8}{results[0]["p50_ms"]:>20.2f}{results[0]["queries"]:>9}'
+                    f'{results[1]["p50_ms"]:>17.2f}{results[1]["queries"]:>9}'
+                    f'{results[0]["p50_ms"] / results[1]["p50_ms"]:>9.1f}x'
+                )
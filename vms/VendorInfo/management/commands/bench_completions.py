@@ -0,0 +1,104 @@
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from VendorInfo.bench import percentile, temporary_database
+from VendorInfo.metrics import rebuild_aggregates, verify_aggregates
+from VendorInfo.models import PurchaseOrder, Vendor
+from VendorInfo.worker import process_metric_refreshes
+
+MODES = {
+    #NOTE: What `PurchaseOrder.save` did before reading the previous state under a lock.
+    'loaded': lambda purchase_order: purchase_order._loaded_performance_state,
+    'locked': PurchaseOrder._previous_performance_state,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure concurrent completions of the purchase orders of one vendor, each '
+        'completed by two threads at once, with the previous state of the purchase '
+        'order taken from the loaded instance and read under a lock, and count the '
+        'aggregates left differing from a full recompute.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--purchase-orders', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"mode":<8}{"completions/s":>15}{"p50 ms":>10}{"p99 ms":>10}{"errors":>8}{"mismatches":>12}'
+        )
+        for mode, previous_state in MODES.items():
+            with temporary_database(), override_settings(VMS_METRIC_REFRESH_MODE='manual'):
+                with mock.patch.object(PurchaseOrder, '_previous_performance_state', previous_state):
+                    self.run(mode, options)
+
+    def run(self, mode, options):
+        vendor = Vendor.objects.create(name='Vendor', contact_details='-', address='-')
+        PurchaseOrder.objects.bulk_create(
+            PurchaseOrder(
+                vendor=vendor,
+                po_number=f'PO-{index}',
+                delivery_date=timezone.now() + timedelta(days=index % 3 - 1),
+                quantity=1,
+            )
+            for index in range(options['purchase_orders'])
+        )
+        rebuild_aggregates([vendor.pk])
+        ids = list(PurchaseOrder.objects.order_by('id').values_list('id', flat=True))
+        #NOTE: Threads open their own connections, the main one must not hold a transaction.
+        connection.close()
+
+        pairs = max(options['threads'] // 2, 1)
+        barrier = threading.Barrier(options['threads'])
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+
+        def complete(thread_index):
+            timings = []
+            failed = 0
+            try:
+                barrier.wait()
+                for pk in ids[thread_index % pairs::pairs]:
+                    started = time.perf_counter()
+                    try:
+                        purchase_order = PurchaseOrder.objects.get(pk=pk)
+                        purchase_order.status = PurchaseOrder.PoStatus.COMPLETED
+                        purchase_order.quality_rating = 1 + thread_index % 5
+                        purchase_order.save()
+                    except OperationalError:
+                        failed += 1
+                        continue
+                    timings.append((time.perf_counter() - started) * 1000)
+            finally:
+                connection.close()
+            with lock:
+                latencies.extend(timings)
+                errors.append(failed)
+
+        threads = [
+            threading.Thread(target=complete, args=(index,))
+            for index in range(options['threads'])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        process_metric_refreshes(window=0)
+        mismatches = verify_aggregates([vendor.pk])
+        self.stdout.write(
+            f'{mode:<8}{len(latencies) / elapsed:>15.1f}{percentile(latencies, 50):>10.2f}'
+            f'{percentile(latencies, 99):>10.2f}{sum(errors):>8}{len(mismatches):>12}'
+        )
@@ -0,0 +1,102 @@
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from VendorInfo.bench import percentile, temporary_database
+from VendorInfo.models import Vendor, PurchaseOrder
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure purchase order write throughput with concurrent writer threads '
+        'on a fresh test database of the configured backend. On SQLite it is '
+        'run once with SQLite defaults and once with `VMS_SQLITE_PRAGMAS`, each '
+        'on its own database file.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--writes', type=int, default=200, help='Per thread.')
+        parser.add_argument('--vendors', type=int, default=10)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"mode":<12}{"writes/s":>10}{"p50 ms":>10}{"p99 ms":>10}{"errors":>8}'
+        )
+        if connection.vendor != 'sqlite':
+            with temporary_database():
+                self.run(connection.vendor, options)
+            return
+
+        directory = Path(tempfile.mkdtemp())
+        try:
+            for mode, pragmas in (('sqlite', {}), ('sqlite-tuned', settings.VMS_SQLITE_PRAGMAS)):
+                with override_settings(VMS_SQLITE_PRAGMAS=pragmas):
+                    connection.close()
+                    with temporary_database(name=str(directory / f'{mode}.sqlite3')):
+                        self.run(mode, options)
+        finally:
+            connection.close()
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def run(self, mode, options):
+        with override_settings(VMS_METRIC_REFRESH_MODE='manual'):
+            vendor_ids = [
+                Vendor.objects.create(name=f'Vendor {index}', contact_details='-', address='-').pk
+                for index in range(options['vendors'])
+            ]
+            #NOTE: Threads open their own connections, the main one must not hold a transaction.
+            connection.close()
+
+            latencies = []
+            errors = []
+            lock = threading.Lock()
+            delivery_date = timezone.now() + timedelta(days=7)
+
+            def write(thread_index):
+                timings = []
+                failed = 0
+                try:
+                    for index in range(options['writes']):
+                        vendor_id = vendor_ids[(thread_index + index) % len(vendor_ids)]
+                        started = time.perf_counter()
+                        try:
+                            PurchaseOrder.objects.create(
+                                vendor_id=vendor_id,
+                                delivery_date=delivery_date,
+                                quantity=1,
+                            )
+                        except OperationalError:
+                            failed += 1
+                            continue
+                        timings.append((time.perf_counter() - started) * 1000)
+                finally:
+                    connection.close()
+                with lock:
+                    latencies.extend(timings)
+                    errors.append(failed)
+
+            threads = [
+                threading.Thread(target=write, args=(index,))
+                for index in range(options['threads'])
+            ]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f'{mode:<12}{len(latencies) / elapsed:>10.1f}{percentile(latencies, 50):>10.2f}'
+            f'{percentile(latencies, 99):>10.2f}{sum(errors):>8}'
+        )
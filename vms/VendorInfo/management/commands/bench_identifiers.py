@@ -0,0 +1,69 @@
+import time
+
+from django.db import connection
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from VendorInfo.bench import temporary_database
+from VendorInfo.models import Vendor
+from VendorInfo.utils import generate_random_identifier
+
+ENGINES = {
+    'random': 'VendorInfo.identifiers.RandomIdentifierEngine',
+    'sequence': 'VendorInfo.identifiers.SequenceIdentifierEngine',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure vendor save throughput of each identifier engine on a test '
+        'database seeded with existing vendors.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--existing', type=int, default=1_000_000)
+        parser.add_argument('--saves', type=int, default=2000)
+        parser.add_argument(
+            '--engine', 
+            action='append', 
+            dest='engines', 
+            choices=sorted(ENGINES),
+        )
+
+    def handle(self, *args, **options):
+        with temporary_database():
+            self.seed(options['existing'])
+            for name in options['engines'] or sorted(ENGINES):
+                with override_settings(VMS_IDENTIFIER_ENGINE=ENGINES[name]):
+                    self.measure(name, options['saves'])
+
+    def seed(self, count):
+        self.stdout.write(f'Seeding {count} vendors...')
+        codes = set()
+        while len(codes) < count:
+            codes.add(generate_random_identifier('code'))
+        codes = list(codes)
+        for start in range(0, count, 10000):
+            Vendor.objects.bulk_create(
+                Vendor(name='Vendor', contact_details='-', address='-', code=code)
+                for code in codes[start:start + 10000]
+            )
+
+    def measure(self, name, saves):
+        queries = []
+
+        def count_query(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_query):
+            started = time.perf_counter()
+            for _ in range(saves):
+                Vendor.objects.create(name='Vendor', contact_details='-', address='-')
+            elapsed = time.perf_counter() - started
+        lookups = sum(1 for sql in queries if sql.lstrip().upper().startswith('SELECT'))
+        self.stdout.write(
+            f'{name:>10}: {saves / elapsed:10.1f} saves/s, '
+            f'{len(queries) / saves:.2f} queries/save, '
+            f'{lookups / saves:.2f} lookups/save'
+        )
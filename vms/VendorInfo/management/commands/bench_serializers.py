@@ -0,0 +1,114 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+
+from VendorInfo.bench import seed_synthetic_data, temporary_database
+from VendorInfo.fastpath import purchase_orders_by_vendor, row_serializer
+from VendorInfo.models import Vendor, PurchaseOrder, HistoricalPerformance
+from VendorInfo.renderers import ORJSONRenderer, orjson
+from VendorInfo.serializers import (
+    VendorSerializer,
+    PurchaseOrderSerializer,
+    HistoricalPerformanceSerializer,
+)
+
+
+def drf_vendors():
+    vendors = Vendor.objects.order_by('id').prefetch_related('purchaseorder_set')
+    for vendor in vendors:
+        vendor.purchase_orders = sorted(
+            vendor.purchaseorder_set.all(), key=lambda purchase_order: -purchase_order.id,
+        )
+        for purchase_order in vendor.purchase_orders:
+            purchase_order.vendor = vendor
+    return JSONRenderer().render(VendorSerializer(vendors, many=True).data)
+
+
+def fast_vendors():
+    serializer = row_serializer(VendorSerializer, {})
+    rows = list(serializer.values(Vendor.objects.order_by('id')))
+    purchase_orders = purchase_orders_by_vendor(
+        row_serializer(PurchaseOrderSerializer, {}), [row['id'] for row in rows],
+    )
+    for row in rows:
+        row['purchase_orders'] = purchase_orders.get(row['id'], [])
+    return ORJSONRenderer().render(serializer.serialize(rows))
+
+
+def drf_purchase_orders():
+    purchase_orders = PurchaseOrder.objects.order_by('id').select_related('vendor')
+    return JSONRenderer().render(PurchaseOrderSerializer(purchase_orders, many=True).data)
+
+
+def fast_purchase_orders():
+    serializer = row_serializer(PurchaseOrderSerializer, {})
+    rows = serializer.values(PurchaseOrder.objects.order_by('id'))
+    return ORJSONRenderer().render(serializer.serialize(rows))
+
+
+def drf_history():
+    snapshots = HistoricalPerformance.objects.order_by('id')
+    return JSONRenderer().render(HistoricalPerformanceSerializer(snapshots, many=True).data)
+
+
+def fast_history():
+    serializer = row_serializer(HistoricalPerformanceSerializer, {})
+    rows = serializer.values(HistoricalPerformance.objects.order_by('id'))
+    return ORJSONRenderer().render(serializer.serialize(rows))
+
+
+CASES = {
+    'vendors-expanded': (drf_vendors, fast_vendors),
+    'purchase-orders': (drf_purchase_orders, fast_purchase_orders),
+    'historical-performance': (drf_history, fast_history),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the time to serialize and render every vendor (with its '
+        'purchase orders), purchase order and performance snapshot with the '
+        'DRF serializers and with the compiled row serializers of '
+        '`VendorInfo.fastpath`, on a test database seeded with synthetic data. '
+        'Fails when their output differs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendors', type=int, default=100)
+        parser.add_argument('--purchase-orders', type=int, default=1000, help='Per vendor.')
+        parser.add_argument('--history', type=int, default=1000, help='Snapshots per vendor.')
+        parser.add_argument('--iterations', type=int, default=3)
+        parser.add_argument('--case', action='append', dest='cases', choices=CASES)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson is not installed, rendering with json.'))
+
+        with temporary_database(), override_settings(VMS_METRIC_REFRESH_MODE='manual'):
+            self.stdout.write('Seeding synthetic data...')
+            seed_synthetic_data(
+                options['vendors'],
+                options['purchase_orders'],
+                options['history'],
+            )
+            self.stdout.write(f'{"case":<26}{"DRF s":>10}{"fast s":>10}{"speedup":>10}{"MiB":>8}')
+            for name in options['cases'] or CASES:
+                drf, fast = CASES[name]
+                drf_seconds, expected = self.best_of(drf, options['iterations'])
+                fast_seconds, content = self.best_of(fast, options['iterations'])
+                if content != expected:
+                    raise CommandError(f'{name}: the fast path output differs from the serializer output')
+                self.stdout.write(
+                    f'{name:<26}{drf_seconds:>10.3f}{fast_seconds:>10.3f}'
+                    f'{drf_seconds / fast_seconds:>9.1f}x{len(content) / 2 ** 20:>8.1f}'
+                )
+
+    def best_of(self, func, iterations):
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            content = func()
+            timings.append(time.perf_counter() - started)
+        return min(timings), content
@@ -0,0 +1,282 @@
+import json
+import random
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from VendorInfo import risk
+from VendorInfo.bench import measure, seed_synthetic_data, temporary_database
+from VendorInfo.cache import get_cache
+from VendorInfo.models import Vendor, PurchaseOrder
+
+#NOTE: Query budgets do not depend on the amount of data, exceeding them usually means an N+1.
+#They are upper bounds, e.g. delivery-risk reads fewer batches when the riskiest vendors fill the page.
+#They include the statements of an identifier block reservation, see `VendorInfo.identifiers`.
+#Latency and memory budgets are per call and deliberately loose, tighten them with --budgets
+#for a known machine and data size.
+DEFAULT_BUDGETS = {
+    'vendor-list': dict(queries=1, p99_ms=100, peak_kib=2048),
+    'vendor-list-expanded': dict(queries=2, p99_ms=250, peak_kib=8192),
+    'vendor-create': dict(queries=6, p99_ms=50, peak_kib=512),
+    'vendor-detail': dict(queries=2, p99_ms=250, peak_kib=8192),
+    'vendor-update': dict(queries=5, p99_ms=250, peak_kib=8192),
+    'vendor-destroy': dict(queries=11, p99_ms=100, peak_kib=1024),
+    'purchase-order-list': dict(queries=1, p99_ms=100, peak_kib=2048),
+    'purchase-orders-by-sku': dict(queries=1, p99_ms=100, peak_kib=2048),
+    'purchase-order-create': dict(queries=13, p99_ms=50, peak_kib=512),
+    'purchase-order-bulk': dict(queries=14, p99_ms=500, peak_kib=8192),
+    'purchase-order-detail': dict(queries=1, p99_ms=25, peak_kib=512),
+    'purchase-order-update': dict(queries=8, p99_ms=50, peak_kib=512),
+    'purchase-order-destroy': dict(queries=9, p99_ms=50, peak_kib=512),
+    'vendor-performance': dict(queries=1, p99_ms=25, peak_kib=512),
+    'vendor-performance-trend': dict(queries=2, p99_ms=50, peak_kib=1024),
+    'vendor-performance-compare': dict(queries=1, p99_ms=50, peak_kib=1024),
+    'purchase-order-acknowledgement': dict(queries=8, p99_ms=50, peak_kib=512),
+    'purchase-order-acknowledgements': dict(queries=8, p99_ms=250, peak_kib=2048),
+    'vendor-ranking': dict(queries=2, p99_ms=50, peak_kib=512),
+    'vendor-ranking-bottom': dict(queries=3, p99_ms=50, peak_kib=512),
+    'vendor-rank': dict(queries=3, p99_ms=50, peak_kib=512),
+    #NOTE: The overdue purchase orders, the two queries of the risk levels, up to two per batch,
+    #the rows and the count.
+    'delivery-risk': dict(queries=5 + 2 * risk.MAX_BATCHES, p99_ms=100, peak_kib=2048),
+    'change-feed': dict(queries=4, p99_ms=100, peak_kib=2048),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every API route on a test database seeded with synthetic '
+        'data: p50/p99 latency, query count and peak memory per call. Fails '
+        'when a route exceeds its budget.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendors', type=int, default=50)
+        parser.add_argument('--purchase-orders', type=int, default=200, help='Per vendor.')
+        parser.add_argument('--history', type=int, default=365, help='Snapshots per vendor.')
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--route', action='append', dest='routes', help='Only run this route.')
+        parser.add_argument(
+            '--budgets',
+            help='JSON file of {"route": {"queries": n, "p99_ms": n, "peak_kib": n}} overrides.',
+        )
+        parser.add_argument(
+            '--warm-cache',
+            action='store_true',
+            help='Keep the response cache between calls instead of measuring cold reads.',
+        )
+
+    def handle(self, *args, **options):
+        budgets = {name: dict(budget) for name, budget in DEFAULT_BUDGETS.items()}
+        if options['budgets']:
+            with open(options['budgets']) as budget_file:
+                for name, budget in json.load(budget_file).items():
+                    budgets.setdefault(name, {}).update(budget)
+
+        with temporary_database(), override_settings(VMS_METRIC_REFRESH_MODE='manual'):
+            self.stdout.write('Seeding synthetic data...')
+            seed_synthetic_data(
+                options['vendors'],
+                options['purchase_orders'],
+                options['history'],
+            )
+            client = APIClient()
+            client.force_authenticate(User.objects.create_user('benchmark'))
+            routes = self.routes(client)
+
+            unknown = set(options['routes'] or ()) - set(routes)
+            if unknown:
+                raise CommandError(f'Unknown route(s): {", ".join(sorted(unknown))}')
+
+            failures = []
+            self.stdout.write(
+                f'{"route":<32}{"p50 ms":>10}{"p99 ms":>10}{"queries":>10}{"peak KiB":>12}'
+            )
+            for name, (func, prepare) in routes.items():
+                if options['routes'] and name not in options['routes']:
+                    continue
+                if not options['warm_cache']:
+                    func = self.cold(func)
+                result = measure(func, options['iterations'], prepare)
+                self.stdout.write(
+                    f'{name:<32}{result["p50_ms"]:>10.2f}{result["p99_ms"]:>10.2f}'
+                    f'{result["queries"]:>10}{result["peak_kib"]:>12.1f}'
+                )
+                for metric, limit in budgets.get(name, {}).items():
+                    if result[metric] > limit:
+                        failures.append(f'{name}: {metric} {result[metric]:.2f} > {limit}')
+
+        if failures:
+            raise CommandError('Budgets exceeded:\n' + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('All routes within budget.'))
+
+    def cold(self, func):
+        def call(*args):
+            get_cache().clear()
+            return func(*args)
+        return call
+
+    def routes(self, client):
+        """Map route names to `(func, prepare)` pairs for `measure`."""
+        rng = random.Random(0)
+        vendor = Vendor.objects.order_by('id').first()
+        codes = ','.join(Vendor.objects.order_by('id').values_list('code', flat=True)[:50])
+        purchase_order = PurchaseOrder.objects.filter(vendor=vendor).order_by('id').first()
+
+        def new_vendor():
+            return Vendor.objects.create(name='Benchmark', contact_details='-', address='-')
+
+        def new_purchase_order():
+            return PurchaseOrder.objects.create(
+                vendor=vendor,
+                delivery_date=timezone.now() + timedelta(days=7),
+                quantity=1,
+            )
+
+        def purchase_order_data():
+            return dict(
+                vendor=vendor.pk,
+                delivery_date=(timezone.now() + timedelta(days=rng.randint(1, 30))).isoformat(),
+                items={'SKU-1': 1},
+                quantity=rng.randint(1, 100),
+            )
+
+        def check(response, status):
+            if response.status_code != status:
+                raise CommandError(f'{response.request["PATH_INFO"]} returned {response.status_code}')
+            return response
+
+        return {
+            'vendor-list': (
+                lambda: check(client.get('/api/vendors/vendor'), 200), None,
+            ),
+            'vendor-list-expanded': (
+                lambda: check(client.get('/api/vendors/vendor?expand=purchase_orders&po_limit=10'), 200), None,
+            ),
+            'vendor-create': (
+                lambda: check(client.post(
+                    '/api/vendors/vendor',
+                    dict(name='Benchmark', contact_details='-', address='-'),
+                    format='json',
+                ), 201),
+                None,
+            ),
+            'vendor-detail': (
+                lambda: check(client.get(f'/api/vendors/vendor/{vendor.code}'), 200), None,
+            ),
+            'vendor-update': (
+                lambda: check(client.patch(
+                    f'/api/vendors/vendor/{vendor.code}',
+                    dict(address=f'{rng.randint(1, 999)} Example Street'),
+                    format='json',
+                ), 200),
+                None,
+            ),
+            'vendor-destroy': (
+                lambda new: check(client.delete(f'/api/vendors/vendor/{new.code}'), 204),
+                new_vendor,
+            ),
+            'purchase-order-list': (
+                lambda: check(client.get('/api/vendors/vendor-purchase-order'), 200), None,
+            ),
+            'purchase-orders-by-sku': (
+                lambda: check(client.get(
+                    '/api/vendors/vendor-purchase-order?sku=SKU-1&fields=-items'
+                ), 200),
+                None,
+            ),
+            'purchase-order-create': (
+                lambda data: check(client.post(
+                    '/api/vendors/vendor-purchase-order', data, format='json',
+                ), 201),
+                purchase_order_data,
+            ),
+            'purchase-order-bulk': (
+                lambda rows: check(client.post(
+                    '/api/vendors/vendor-purchase-order/bulk', rows, format='json',
+                ), 201),
+                lambda: [purchase_order_data() for _ in range(100)],
+            ),
+            'purchase-order-detail': (
+                lambda: check(client.get(
+                    f'/api/vendors/vendor-purchase-order/{purchase_order.po_number}'
+                ), 200),
+                None,
+            ),
+            'purchase-order-update': (
+                lambda new: check(client.patch(
+                    f'/api/vendors/vendor-purchase-order/{new.po_number}',
+                    dict(status='COMPLETED', quality_rating=rng.randint(1, 5)),
+                    format='json',
+                ), 200),
+                new_purchase_order,
+            ),
+            'purchase-order-destroy': (
+                lambda new: check(client.delete(
+                    f'/api/vendors/vendor-purchase-order/{new.po_number}'
+                ), 204),
+                new_purchase_order,
+            ),
+            'vendor-performance': (
+                lambda: check(client.get(
+                    f'/api/vendors/vendor-performance/{vendor.code}/performance'
+                ), 200),
+                None,
+            ),
+            'vendor-performance-trend': (
+                lambda: check(client.get(
+                    f'/api/vendors/vendor-performance/{vendor.code}/performance?granularity=week'
+                ), 200),
+                None,
+            ),
+            'vendor-performance-compare': (
+                lambda: check(client.get(f'/api/vendors/vendor-performance/compare?vendors={codes}'), 200),
+                None,
+            ),
+            'purchase-order-acknowledgement': (
+                lambda new: check(client.patch(
+                    f'/api/vendors/vendor-performance/{new.po_number}/acknowledgement',
+                    dict(acknowledged=True),
+                    format='json',
+                ), 200),
+                new_purchase_order,
+            ),
+            'purchase-order-acknowledgements': (
+                lambda po_numbers: check(client.post(
+                    '/api/vendors/vendor-performance/acknowledgements',
+                    dict(po_numbers=po_numbers),
+                    format='json',
+                ), 200),
+                lambda: [new_purchase_order().po_number for _ in range(100)],
+            ),
+            'vendor-ranking': (
+                lambda: check(client.get(
+                    '/api/vendors/vendor-performance/ranking?metric=on_time_delivery_rate&limit=10'
+                ), 200),
+                None,
+            ),
+            'vendor-ranking-bottom': (
+                lambda: check(client.get(
+                    '/api/vendors/vendor-performance/ranking?metric=quality_rating_avg&order=bottom&limit=10'
+                ), 200),
+                None,
+            ),
+            'vendor-rank': (
+                lambda: check(client.get(
+                    f'/api/vendors/vendor-performance/ranking?metric=fulfillment_rate&vendor={vendor.code}'
+                ), 200),
+                None,
+            ),
+            'delivery-risk': (
+                lambda: check(client.get('/api/vendors/vendor-performance/delivery-risk?limit=50'), 200),
+                None,
+            ),
+            'change-feed': (
+                lambda: check(client.get('/api/vendors/changes?limit=100'), 200),
+                None,
+            ),
+        }
@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from VendorInfo.models import Vendor
+from VendorInfo.retention import compact_history, retention_tiers, table_size
+
+
+def _size(size):
+    if size['bytes'] is None:
+        return f'{size["rows"]} row(s)'
+    return f'{size["rows"]} row(s), {size["bytes"] / 1024:.1f} KiB'
+
+
+class Command(BaseCommand):
+    help = (
+        'Compact the performance snapshots under the `VMS_HISTORY_RETENTION` policy, '
+        'archiving the replaced ones to gzipped NDJSON. SQLite keeps the freed pages '
+        'in the database file for reuse until it is vacuumed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--vendor',
+            action='append',
+            dest='codes',
+            help='Only process the vendor with this code (can be repeated).',
+        )
+        parser.add_argument(
+            '--archive-dir',
+            help='Directory of the archive, `VMS_HISTORY_ARCHIVE_DIR` by default.',
+        )
+        parser.add_argument(
+            '--no-archive',
+            action='store_false',
+            dest='archive',
+            help='Delete the replaced snapshots without archiving them.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Snapshots processed per transaction.',
+        )
+
+    def handle(self, *args, **options):
+        vendor_ids = None
+        if options['codes']:
+            vendor_ids = list(
+                Vendor.objects.filter(code__in=options['codes'])
+                .values_list('id', flat=True)
+            )
+            if len(vendor_ids) != len(set(options['codes'])):
+                raise CommandError('One or more vendor codes do not exist.')
+        try:
+            retention_tiers()
+        except ValueError as error:
+            raise CommandError(f'VMS_HISTORY_RETENTION: {error}')
+        if options['chunk_size'] < 2:
+            raise CommandError('--chunk-size must be at least 2.')
+
+        before = table_size()
+        result = compact_history(
+            vendor_ids,
+            archive=options['archive'],
+            archive_dir=options['archive_dir'],
+            chunk_size=options['chunk_size'],
+        )
+        after = table_size()
+
+        self.stdout.write(f'Before: {_size(before)}')
+        self.stdout.write(f'After:  {_size(after)}')
+        if result['archive']:
+            self.stdout.write(f'Archived {result["archived"]} snapshot(s) to {result["archive"]}')
+        self.stdout.write(self.style.SUCCESS(f'Compacted {result["replaced"]} snapshot(s).'))
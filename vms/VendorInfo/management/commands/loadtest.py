@@ -0,0 +1,159 @@
+import asyncio
+import secrets
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from VendorInfo.bench import percentile
+from VendorInfo.models import Vendor, PurchaseOrder
+
+#NOTE: Async routes live under `async/` with the same paths, see `VendorInfo.async_views`.
+VARIANTS = {
+    'sync': '/api/vendors/',
+    'async': '/api/vendors/async/',
+}
+
+ROUTES = {
+    'vendor-list': 'vendor',
+    'vendor-detail': 'vendor/{vendor}',
+    'purchase-order-detail': 'vendor-purchase-order/{purchase_order}',
+    'vendor-performance': 'vendor-performance/{vendor}/performance',
+}
+
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response, return its status code."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Connection closed by the server')
+    status = int(status_line.split()[1])
+
+    headers = {}
+    while (line := await reader.readline()) not in (b'\r\n', b''):
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get('transfer-encoding') == 'chunked':
+        while size := int((await reader.readline()).split(b';')[0], 16):
+            await reader.readexactly(size + 2)
+        await reader.readline()
+    else:
+        await reader.readexactly(int(headers.get('content-length', 0)))
+    if headers.get('connection', '').lower() == 'close':
+        raise ConnectionResetError('Server closed the connection')
+    return status
+
+
+async def connection(host, port, request, count, timeout, latencies, statuses):
+    """Send `count` requests one after the other over a keep-alive connection."""
+    reader = writer = None
+    try:
+        for _ in range(count):
+            if writer is None:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+            start = time.perf_counter()
+            try:
+                writer.write(request)
+                status = await asyncio.wait_for(read_response(reader), timeout)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as error:
+                statuses[type(error).__name__] += 1
+                writer.close()
+                reader = writer = None
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[status] += 1
+    except (OSError, asyncio.TimeoutError) as error:
+        statuses[type(error).__name__] += 1
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+async def run(url, headers, connections, requests, timeout):
+    parts = urlsplit(url)
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    request = (
+        f'GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\n'
+        + ''.join(f'{name}: {value}\r\n' for name, value in headers.items())
+        + '\r\n'
+    ).encode('latin-1')
+
+    latencies, statuses = [], Counter()
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        connection(parts.hostname, parts.port or 80, request, requests, timeout, latencies, statuses)
+        for _ in range(connections)
+    ))
+    return latencies, statuses, time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = (
+        'Load test the synchronous and async read routes of a running server '
+        'with many concurrent keep-alive connections, reporting throughput, '
+        'tail latency and errors. Run it once against the WSGI deployment and '
+        'once against the ASGI one to compare them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--connections', type=int, default=1000)
+        parser.add_argument('--requests', type=int, default=10, help='Per connection.')
+        parser.add_argument('--timeout', type=float, default=30, help='Seconds per request.')
+        parser.add_argument('--variant', action='append', dest='variants', choices=VARIANTS)
+        parser.add_argument('--route', action='append', dest='routes', choices=ROUTES)
+        parser.add_argument(
+            '--token',
+            help=(
+                'API token authenticating the requests, defaults to a token of a user '
+                'without a password created for the run and deleted after it.'
+            ),
+        )
+        parser.add_argument('--vendor', help='Vendor code, defaults to the first vendor.')
+
+    def handle(self, *args, **options):
+        vendors = Vendor.objects.order_by('id')
+        if options['vendor']:
+            vendors = vendors.filter(code=options['vendor'])
+        vendor = vendors.first()
+        purchase_order = PurchaseOrder.objects.filter(vendor=vendor).order_by('id').first()
+        if vendor is None or purchase_order is None:
+            raise CommandError('Needs a vendor with purchase orders, see `seed_synthetic_data`.')
+
+        if options['token']:
+            self.load_test(vendor, purchase_order, options['token'], options)
+            return
+        user = User.objects.create_user(f'loadtest-{secrets.token_hex(4)}')
+        try:
+            self.load_test(vendor, purchase_order, Token.objects.create(user=user).key, options)
+        finally:
+            #NOTE: Along with its token, so no credentials outlive the run.
+            user.delete()
+
+    def load_test(self, vendor, purchase_order, token, options):
+        headers = {'Authorization': f'Token {token}'}
+        self.stdout.write(
+            f'{"variant":<8}{"route":<24}{"req/s":>10}{"p50 ms":>10}{"p99 ms":>10}'
+            f'{"max ms":>10}  statuses'
+        )
+        for variant in options['variants'] or VARIANTS:
+            for route in options['routes'] or ROUTES:
+                path = ROUTES[route].format(vendor=vendor.code, purchase_order=purchase_order.po_number)
+                latencies, statuses, elapsed = asyncio.run(run(
+                    options['base_url'].rstrip('/') + VARIANTS[variant] + path,
+                    headers,
+                    options['connections'],
+                    options['requests'],
+                    options['timeout'],
+                ))
+                if not latencies:
+                    raise CommandError(f'{variant} {route}: no successful requests {dict(statuses)}')
+                self.stdout.write(
+                    f'{variant:<8}{route:<24}{len(latencies) / elapsed:>10.1f}'
+                    f'{percentile(latencies, 50):>10.1f}{percentile(latencies, 99):>10.1f}'
+                    f'{max(latencies):>10.1f}  {dict(statuses)}'
+                )
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from VendorInfo.worker import process_metric_refreshes, retry_failed_metric_refreshes
+
+
+class Command(BaseCommand):
+    help = (
+        'Process pending vendor metric refresh requests, once or continuously '
+        'as a dedicated worker.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Process every pending request without waiting for its coalescing window.',
+        )
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Retry the requests given up on after VMS_METRIC_REFRESH_MAX_ATTEMPTS failures.',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and process requests as they become due.',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Maximum number of seconds to sleep between rounds with --loop.',
+        )
+
+    def handle(self, *args, **options):
+        window = 0 if options['all'] else None
+        if options['retry_failed']:
+            retried = retry_failed_metric_refreshes()
+            self.stdout.write(f'Retrying {retried} failed metric refresh requests.')
+        while True:
+            delay = process_metric_refreshes(window=window)
+            if not options['loop']:
+                break
+            time.sleep(options['poll_interval'] if delay is None else min(delay, options['poll_interval']))
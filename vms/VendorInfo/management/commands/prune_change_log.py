@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from VendorInfo.changes import prune_changes
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete the change log entries older than --days. Clients further '
+        'behind than that must re-read the listings before following the feed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30)
+
+    def handle(self, *args, **options):
+        deleted = prune_changes(options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} change log entr{"y" if deleted == 1 else "ies"}.'))
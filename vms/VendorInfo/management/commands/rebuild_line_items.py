@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from VendorInfo.line_items import rebuild_line_items
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the purchase order line items from the purchase order items, '
+        'e.g. to backfill them after turning on `VMS_LINE_ITEMS`.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Purchase orders processed per transaction.',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.VMS_LINE_ITEMS:
+            raise CommandError('VMS_LINE_ITEMS is off.')
+        processed = 0
+        for processed in rebuild_line_items(options['chunk_size']):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{processed} purchase order(s)')
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the line items of {processed} purchase order(s).'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from VendorInfo.models import PerformanceRollup, Vendor
+from VendorInfo.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily, weekly and monthly performance rollups from the snapshots.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--vendor',
+            action='append',
+            dest='codes',
+            help='Only process the vendor with this code (can be repeated).',
+        )
+
+    def handle(self, *args, **options):
+        vendor_ids = None
+        if options['codes']:
+            vendor_ids = list(
+                Vendor.objects.filter(code__in=options['codes'])
+                .values_list('id', flat=True)
+            )
+            if len(vendor_ids) != len(set(options['codes'])):
+                raise CommandError('One or more vendor codes do not exist.')
+
+        rebuild_rollups(vendor_ids)
+        rollups = PerformanceRollup.objects.all()
+        if vendor_ids is not None:
+            rollups = rollups.filter(vendor_id__in=vendor_ids)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rollups.count()} rollup(s).'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from VendorInfo.models import Vendor
+from VendorInfo.risk import rebuild_risk_features
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the delivery risk features of every vendor, e.g. to backfill '
+        'them, they are otherwise refreshed with the vendor metrics.'
+    )
+
+    def handle(self, *args, **options):
+        rebuild_risk_features()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the risk features of {Vendor.objects.count()} vendor(s).'))
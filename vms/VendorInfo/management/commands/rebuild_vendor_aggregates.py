@@ -0,0 +1,67 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from VendorInfo.metrics import rebuild_aggregates, rebuild_all_aggregates, verify_aggregates
+from VendorInfo.models import Vendor
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the vendor performance aggregates from the purchase orders '
+        'and verify them against a full recompute.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--vendor',
+            action='append',
+            dest='codes',
+            help='Only process the vendor with this code (can be repeated).',
+        )
+        parser.add_argument(
+            '--verify-only',
+            action='store_true',
+            help='Do not rebuild, only report aggregates that drifted.',
+        )
+        parser.add_argument(
+            '--skip-verify',
+            action='store_true',
+            help='Do not compare the rebuilt aggregates with a full recompute.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Vendors rebuilt per query and transaction when rebuilding every vendor.',
+        )
+
+    def handle(self, *args, **options):
+        vendor_ids = None
+        if options['codes']:
+            vendor_ids = list(
+                Vendor.objects.filter(code__in=options['codes'])
+                .values_list('id', flat=True)
+            )
+            if len(vendor_ids) != len(set(options['codes'])):
+                raise CommandError('One or more vendor codes do not exist.')
+
+        if not options['verify_only']:
+            if vendor_ids is None:
+                rebuilt = 0
+                started = time.perf_counter()
+                for rebuilt in rebuild_all_aggregates(options['chunk_size']):
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f'{rebuilt} vendor(s) in {time.perf_counter() - started:.1f}s')
+            else:
+                rebuilt = rebuild_aggregates(vendor_ids)
+            self.stdout.write(f'Rebuilt aggregates for {rebuilt} vendor(s).')
+            if options['skip_verify']:
+                return
+
+        mismatches = verify_aggregates(vendor_ids)
+        for code, field, stored, expected in mismatches:
+            self.stderr.write(f'{code}: {field} is {stored}, expected {expected}')
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} aggregate value(s) do not match.')
+        self.stdout.write(self.style.SUCCESS('Aggregates match a full recompute.'))
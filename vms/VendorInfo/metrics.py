@@ -0,0 +1,266 @@
+"""
+Vendor performance metrics.
+
+Every purchase order contributes a fixed set of counters to its vendor's
+`VendorPerformanceAggregate`. Writes apply the difference between the old and
+new contribution of the order, and the `Vendor` metric columns are derived
+from the counters by the refresh worker (see `VendorInfo.worker`), so reading
+the metrics never scans purchase orders.
+"""
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .cache import invalidate_vendors
+from .changes import record_vendor_changes
+from .models import Vendor, PurchaseOrder, VendorPerformanceAggregate
+from .utils import increment_or_create, lock_rows
+
+AGGREGATE_FIELDS = (
+    'total_po_count',
+    'completed_po_count',
+    'on_time_po_count',
+    'rated_po_count',
+    'quality_rating_total',
+    'acknowledged_po_count',
+    'response_time_total',
+)
+
+METRIC_FIELDS = (
+    'on_time_delivery_rate',
+    'quality_rating_avg',
+    'average_response_time',
+    'fulfillment_rate',
+)
+
+
+def purchase_order_contribution(state):
+    """Counters a single purchase order adds to its vendor's aggregate."""
+    contribution = dict.fromkeys(AGGREGATE_FIELDS, 0)
+    if not state:
+        return contribution
+
+    contribution['total_po_count'] = 1
+    if state['status'] == PurchaseOrder.PoStatus.COMPLETED:
+        contribution['completed_po_count'] = 1
+        completion_date = state['completion_date']
+        if completion_date and completion_date <= state['delivery_date']:
+            contribution['on_time_po_count'] = 1
+        if state['quality_rating']:
+            contribution['rated_po_count'] = 1
+            contribution['quality_rating_total'] = state['quality_rating']
+
+    if state['acknowledgment_date'] and state['issue_date']:
+        response_time = state['acknowledgment_date'] - state['issue_date']
+        contribution['acknowledged_po_count'] = 1
+        contribution['response_time_total'] = response_time.total_seconds() / 3600
+    return contribution
+
+
+def refresh_vendor_metrics(vendor_ids):
+    """Copy the metrics derived from the aggregates onto the `Vendor` rows."""
+    with transaction.atomic():
+        #NOTE: Locked so a concurrent purchase order write cannot change the aggregates
+        #between reading them and writing the metrics, the latest counters always win.
+        aggregates = lock_rows(VendorPerformanceAggregate.objects.filter(vendor_id__in=vendor_ids))
+        for aggregate in aggregates:
+            Vendor.objects.filter(pk=aggregate.vendor_id).update(
+                **aggregate.metrics(),
+                updated_at=timezone.now(),
+            )
+    #NOTE: `update` does not send `post_save`.
+    invalidate_vendors(vendor_ids)
+    record_vendor_changes(vendor_ids)
+
+
+def record_purchase_order_changes(changes):
+    """
+    Apply purchase order writes to the vendor aggregates.
+
+    `changes` is an iterable of `(previous_state, current_state)` pairs as
+    returned by `PurchaseOrder.performance_state`, `None` standing for a row
+    that did not exist before or no longer exists. Must run inside the
+    transaction performing the write.
+    """
+    from .worker import enqueue_metric_refresh
+
+    deltas = defaultdict(lambda: dict.fromkeys(AGGREGATE_FIELDS, 0))
+    for previous_state, current_state in changes:
+        if previous_state:
+            delta = deltas[previous_state['vendor_id']]
+            for field, value in purchase_order_contribution(previous_state).items():
+                delta[field] -= value
+        if current_state:
+            delta = deltas[current_state['vendor_id']]
+            for field, value in purchase_order_contribution(current_state).items():
+                delta[field] += value
+
+    for vendor_id, delta in deltas.items():
+        increment_or_create(VendorPerformanceAggregate, dict(vendor_id=vendor_id), delta)
+    enqueue_metric_refresh(deltas)
+
+
+def compute_aggregates(vendor_ids=None):
+    """
+    Recompute the aggregate counters from scratch with one grouped query.
+
+    Returns a mapping of vendor id to counters for every vendor that has
+    purchase orders.
+    """
+    queryset = PurchaseOrder.objects.all()
+    if vendor_ids is not None:
+        queryset = queryset.filter(vendor_id__in=vendor_ids)
+    return _grouped_aggregates(queryset)
+
+
+def _grouped_aggregates(queryset):
+    completed = Q(status=PurchaseOrder.PoStatus.COMPLETED)
+    rated = completed & ~Q(quality_rating=0)
+    acknowledged = Q(acknowledgment_date__isnull=False)
+
+    rows = (
+        queryset.order_by()
+        .values('vendor_id')
+        .annotate(
+            total_po_count=Count('id'),
+            completed_po_count=Count('id', filter=completed),
+            on_time_po_count=Count(
+                'id',
+                filter=completed & Q(completion_date__lte=F('delivery_date')),
+            ),
+            rated_po_count=Count('id', filter=rated),
+            quality_rating_total=Sum('quality_rating', filter=rated),
+            acknowledged_po_count=Count('id', filter=acknowledged),
+            response_time_total=Sum(
+                F('acknowledgment_date') - F('issue_date'),
+                filter=acknowledged,
+            ),
+        )
+    )
+
+    aggregates = {}
+    for row in rows:
+        vendor_id = row.pop('vendor_id')
+        row['quality_rating_total'] = row['quality_rating_total'] or 0.0
+        response_time = row['response_time_total']
+        row['response_time_total'] = (
+            response_time.total_seconds() / 3600 if response_time else 0.0
+        )
+        aggregates[vendor_id] = row
+    return aggregates
+
+
+def store_aggregates(vendor_ids, computed):
+    """
+    Replace the aggregates and metrics of the vendors with `computed`,
+    vendors missing from it have no purchase orders.
+    """
+    #NOTE: One `update` per row, `bulk_update` spends more time building its
+    #CASE expressions than the database spends running them.
+    existing = set(
+        VendorPerformanceAggregate.objects.filter(vendor_id__in=vendor_ids)
+        .values_list('vendor_id', flat=True)
+    )
+    created = []
+    now = timezone.now()
+    for vendor_id in vendor_ids:
+        aggregate = VendorPerformanceAggregate(
+            vendor_id=vendor_id,
+            **computed.get(vendor_id, dict.fromkeys(AGGREGATE_FIELDS, 0)),
+        )
+        if vendor_id in existing:
+            VendorPerformanceAggregate.objects.filter(vendor_id=vendor_id).update(
+                **{field: getattr(aggregate, field) for field in AGGREGATE_FIELDS}
+            )
+        else:
+            created.append(aggregate)
+        Vendor.objects.filter(pk=vendor_id).update(**aggregate.metrics(), updated_at=now)
+
+    VendorPerformanceAggregate.objects.bulk_create(
+        created, batch_size=settings.VMS_BULK_CREATE_BATCH_SIZE,
+    )
+    #NOTE: `update` does not send `post_save`.
+    invalidate_vendors(vendor_ids)
+    record_vendor_changes(vendor_ids)
+
+
+def rebuild_aggregates(vendor_ids=None):
+    """Replace the stored aggregates with a full recompute."""
+    if vendor_ids is None:
+        vendor_ids = list(Vendor.objects.values_list('id', flat=True))
+    computed = compute_aggregates(vendor_ids)
+    with transaction.atomic():
+        store_aggregates(vendor_ids, computed)
+    return len(vendor_ids)
+
+
+def rebuild_all_aggregates(chunk_size=1000):
+    """
+    Replace the stored aggregates of every vendor with a full recompute,
+    `chunk_size` vendors at a time.
+
+    Each chunk is counted by one grouped query over the purchase orders of
+    a range of vendor ids and written in its own transaction, so memory and
+    lock time are bounded by the chunk whatever the number of purchase
+    orders. Yields the number of vendors rebuilt so far after each chunk.
+    """
+    rebuilt = 0
+    last_id = 0
+    while True:
+        vendor_ids = list(
+            Vendor.objects.filter(id__gt=last_id).order_by('id')
+            .values_list('id', flat=True)[:chunk_size]
+        )
+        if not vendor_ids:
+            return
+        computed = _grouped_aggregates(
+            PurchaseOrder.objects.filter(vendor_id__gte=vendor_ids[0], vendor_id__lte=vendor_ids[-1])
+        )
+        with transaction.atomic():
+            store_aggregates(vendor_ids, computed)
+        rebuilt += len(vendor_ids)
+        last_id = vendor_ids[-1]
+        yield rebuilt
+
+
+def verify_aggregates(vendor_ids=None):
+    """
+    Compare the stored aggregates and vendor metrics with a full recompute.
+
+    Returns a list of `(vendor_code, field, stored, expected)` mismatches.
+    """
+    vendors = Vendor.objects.all()
+    if vendor_ids is not None:
+        vendors = vendors.filter(pk__in=vendor_ids)
+    vendors = list(vendors)
+    vendor_ids = [vendor.pk for vendor in vendors]
+    computed = compute_aggregates(vendor_ids)
+    #NOTE: Read on their own, an aggregate built with `vendor=` would replace the
+    #stored one in the vendor's `performance_aggregate` cache.
+    aggregates = VendorPerformanceAggregate.objects.filter(vendor_id__in=vendor_ids).in_bulk(field_name='vendor_id')
+
+    mismatches = []
+    for vendor in vendors:
+        expected = VendorPerformanceAggregate(
+            vendor_id=vendor.pk,
+            **computed.get(vendor.pk, dict.fromkeys(AGGREGATE_FIELDS, 0)),
+        )
+        stored = aggregates.get(vendor.pk) or VendorPerformanceAggregate(vendor_id=vendor.pk)
+
+        for field in AGGREGATE_FIELDS:
+            if not _same(getattr(stored, field), getattr(expected, field)):
+                mismatches.append(
+                    (vendor.code, field, getattr(stored, field), getattr(expected, field))
+                )
+        for field, value in expected.metrics().items():
+            if not _same(getattr(vendor, field), value):
+                mismatches.append((vendor.code, field, getattr(vendor, field), value))
+    return mismatches
+
+
+def _same(stored, expected):
+    return math.isclose(stored, expected, rel_tol=1e-9, abs_tol=1e-6)
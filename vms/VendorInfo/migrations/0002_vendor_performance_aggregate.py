@@ -0,0 +1,70 @@
+# Generated by Django 4.2.11 on 2026-10-18 16:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import F
+
+
+def backfill_aggregates(apps, schema_editor):
+    PurchaseOrder = apps.get_model('VendorInfo', 'PurchaseOrder')
+    VendorPerformanceAggregate = apps.get_model('VendorInfo', 'VendorPerformanceAggregate')
+
+    # The completion time of existing orders was never recorded, the last
+    # update is the closest approximation available.
+    PurchaseOrder.objects.filter(status='COMPLETED').update(completion_date=F('updated_at'))
+
+    aggregates = {}
+    purchase_orders = PurchaseOrder.objects.values_list(
+        'vendor_id', 'status', 'delivery_date', 'completion_date',
+        'quality_rating', 'issue_date', 'acknowledgment_date',
+    )
+    for (vendor_id, status, delivery_date, completion_date,
+            quality_rating, issue_date, acknowledgment_date) in purchase_orders.iterator():
+        aggregate = aggregates.setdefault(
+            vendor_id, VendorPerformanceAggregate(vendor_id=vendor_id),
+        )
+        aggregate.total_po_count += 1
+        if status == 'COMPLETED':
+            aggregate.completed_po_count += 1
+            if completion_date <= delivery_date:
+                aggregate.on_time_po_count += 1
+            if quality_rating:
+                aggregate.rated_po_count += 1
+                aggregate.quality_rating_total += quality_rating
+        if acknowledgment_date:
+            aggregate.acknowledged_po_count += 1
+            aggregate.response_time_total += (
+                (acknowledgment_date - issue_date).total_seconds() / 3600
+            )
+    VendorPerformanceAggregate.objects.bulk_create(aggregates.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VendorInfo', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='completion_date',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Date and Time when the purchase order was marked as completed', null=True),
+        ),
+        migrations.CreateModel(
+            name='VendorPerformanceAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_po_count', models.IntegerField(default=0, help_text='Number of purchase orders issued to the vendor')),
+                ('completed_po_count', models.IntegerField(default=0, help_text='Number of completed purchase orders')),
+                ('on_time_po_count', models.IntegerField(default=0, help_text='Number of completed purchase orders delivered on or before the delivery date')),
+                ('rated_po_count', models.IntegerField(default=0, help_text='Number of completed purchase orders with a quality rating')),
+                ('quality_rating_total', models.FloatField(default=0.0, help_text='Sum of quality ratings of the rated purchase orders')),
+                ('acknowledged_po_count', models.IntegerField(default=0, help_text='Number of acknowledged purchase orders')),
+                ('response_time_total', models.FloatField(default=0.0, help_text='Sum of the time taken to acknowledge purchase orders(in hours)')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('vendor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='performance_aggregate', to='VendorInfo.vendor')),
+            ],
+        ),
+        migrations.RunPython(backfill_aggregates, migrations.RunPython.noop),
+    ]
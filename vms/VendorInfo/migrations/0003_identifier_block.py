@@ -0,0 +1,21 @@
+# Generated by Django 4.2.11 on 2026-10-18 16:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VendorInfo', '0002_vendor_performance_aggregate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdentifierBlock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=20, unique=True)),
+                ('next_value', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
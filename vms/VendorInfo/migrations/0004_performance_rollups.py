@@ -0,0 +1,40 @@
+# Generated by Django 4.2.11 on 2026-10-18 16:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VendorInfo', '0003_identifier_block'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PerformanceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('day', 'Day'), ('week', 'Week'), ('month', 'Month')], max_length=5)),
+                ('period_start', models.DateTimeField(help_text='Start of the day, week (Monday) or month covered by the rollup')),
+                ('sample_count', models.IntegerField(default=0, help_text='Number of performance snapshots in the period')),
+                ('on_time_delivery_rate_total', models.FloatField(default=0.0)),
+                ('quality_rating_avg_total', models.FloatField(default=0.0)),
+                ('average_response_time_total', models.FloatField(default=0.0)),
+                ('fulfillment_rate_total', models.FloatField(default=0.0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='historicalperformance',
+            index=models.Index(fields=['vendor', 'date'], name='historical_vendor_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='performancerollup',
+            name='vendor',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='VendorInfo.vendor'),
+        ),
+        migrations.AddConstraint(
+            model_name='performancerollup',
+            constraint=models.UniqueConstraint(fields=('vendor', 'granularity', 'period_start'), name='unique_performance_rollup_period'),
+        ),
+    ]
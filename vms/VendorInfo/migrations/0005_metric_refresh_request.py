@@ -0,0 +1,23 @@
+# Generated by Django 4.2.11 on 2026-10-18 16:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VendorInfo', '0004_performance_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricRefreshRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('requested_at', models.DateTimeField(help_text='Date and Time of the earliest pending change')),
+                ('attempts', models.IntegerField(default=0, help_text='Number of failed refresh attempts')),
+                ('vendor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='metric_refresh_request', to='VendorInfo.vendor')),
+            ],
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.11 on 2026-10-18 16:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VendorInfo', '0005_metric_refresh_request'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='metricrefreshrequest',
+            index=models.Index(fields=['requested_at'], name='metric_refresh_requested_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['vendor', 'status'], name='po_vendor_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['status', 'delivery_date'], name='po_status_delivery_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['delivery_date'], name='po_delivery_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['acknowledgment_date'], name='po_acknowledgment_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(condition=models.Q(('status', 'COMPLETED')), fields=['vendor', 'completion_date'], name='po_completed_vendor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(condition=models.Q(('acknowledgment_date__isnull', True)), fields=['vendor', 'issue_date'], name='po_unacknowledged_vendor_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.11 on 2026-10-18 19:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VendorInfo', '0006_hot_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vendor',
+            index=models.Index(fields=['on_time_delivery_rate', 'id'], name='vendor_on_time_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vendor',
+            index=models.Index(fields=['quality_rating_avg', 'id'], name='vendor_quality_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vendor',
+            index=models.Index(fields=['average_response_time', 'id'], name='vendor_response_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vendor',
+            index=models.Index(fields=['fulfillment_rate', 'id'], name='vendor_fulfillment_rank_idx'),
+        ),
+    ]
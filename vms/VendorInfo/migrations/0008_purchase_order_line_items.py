@@ -0,0 +1,52 @@
+# Generated by Django 4.2.11 on 2026-10-18 20:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_line_items(apps, schema_editor):
+    from VendorInfo.line_items import parse_line_items
+
+    if not settings.VMS_LINE_ITEMS:
+        return
+    PurchaseOrder = apps.get_model('VendorInfo', 'PurchaseOrder')
+    PurchaseOrderLineItem = apps.get_model('VendorInfo', 'PurchaseOrderLineItem')
+    PurchaseOrderLineItem.objects.bulk_create(
+        (
+            PurchaseOrderLineItem(
+                purchase_order_id=purchase_order_id,
+                sku=sku,
+                quantity=quantity,
+                unit_price=unit_price,
+            )
+            for purchase_order_id, items in PurchaseOrder.objects.values_list('id', 'items').iterator()
+            for sku, quantity, unit_price in parse_line_items(items)
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VendorInfo', '0007_vendor_metric_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PurchaseOrderLineItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sku', models.CharField(max_length=100)),
+                ('quantity', models.IntegerField(blank=True, help_text='Quantity ordered, if the items give one', null=True)),
+                ('unit_price', models.FloatField(blank=True, help_text='Price per unit, if the items give one', null=True)),
+                ('purchase_order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='line_items', to='VendorInfo.purchaseorder')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='purchaseorderlineitem',
+            constraint=models.UniqueConstraint(fields=('sku', 'purchase_order'), name='unique_line_item_sku'),
+        ),
+        migrations.RunPython(backfill_line_items, migrations.RunPython.noop),
+    ]
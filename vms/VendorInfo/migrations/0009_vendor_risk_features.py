@@ -0,0 +1,36 @@
+# Generated by Django 4.2.11 on 2026-10-18 20:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VendorInfo', '0008_purchase_order_line_items'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendorRiskFeatures',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('completed_count', models.IntegerField(default=0, help_text='Number of recent completed purchase orders the features are computed from')),
+                ('on_time_rate', models.FloatField(default=0.0, help_text='Percentage of the recent completed purchase orders delivered on time')),
+                ('weighted_lateness', models.FloatField(default=0.0, help_text='Days late of the recent completed purchase orders, weighted by quantity')),
+                ('response_time_p50', models.DurationField(blank=True, help_text='Median time to acknowledge the recent purchase orders', null=True)),
+                ('response_time_p90', models.DurationField(blank=True, help_text='90th percentile of the time to acknowledge the recent purchase orders', null=True)),
+                ('late_risk', models.FloatField(help_text='Estimated probability that a purchase order is delivered late')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(condition=models.Q(('acknowledgment_date__isnull', False)), fields=['vendor', 'acknowledgment_date'], name='po_acknowledged_vendor_idx'),
+        ),
+        migrations.AddField(
+            model_name='vendorriskfeatures',
+            name='vendor',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='risk_features', to='VendorInfo.vendor'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.11 on 2026-10-18 21:02
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VendorInfo', '0009_vendor_risk_features'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('vendor', 'Vendor'), ('purchase_order', 'Purchase Order'), ('historical_performance', 'Historical Performance')], max_length=32)),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=8)),
+                ('object_id', models.BigIntegerField(help_text='Primary key of the changed row')),
+                ('key', models.CharField(help_text='Vendor code, purchase order number or snapshot id of the changed row', max_length=100)),
+                ('vendor_id', models.BigIntegerField(blank=True, help_text='Vendor of the changed row', null=True)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['changed_at'], name='change_log_changed_at_idx')],
+            },
+        ),
+    ]
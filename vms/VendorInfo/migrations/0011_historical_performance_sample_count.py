@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-18 21:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VendorInfo', '0010_change_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalperformance',
+            name='sample_count',
+            field=models.IntegerField(default=1, help_text='Number of snapshots averaged into this one by compaction'),
+        ),
+    ]
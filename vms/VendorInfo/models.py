@@ -1,9 +1,61 @@
-from django.db import models
+from functools import partial
 
-from .utils import generate_random_identifier
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .identifiers import generate_unique_identifiers, get_identifier_engine
+from .utils import lock_rows
 
 # Create your models here.
 
+IDENTIFIER_ATTEMPTS = 5
+
+
+def save_with_identifier(instance, field, save):
+    """
+    Run `save`, assigning a generated identifier to `field` if it is empty.
+
+    Identifiers are not looked up before the insert when the engine issues
+    unique values; if one collides anyway (e.g. with identifiers from an older
+    engine) the unique constraint rejects it and a new one is drawn.
+    """
+    return save_with_identifiers([instance], field, save)
+
+
+def save_with_identifiers(instances, field, save):
+    """
+    `save_with_identifier` for several instances inserted by one `save`, e.g.
+    a `bulk_create`. On a collision every generated identifier is drawn again.
+    """
+    pending = [instance for instance in instances if not getattr(instance, field)]
+    if not pending:
+        return save()
+
+    model = type(pending[0])
+    adding = [instance for instance in pending if instance._state.adding]
+    for attempt in range(IDENTIFIER_ATTEMPTS):
+        identifiers = generate_unique_identifiers(field, len(pending), model.objects.all(), field)
+        for instance, identifier in zip(pending, identifiers):
+            setattr(instance, field, identifier)
+        try:
+            with transaction.atomic():
+                return save()
+        except IntegrityError:
+            for instance in pending:
+                setattr(instance, field, '')
+            #NOTE: `bulk_create` sets the primary keys of the batches it inserted
+            #before the one that failed, they were rolled back.
+            for instance in adding:
+                instance.pk = None
+                instance._state.adding = True
+            if (
+                attempt + 1 == IDENTIFIER_ATTEMPTS
+                or not model.objects.filter(**{f'{field}__in': identifiers}).exists()
+            ):
+                raise
+            get_identifier_engine().discard(field)
+
 class Vendor(models.Model):
     name = models.CharField(max_length=100)
     contact_details = models.TextField(
@@ -41,16 +93,90 @@ class Vendor(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # Rankings read the top or bottom of these, see `VendorInfo.rankings`.
+        indexes = [
+            models.Index(fields=['on_time_delivery_rate', 'id'], name='vendor_on_time_rank_idx'),
+            models.Index(fields=['quality_rating_avg', 'id'], name='vendor_quality_rank_idx'),
+            models.Index(fields=['average_response_time', 'id'], name='vendor_response_rank_idx'),
+            models.Index(fields=['fulfillment_rate', 'id'], name='vendor_fulfillment_rank_idx'),
+        ]
+
     def __str__(self):
         return f'{self.name} - {self.id}'
     
     def save(self, *args, **kwargs):
-        if not self.code:
-            code = generate_random_identifier('code')
-            while Vendor.objects.filter(code=code).exists():
-                code = generate_random_identifier('code')
-            self.code = code
-        super().save(*args, **kwargs)
+        from .metrics import METRIC_FIELDS
+
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            #NOTE: The metrics are only written by the refresh worker, see `VendorInfo.metrics`,
+            #saving those of a stale instance would undo a concurrent refresh. Deferred fields
+            #are left out as well, as `Model.save` does, rather than loaded one query each.
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in METRIC_FIELDS and field.attname not in deferred
+            ]
+        #NOTE: Atomic with the change log entry written on `post_save`.
+        with transaction.atomic():
+            save_with_identifier(self, 'code', partial(super().save, *args, **kwargs))
+
+
+class PurchaseOrderQuerySet(models.QuerySet):
+
+    def delete(self):
+        with transaction.atomic():
+            #NOTE: Locked before the rows are read for the delete, and read whole, so the
+            #`post_delete` receiver takes the state they are deleted in out of the vendor aggregates.
+            list(lock_rows(self._chain()).values_list('pk', flat=True))
+            queryset = self._chain()
+            queryset.query.clear_deferred_loading()
+            self._result_cache = None
+            return super(PurchaseOrderQuerySet, queryset).delete()
+
+    def update(self, **kwargs):
+        fields = {self.model._meta.get_field(name).attname for name in kwargs}
+        if fields.isdisjoint(self.model.PERFORMANCE_FIELDS):
+            return super().update(**kwargs)
+        with transaction.atomic():
+            #NOTE: Locked before the rows are read, so the state they are updated
+            #from is the one taken out of the vendor aggregates.
+            rows = list(lock_rows(self._chain()).values('id', *self.model.PERFORMANCE_FIELDS))
+            return self.update_rows(rows, **kwargs)
+
+    def update_rows(self, rows, **kwargs):
+        """
+        `update` the purchase orders of `rows`, their `id` and performance
+        fields read under a lock in the current transaction, and apply the
+        change to the vendor aggregates.
+        """
+        from .metrics import record_purchase_order_changes
+
+        if not rows:
+            return 0
+        queryset = models.QuerySet(self.model, using=self.db).filter(id__in=[row['id'] for row in rows])
+        updated = queryset.update(**kwargs)
+        fields = {self.model._meta.get_field(name).attname for name in kwargs}
+        #NOTE: The completion date follows the status, see `PurchaseOrder.stamp_completion`.
+        if 'status' in fields and 'completion_date' not in fields:
+            queryset.update(completion_date=models.Case(
+                models.When(
+                    status=self.model.PoStatus.COMPLETED,
+                    then=Coalesce('completion_date', models.Value(timezone.now())),
+                ),
+                default=None,
+                output_field=self.model._meta.get_field('completion_date'),
+            ))
+        #NOTE: Read again rather than taken from `kwargs`, which may hold expressions.
+        current = {row['id']: row for row in queryset.values('id', *self.model.PERFORMANCE_FIELDS)}
+        record_purchase_order_changes(
+            (
+                {field: row[field] for field in self.model.PERFORMANCE_FIELDS},
+                {field: current[row['id']][field] for field in self.model.PERFORMANCE_FIELDS},
+            )
+            for row in rows
+        )
+        return updated
 
 
 class PurchaseOrder(models.Model):
@@ -99,19 +225,167 @@ class PurchaseOrder(models.Model):
         blank=True,
         help_text='Date and Time when the vendor acknowledged the purchase order'
     )
+    completion_date = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text='Date and Time when the purchase order was marked as completed'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PurchaseOrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['vendor', 'status'], name='po_vendor_status_idx'),
+            models.Index(fields=['status', 'delivery_date'], name='po_status_delivery_idx'),
+            models.Index(fields=['delivery_date'], name='po_delivery_date_idx'),
+            models.Index(fields=['acknowledgment_date'], name='po_acknowledgment_date_idx'),
+            # Partial indexes of the rows the performance metrics are computed from.
+            models.Index(
+                fields=['vendor', 'completion_date'],
+                condition=models.Q(status='COMPLETED'),
+                name='po_completed_vendor_idx',
+            ),
+            models.Index(
+                fields=['vendor', 'issue_date'],
+                condition=models.Q(acknowledgment_date__isnull=True),
+                name='po_unacknowledged_vendor_idx',
+            ),
+            models.Index(
+                fields=['vendor', 'acknowledgment_date'],
+                condition=models.Q(acknowledgment_date__isnull=False),
+                name='po_acknowledged_vendor_idx',
+            ),
+        ]
+
+    #NOTE: Fields that feed the vendor performance aggregates, see `VendorInfo.metrics`.
+    PERFORMANCE_FIELDS = (
+        'vendor_id',
+        'status',
+        'delivery_date',
+        'completion_date',
+        'quality_rating',
+        'issue_date',
+        'acknowledgment_date',
+    )
+
     def __str__(self):
         return f'{self.po_number} - {self.vendor.name}'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the state the row was loaded with so `save` can work out
+        # how the vendor aggregates change without re-reading the row.
+        loaded = dict(zip(field_names, values))
+        instance._loaded_performance_state = {
+            field: loaded[field] for field in cls.PERFORMANCE_FIELDS
+            if field in loaded and loaded[field] is not models.DEFERRED
+        }
+        # And the items, so line items are only rewritten when they change.
+        instance._loaded_items = loaded.get('items', models.DEFERRED)
+        return instance
+
+    def performance_state(self):
+        return {field: getattr(self, field) for field in self.PERFORMANCE_FIELDS}
+
+    def stamp_completion(self):
+        if self.status == self.PoStatus.COMPLETED:
+            if not self.completion_date:
+                self.completion_date = timezone.now()
+        else:
+            self.completion_date = None
+
+    def _previous_performance_state(self):
+        if self._state.adding:
+            return None
+        #NOTE: Read again under a lock rather than taken from the loaded state, a
+        #concurrent write since the row was loaded would otherwise be applied to
+        #the vendor aggregates twice, or not at all.
+        return (
+            lock_rows(PurchaseOrder.objects.filter(pk=self.pk))
+            .values(*self.PERFORMANCE_FIELDS)
+            .first()
+        )
     
     def save(self, *args, **kwargs):
-        if not self.po_number:
-            code = generate_random_identifier('po_number')
-            while PurchaseOrder.objects.filter(po_number=code).exists():
-                code = generate_random_identifier('po_number')
-            self.po_number = code
-        super().save(*args, **kwargs)
+        from .line_items import sync_line_items
+        from .metrics import record_purchase_order_changes
+
+        self.stamp_completion()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = {self._meta.get_field(name).attname for name in update_fields}
+            #NOTE: The completion date follows the status, see `stamp_completion`.
+            if 'status' in update_fields and 'completion_date' not in update_fields:
+                kwargs['update_fields'] = [*kwargs['update_fields'], 'completion_date']
+                update_fields.add('completion_date')
+        items_changed = (
+            (update_fields is None or 'items' in update_fields)
+            and 'items' not in self.get_deferred_fields()
+            and self.items != getattr(self, '_loaded_items', models.DEFERRED)
+        )
+        with transaction.atomic():
+            adding = self._state.adding
+            previous_state = self._previous_performance_state()
+            save_with_identifier(self, 'po_number', partial(super().save, *args, **kwargs))
+            current_state = self.performance_state()
+            if update_fields is not None and previous_state:
+                #NOTE: Fields changed in memory but not saved are not in the row.
+                current_state = {
+                    field: current_state[field] if field in update_fields else previous_state[field]
+                    for field in self.PERFORMANCE_FIELDS
+                }
+            record_purchase_order_changes([(previous_state, current_state)])
+            if items_changed:
+                sync_line_items([self], created=adding)
+        self._loaded_performance_state = current_state
+        self._loaded_items = self.items
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            #NOTE: The state the `post_delete` receiver takes out of the vendor aggregates,
+            #`None` when the row is gone already.
+            self._loaded_performance_state = self._previous_performance_state()
+            return super().delete(*args, **kwargs)
+
+
+class PurchaseOrderLineItem(models.Model):
+    """
+    One SKU of a purchase order, normalized from `PurchaseOrder.items` when
+    `VMS_LINE_ITEMS` is on (see `VendorInfo.line_items`) so purchase orders
+    can be looked up by SKU without decoding every `items` blob.
+    """
+    purchase_order = models.ForeignKey(
+        PurchaseOrder, 
+        on_delete=models.CASCADE, 
+        related_name='line_items'
+    )
+    sku = models.CharField(max_length=100)
+    quantity = models.IntegerField(
+        null=True, 
+        blank=True,
+        help_text='Quantity ordered, if the items give one'
+    )
+    unit_price = models.FloatField(
+        null=True, 
+        blank=True,
+        help_text='Price per unit, if the items give one'
+    )
+
+    class Meta:
+        constraints = [
+            # Also serves the lookups by SKU, in purchase order order.
+            models.UniqueConstraint(
+                fields=['sku', 'purchase_order'], 
+                name='unique_line_item_sku',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.purchase_order_id} - {self.sku}'
 
 
 class HistoricalPerformance(models.Model):
@@ -141,8 +415,272 @@ class HistoricalPerformance(models.Model):
         blank=True,
         help_text='Historical record of the fulfillment rate'
     )
+    sample_count = models.IntegerField(
+        default=1,
+        help_text='Number of snapshots averaged into this one by compaction'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['vendor', 'date'], name='historical_vendor_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.vendor.name} - {self.date}'
+
+    def save(self, *args, **kwargs):
+        from .rollups import record_snapshots
+
+        with transaction.atomic():
+            adding = self._state.adding
+            super().save(*args, **kwargs)
+            if adding:
+                record_snapshots([self])
+
+
+class PerformanceRollup(models.Model):
+    """
+    Sum of the `HistoricalPerformance` snapshots of a vendor over one period.
+
+    Maintained incrementally as snapshots are recorded, so trends over long
+    histories are read from a handful of rows per period.
+    """
+    class Granularity(models.TextChoices):
+        DAY = 'day'
+        WEEK = 'week'
+        MONTH = 'month'
+
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE)
+    granularity = models.CharField(
+        max_length=5, 
+        choices=Granularity.choices
+    )
+    period_start = models.DateTimeField(
+        help_text='Start of the day, week (Monday) or month covered by the rollup'
+    )
+    sample_count = models.IntegerField(
+        default=0,
+        help_text='Number of performance snapshots in the period'
+    )
+    on_time_delivery_rate_total = models.FloatField(default=0.0)
+    quality_rating_avg_total = models.FloatField(default=0.0)
+    average_response_time_total = models.FloatField(default=0.0)
+    fulfillment_rate_total = models.FloatField(default=0.0)
+
+    class Meta:
+        constraints = [
+            # Also serves the (vendor, granularity, period_start) range scans of trend queries.
+            models.UniqueConstraint(
+                fields=['vendor', 'granularity', 'period_start'], 
+                name='unique_performance_rollup_period',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.vendor_id} - {self.granularity} - {self.period_start}'
+
+
+class VendorPerformanceAggregate(models.Model):
+    """
+    Running totals behind the `Vendor` performance metrics.
+
+    The counters are adjusted in the same transaction as every purchase order
+    write, so the metrics can be derived in O(1) instead of scanning the
+    vendor's purchase orders.
+    """
+    vendor = models.OneToOneField(
+        Vendor, 
+        on_delete=models.CASCADE, 
+        related_name='performance_aggregate'
+    )
+    total_po_count = models.IntegerField(
+        default=0,
+        help_text='Number of purchase orders issued to the vendor'
+    )
+    completed_po_count = models.IntegerField(
+        default=0,
+        help_text='Number of completed purchase orders'
+    )
+    on_time_po_count = models.IntegerField(
+        default=0,
+        help_text='Number of completed purchase orders delivered on or before the delivery date'
+    )
+    rated_po_count = models.IntegerField(
+        default=0,
+        help_text='Number of completed purchase orders with a quality rating'
+    )
+    quality_rating_total = models.FloatField(
+        default=0.0,
+        help_text='Sum of quality ratings of the rated purchase orders'
+    )
+    acknowledged_po_count = models.IntegerField(
+        default=0,
+        help_text='Number of acknowledged purchase orders'
+    )
+    response_time_total = models.FloatField(
+        default=0.0,
+        help_text='Sum of the time taken to acknowledge purchase orders(in hours)'
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.vendor_id} - {self.total_po_count}'
+
+    def metrics(self):
+        on_time_delivery_rate = 0.0
+        if self.completed_po_count:
+            on_time_delivery_rate = self.on_time_po_count * 100 / self.completed_po_count
+
+        quality_rating_avg = 0.0
+        if self.rated_po_count:
+            quality_rating_avg = self.quality_rating_total / self.rated_po_count
+
+        average_response_time = 0.0
+        if self.acknowledged_po_count:
+            average_response_time = self.response_time_total / self.acknowledged_po_count
+
+        fulfillment_rate = 0.0
+        if self.total_po_count:
+            fulfillment_rate = self.completed_po_count * 100 / self.total_po_count
+
+        return dict(
+            on_time_delivery_rate=on_time_delivery_rate,
+            quality_rating_avg=quality_rating_avg,
+            average_response_time=average_response_time,
+            fulfillment_rate=fulfillment_rate,
+        )
+
+
+
+class IdentifierBlock(models.Model):
+    """Next unreserved value of an identifier sequence, see `VendorInfo.identifiers`."""
+    name = models.CharField(max_length=20, unique=True)
+    next_value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.name} - {self.next_value}'
+
+
+
+class VendorRiskFeatures(models.Model):
+    """
+    Delivery features of the recent purchase orders of a vendor, refreshed
+    with its metrics, from which pending purchase orders are scored by
+    `VendorInfo.risk`.
+    """
+    vendor = models.OneToOneField(
+        Vendor, 
+        on_delete=models.CASCADE, 
+        related_name='risk_features'
+    )
+    completed_count = models.IntegerField(
+        default=0,
+        help_text='Number of recent completed purchase orders the features are computed from'
+    )
+    on_time_rate = models.FloatField(
+        default=0.0,
+        help_text='Percentage of the recent completed purchase orders delivered on time'
+    )
+    weighted_lateness = models.FloatField(
+        default=0.0,
+        help_text='Days late of the recent completed purchase orders, weighted by quantity'
+    )
+    response_time_p50 = models.DurationField(
+        null=True, 
+        blank=True,
+        help_text='Median time to acknowledge the recent purchase orders'
+    )
+    response_time_p90 = models.DurationField(
+        null=True, 
+        blank=True,
+        help_text='90th percentile of the time to acknowledge the recent purchase orders'
+    )
+    late_risk = models.FloatField(
+        help_text='Estimated probability that a purchase order is delivered late'
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.vendor_id} - {self.late_risk}'
+
+
+class MetricRefreshRequest(models.Model):
+    """
+    Outbox of vendors whose metrics and performance history must be refreshed.
+
+    Written in the same transaction as the purchase order change and consumed
+    by the background worker in `VendorInfo.worker`. There is at most one
+    pending request per vendor, so bursts of writes collapse into a single
+    refresh.
+    """
+    vendor = models.OneToOneField(
+        Vendor, 
+        on_delete=models.CASCADE, 
+        related_name='metric_refresh_request'
+    )
+    requested_at = models.DateTimeField(
+        help_text='Date and Time of the earliest pending change'
+    )
+    attempts = models.IntegerField(
+        default=0,
+        help_text='Number of failed refresh attempts'
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['requested_at'], name='metric_refresh_requested_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.vendor_id} - {self.requested_at}'
+
+
+class ChangeLogEntry(models.Model):
+    """
+    Append-only log of the writes to vendors, purchase orders and performance
+    snapshots, written in the same transaction as the write and served by the
+    change feed of `VendorInfo.changes`. The id is the sequence number clients
+    resume from.
+    """
+    class Kind(models.TextChoices):
+        VENDOR = 'vendor'
+        PURCHASE_ORDER = 'purchase_order'
+        HISTORICAL_PERFORMANCE = 'historical_performance'
+
+    class Action(models.TextChoices):
+        CREATED = 'created'
+        UPDATED = 'updated'
+        DELETED = 'deleted'
+
+    kind = models.CharField(
+        max_length=32,
+        choices=Kind.choices,
+    )
+    action = models.CharField(
+        max_length=8,
+        choices=Action.choices,
+    )
+    object_id = models.BigIntegerField(
+        help_text='Primary key of the changed row'
+    )
+    key = models.CharField(
+        max_length=100,
+        help_text='Vendor code, purchase order number or snapshot id of the changed row'
+    )
+    #NOTE: Not a foreign key, the entries of deleted vendors are kept.
+    vendor_id = models.BigIntegerField(
+        null=True, 
+        blank=True,
+        help_text='Vendor of the changed row'
+    )
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['changed_at'], name='change_log_changed_at_idx'),
+        ]
+
     def __str__(self):
-        return f'{self.vendor.name} - {self.date}'
\ No newline at end of file
+        return f'{self.id} - {self.kind} {self.key} {self.action}'
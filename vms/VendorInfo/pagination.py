@@ -0,0 +1,16 @@
+from rest_framework.pagination import CursorPagination
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Keyset pagination on the primary key.
+
+    Pages are fetched with `WHERE id > <cursor> ORDER BY id LIMIT n`, so the
+    cost of a page does not depend on how deep into the result set it is.
+    """
+    #NOTE: Ascending, DRF adds an `OR id IS NULL` to the cursor filter of descending
+    #orderings, which keeps the database from using the primary key range.
+    ordering = 'id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
@@ -0,0 +1,95 @@
+"""
+Vendor rankings by performance metric.
+
+Rankings are read from the `(metric, id)` indexes of `Vendor`: the best or
+worst N vendors are the first N entries from one end of the index, and
+ranks are counted from the entries between a vendor and the nearer end, so
+no ranking loads or sorts every vendor. The rank of a single vendor is
+counted from the best end up to half of the vendors, and from the worst end
+past that.
+
+Tied vendors share the best rank of their group ("1224" ranking) and the
+percentile of a vendor is the share of ranked vendors doing no better.
+"""
+from django.db.models import Q
+
+from .models import Vendor
+
+#NOTE: Lower is better for the response time. Vendors without acknowledged
+#purchase orders have a response time of 0 and are left out of its ranking.
+LOWER_IS_BETTER = {'average_response_time'}
+
+MAX_LIMIT = 100
+
+
+def ranked_vendors(metric):
+    vendors = Vendor.objects.all()
+    if metric in LOWER_IS_BETTER:
+        vendors = vendors.filter(**{f'{metric}__gt': 0})
+    return vendors
+
+
+def better_than(metric, value):
+    lookup = 'lt' if metric in LOWER_IS_BETTER else 'gt'
+    return Q(**{f'{metric}__{lookup}': value})
+
+
+def no_better_than(metric, value):
+    lookup = 'gte' if metric in LOWER_IS_BETTER else 'lte'
+    return Q(**{f'{metric}__{lookup}': value})
+
+
+def _result(metric, row, rank, total):
+    return dict(
+        code=row['code'],
+        name=row['name'],
+        value=row[metric],
+        rank=rank,
+        percentile=100 * (total - rank + 1) / total,
+    )
+
+
+def leaderboard(metric, limit, best_first=True):
+    """The `limit` best vendors by `metric`, or the worst ones, worst first."""
+    vendors = ranked_vendors(metric)
+    descending = (metric not in LOWER_IS_BETTER) == best_first
+    ordering = (f'-{metric}', '-id') if descending else (metric, 'id')
+    rows = list(vendors.order_by(*ordering).values('code', 'name', metric)[:limit])
+    total = vendors.count()
+
+    ranks = {}
+    if best_first:
+        # Everyone better than a vendor is listed before it.
+        for position, row in enumerate(rows, start=1):
+            ranks.setdefault(row[metric], position)
+    else:
+        # Everyone doing no better than a vendor is listed before it or
+        # with it, except for the ties of the last row past the limit.
+        no_better = {row[metric]: position for position, row in enumerate(rows, start=1)}
+        if len(rows) == limit:
+            boundary = rows[-1][metric]
+            no_better[boundary] = vendors.filter(no_better_than(metric, boundary)).count()
+        ranks = {value: total - count + 1 for value, count in no_better.items()}
+
+    return dict(
+        metric=metric,
+        total=total,
+        results=[_result(metric, row, ranks[row[metric]], total) for row in rows],
+    )
+
+
+def vendor_rank(metric, code):
+    """Rank of the vendor with `code` by `metric`, `None` if it is not ranked."""
+    vendors = ranked_vendors(metric)
+    row = vendors.filter(code=code).values('code', 'name', metric).first()
+    if row is None:
+        return None
+    total = vendors.count()
+    half = total // 2
+    #NOTE: Counting stops past half of the vendors, the worst end is nearer then.
+    better = vendors.filter(better_than(metric, row[metric])).order_by()[:half + 1].count()
+    if better <= half:
+        rank = better + 1
+    else:
+        rank = total - vendors.filter(no_better_than(metric, row[metric])).count() + 1
+    return dict(metric=metric, total=total, results=[_result(metric, row, rank, total)])
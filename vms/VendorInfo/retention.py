@@ -0,0 +1,235 @@
+"""
+Retention of `HistoricalPerformance` snapshots.
+
+The metric refresh worker records a snapshot of every refreshed vendor, so
+the table grows without bound. `VMS_HISTORY_RETENTION` lists `(days,
+granularity)` tiers: the snapshots of a vendor older than `days` are
+compacted into one per day, week or month, the average of the snapshots it
+replaces weighted by their `sample_count`, dated at the first of them. A
+coarser tier takes over from a finer one past its own age, e.g. with the
+default snapshots are kept as recorded for 30 days, one per day for a year
+and one per month beyond.
+
+The replaced snapshots are appended to a gzipped NDJSON file of
+`VMS_HISTORY_ARCHIVE_DIR` once the transaction deleting them commits, so a
+rolled back or retried compaction does not archive them twice. A crash right
+after the commit loses the archive of that chunk only, the compacted
+snapshots still count the replaced ones. The performance rollups are left as
+they are, they already count every snapshot.
+Rebuilding them afterwards gives back those of periods no finer than the
+compaction's only, e.g. a month compacted into one snapshot counts in the
+day and week rollups of its first snapshot.
+"""
+import gzip
+import os
+from datetime import timedelta
+from functools import partial
+from itertools import groupby
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cache import invalidate_vendors
+from .changes import record_changes
+from .exports import stream_ndjson
+from .models import ChangeLogEntry, HistoricalPerformance, PerformanceRollup, Vendor
+from .rollups import SNAPSHOT_FIELDS, period_start
+
+ROW_FIELDS = ('id', 'date', *SNAPSHOT_FIELDS, 'sample_count', 'created_at', 'updated_at')
+
+ARCHIVE_COLUMNS = tuple(
+    (name, name) for name in ('vendor_code', *ROW_FIELDS)
+)
+
+
+def retention_tiers(policy=None):
+    """`(days, granularity)` of the retention policy, youngest first."""
+    if policy is None:
+        policy = settings.VMS_HISTORY_RETENTION
+    tiers = sorted((int(days), PerformanceRollup.Granularity(granularity)) for days, granularity in policy)
+    if any(days < 0 for days, _ in tiers):
+        raise ValueError('Retention ages must not be negative.')
+    return tiers
+
+
+def _ranges(tiers, now):
+    """`(granularity, lower, upper)` date ranges compacted by the tiers, `lower` is `None` for the oldest."""
+    bounds = [period_start(now - timedelta(days=days), granularity) for days, granularity in tiers]
+    for index, (_, granularity) in enumerate(tiers):
+        lower = bounds[index + 1] if index + 1 < len(tiers) else None
+        if lower is None or lower < bounds[index]:
+            yield granularity, lower, bounds[index]
+
+
+def table_size():
+    """Rows of the snapshot table and bytes used by it and its indexes, `None` if the database cannot tell."""
+    table = HistoricalPerformance._meta.db_table
+    size = None
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                'SELECT SUM(pgsize) FROM dbstat WHERE name IN '
+                '(SELECT name FROM sqlite_master WHERE tbl_name = %s)',
+                [table],
+            )
+            size = cursor.fetchone()[0]
+        elif connection.vendor == 'postgresql':
+            cursor.execute('SELECT pg_total_relation_size(%s)', [table])
+            size = cursor.fetchone()[0]
+    return dict(rows=HistoricalPerformance.objects.count(), bytes=size)
+
+
+class Archive:
+    """gzipped NDJSON file of the replaced snapshots, created with the first of them."""
+
+    def __init__(self, directory, now):
+        self.path = None if directory is None else (
+            Path(directory) / f'historical-performance-{now:%Y%m%dT%H%M%S%f}.ndjson.gz'
+        )
+        self.rows = 0
+
+    def write(self, rows):
+        """Append `rows` once the current transaction commits, not at all if it rolls back."""
+        if self.path is not None and rows:
+            transaction.on_commit(partial(self._append, rows))
+
+    def _append(self, rows):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        #NOTE: Every chunk is a gzip member of its own, readers decompress them as one stream.
+        with gzip.open(self.path, 'at', encoding='utf-8') as file:
+            for chunk in stream_ndjson(ARCHIVE_COLUMNS, rows):
+                file.write(chunk)
+            file.flush()
+            os.fsync(file.fileno())
+        self.rows += len(rows)
+
+
+def _delete_snapshots(ids, chunk_size=500):
+    """
+    Delete the snapshots with one `DELETE` per `chunk_size` ids, without
+    loading them.
+
+    Skipping `post_delete` is intended: `QuerySet.delete` would load every
+    snapshot to send it, and its receiver logs each deletion with an
+    `INSERT` of its own, while the compaction logs its changes in bulk. No
+    foreign key points to the snapshots, so nothing else has to be deleted.
+    """
+    snapshots = HistoricalPerformance.objects
+    for start in range(0, len(ids), chunk_size):
+        snapshots.filter(pk__in=ids[start:start + chunk_size])._raw_delete(snapshots.db)
+
+
+def _compacted(vendor_id, group):
+    samples = sum(row[-3] for row in group)
+    return HistoricalPerformance(
+        vendor_id=vendor_id,
+        date=group[0][1],
+        sample_count=samples,
+        **{
+            field: sum(row[2 + index] * row[-3] for row in group) / samples
+            for index, field in enumerate(SNAPSHOT_FIELDS)
+        },
+    )
+
+
+def _compact_chunk(vendor_id, code, groups, archive, carried=()):
+    """
+    Replace the groups of several snapshots with one. The snapshots of
+    `carried`, compacted from an earlier chunk of the same period, are not
+    archived nor counted again. Returns how many were replaced and the
+    compacted snapshots.
+    """
+    groups = [group for group in groups if len(group) > 1]
+    if not groups:
+        return 0, []
+    replaced = [row for group in groups for row in group]
+    with transaction.atomic():
+        archive.write([(code, *row) for row in replaced if row[0] not in carried])
+        #NOTE: Their changes are logged below.
+        _delete_snapshots([row[0] for row in replaced])
+        created = HistoricalPerformance.objects.bulk_create(
+            [_compacted(vendor_id, group) for group in groups],
+            batch_size=settings.VMS_BULK_CREATE_BATCH_SIZE,
+        )
+        record_changes(
+            ChangeLogEntry.Kind.HISTORICAL_PERFORMANCE,
+            ChangeLogEntry.Action.DELETED,
+            ((row[0], str(row[0]), vendor_id) for row in replaced),
+        )
+        record_changes(
+            ChangeLogEntry.Kind.HISTORICAL_PERFORMANCE,
+            ChangeLogEntry.Action.CREATED,
+            ((snapshot.pk, str(snapshot.pk), vendor_id) for snapshot in created),
+        )
+    return sum(row[0] not in carried for row in replaced), created
+
+
+def _compact_range(vendor_id, code, granularity, lower, upper, archive, chunk_size):
+    snapshots = HistoricalPerformance.objects.filter(vendor_id=vendor_id, date__lt=upper)
+    if lower is not None:
+        snapshots = snapshots.filter(date__gte=lower)
+
+    replaced = 0
+    cursor = None
+    carried = set()
+    while True:
+        chunk = snapshots if cursor is None else snapshots.filter(date__gte=cursor)
+        rows = list(chunk.order_by('date', 'id').values_list(*ROW_FIELDS)[:chunk_size])
+        groups = [list(group) for _, group in groupby(rows, key=lambda row: period_start(row[1], granularity))]
+        full = len(rows) == chunk_size
+        #NOTE: The last period of a full chunk may go on in the next one. Unless
+        #it fills the chunk on its own it is left to the next chunk, which starts
+        #from its first snapshot, where a compacted snapshot is dated as well.
+        if full and len(groups) > 1:
+            cursor = groups.pop()[0][1]
+        elif full:
+            cursor = groups[0][0][1]
+        count, created = _compact_chunk(vendor_id, code, groups, archive, carried)
+        replaced += count
+        carried = {snapshot.pk for snapshot in created}
+        if not full:
+            return replaced
+
+
+def compact_history(vendor_ids=None, policy=None, archive=True, archive_dir=None, now=None, chunk_size=2000):
+    """
+    Compact the snapshots of the vendors, of every vendor by default, under
+    the retention `policy`, archiving the replaced ones in `archive_dir`
+    (`VMS_HISTORY_ARCHIVE_DIR` by default) unless `archive` is false.
+
+    Every chunk of up to `chunk_size` snapshots is replaced in its own
+    transaction, and archived when it commits. Returns the number of
+    snapshots replaced and archived and the path of the archive, if any; run
+    inside a transaction nothing is archived before it commits.
+    """
+    if chunk_size < 2:
+        raise ValueError('The chunk size must be at least 2.')
+    if now is None:
+        now = timezone.now()
+    if not archive:
+        archive_dir = None
+    elif archive_dir is None:
+        archive_dir = settings.VMS_HISTORY_ARCHIVE_DIR
+    ranges = list(_ranges(retention_tiers(policy), now))
+
+    vendors = Vendor.objects.order_by('id')
+    if vendor_ids is not None:
+        vendors = vendors.filter(pk__in=vendor_ids)
+
+    output = Archive(archive_dir, now)
+    replaced = 0
+    for vendor_id, code in vendors.values_list('id', 'code').iterator():
+        compacted = sum(
+            _compact_range(vendor_id, code, granularity, lower, upper, output, chunk_size)
+            for granularity, lower, upper in ranges
+        )
+        if compacted:
+            invalidate_vendors([vendor_id])
+        replaced += compacted
+    return dict(
+        replaced=replaced,
+        archived=output.rows,
+        archive=output.path if output.rows else None,
+    )
@@ -0,0 +1,246 @@
+"""
+Delivery risk of pending purchase orders.
+
+The features of the recent purchase orders of every vendor are kept in
+`VendorRiskFeatures`, refreshed by the metric refresh worker whenever the
+vendor's purchase orders change (see `VendorInfo.worker`), so pending
+purchase orders are scored against them instead of scanning the vendor's
+history for each one:
+
+- purchase orders past their delivery date are late already, risk 1;
+- the others start from the vendor's `late_risk`, the share of its last
+  `RISK_WINDOW` completed purchase orders delivered late, smoothed towards
+  `PRIOR_LATE_RATE` for vendors with few of them;
+- those still not acknowledged after the vendor's 90th percentile response
+  time have `UNACKNOWLEDGED_WEIGHT` of their remaining risk added.
+"""
+import heapq
+import math
+
+from django.utils import timezone
+
+from .models import PurchaseOrder, Vendor, VendorRiskFeatures
+
+RISK_WINDOW = 100
+
+PRIOR_LATE_RATE = 0.2
+PRIOR_WEIGHT = 5
+
+UNACKNOWLEDGED_WEIGHT = 0.5
+
+MAX_LIMIT = 1000
+
+FIRST_BATCH = 16
+MAX_BATCH = 256
+#NOTE: Bounds the queries of `delivery_risk` whatever the number of vendors.
+MAX_BATCHES = 3
+
+ROW_FIELDS = (
+    'id',
+    'po_number',
+    'vendor__code',
+    'delivery_date',
+    'acknowledgment_date',
+    'vendor__risk_features__weighted_lateness',
+)
+
+
+def _nearest_rank(values, percent):
+    return values[max(math.ceil(percent / 100 * len(values)) - 1, 0)]
+
+
+def compute_risk_features(vendor_id):
+    """Features of the last `RISK_WINDOW` completed and acknowledged purchase orders of the vendor."""
+    completed = list(
+        #NOTE: Like the aggregates, purchase orders completed without a
+        #completion date are not counted.
+        PurchaseOrder.objects.filter(
+            vendor_id=vendor_id,
+            status=PurchaseOrder.PoStatus.COMPLETED,
+            completion_date__isnull=False,
+        )
+        .order_by('-completion_date')
+        .values_list('completion_date', 'delivery_date', 'quantity')[:RISK_WINDOW]
+    )
+    on_time = sum(1 for completion_date, delivery_date, _ in completed if completion_date <= delivery_date)
+    quantity = sum(max(quantity, 0) for _, _, quantity in completed)
+    lateness = sum(
+        max(quantity, 0) * max((completion_date - delivery_date).total_seconds(), 0) / 86400
+        for completion_date, delivery_date, quantity in completed
+    )
+
+    response_times = sorted(
+        acknowledgment_date - issue_date
+        for acknowledgment_date, issue_date in (
+            PurchaseOrder.objects.filter(vendor_id=vendor_id, acknowledgment_date__isnull=False)
+            .order_by('-acknowledgment_date')
+            .values_list('acknowledgment_date', 'issue_date')[:RISK_WINDOW]
+        )
+    )
+
+    return dict(
+        completed_count=len(completed),
+        on_time_rate=on_time * 100 / len(completed) if completed else 0.0,
+        weighted_lateness=lateness / quantity if quantity else 0.0,
+        response_time_p50=_nearest_rank(response_times, 50) if response_times else None,
+        response_time_p90=_nearest_rank(response_times, 90) if response_times else None,
+        late_risk=(
+            (len(completed) - on_time + PRIOR_WEIGHT * PRIOR_LATE_RATE)
+            / (len(completed) + PRIOR_WEIGHT)
+        ),
+    )
+
+
+def refresh_risk_features(vendor_ids):
+    for vendor_id in vendor_ids:
+        VendorRiskFeatures.objects.update_or_create(
+            vendor_id=vendor_id,
+            defaults=compute_risk_features(vendor_id),
+        )
+
+
+def rebuild_risk_features(vendor_ids=None):
+    if vendor_ids is None:
+        vendor_ids = Vendor.objects.values_list('id', flat=True).iterator()
+    refresh_risk_features(vendor_ids)
+
+
+def _levels(features, vendor_ids, now):
+    """
+    `(risk, vendor_id, cutoff, escalated)` of the pending purchase orders of
+    each vendor and state, of the `features` and of the vendors of
+    `vendor_ids` without any. Unacknowledged purchase orders issued before
+    `cutoff` are escalated.
+    """
+    for vendor_id, late_risk, response_time_p90 in features:
+        cutoff = None if response_time_p90 is None else now - response_time_p90
+        if cutoff is not None:
+            yield late_risk + (1 - late_risk) * UNACKNOWLEDGED_WEIGHT, vendor_id, cutoff, True
+        yield late_risk, vendor_id, cutoff, False
+    for vendor_id in vendor_ids:
+        yield PRIOR_LATE_RATE, vendor_id, None, False
+
+
+def _batches(levels):
+    """
+    `levels` riskiest first, in batches which never split a risk. Each batch
+    has up to twice as many levels, and as many levels not escalated, which
+    read all the pending purchase orders of their vendor, as the previous.
+    The last of `MAX_BATCHES` batches has every level left.
+    """
+    levels = sorted(levels, key=lambda level: level[0], reverse=True)
+    size, normal_size = FIRST_BATCH, 1
+    for _ in range(MAX_BATCHES - 1):
+        if not levels:
+            return
+        end = normal = 0
+        while end < len(levels) and (
+            end and levels[end][0] == levels[end - 1][0]
+            or end < size and normal < normal_size
+        ):
+            normal += not levels[end][3]
+            end += 1
+        yield levels[:end]
+        levels = levels[end:]
+        size = min(size * 2, MAX_BATCH)
+        if normal:
+            normal_size = min(normal_size * 2, MAX_BATCH)
+    if levels:
+        yield levels
+
+
+def _scored(batch, due):
+    """`(-risk, delivery_date, id)` of the pending purchase orders of the levels of `batch` matching `due`."""
+    pending = PurchaseOrder.objects.filter(status=PurchaseOrder.PoStatus.PENDING)
+    escalated = {vendor_id: (risk, cutoff) for risk, vendor_id, cutoff, is_escalated in batch if is_escalated}
+    if escalated:
+        rows = pending.filter(
+            vendor_id__in=escalated,
+            acknowledgment_date__isnull=True,
+            issue_date__lt=max(cutoff for _, cutoff in escalated.values()),
+        ).values_list(
+            'id', 'vendor_id', 'issue_date', 'delivery_date',
+        )
+        for id, vendor_id, issue_date, delivery_date in rows:
+            risk, cutoff = escalated[vendor_id]
+            if issue_date < cutoff and due(delivery_date):
+                yield -risk, delivery_date, id
+
+    levels = {vendor_id: (risk, cutoff) for risk, vendor_id, cutoff, is_escalated in batch if not is_escalated}
+    if levels:
+        rows = pending.filter(vendor_id__in=levels).values_list(
+            'id', 'vendor_id', 'acknowledgment_date', 'issue_date', 'delivery_date',
+        )
+        for id, vendor_id, acknowledgment_date, issue_date, delivery_date in rows:
+            risk, cutoff = levels[vendor_id]
+            if cutoff is not None and acknowledgment_date is None and issue_date < cutoff:
+                continue
+            if due(delivery_date):
+                yield -risk, delivery_date, id
+
+
+def delivery_risk(limit, start=None, end=None, vendor_code=None):
+    """
+    The `limit` pending purchase orders most at risk of a late delivery,
+    riskiest and then soonest due first, of those due in `[start, end)`.
+
+    Apart from the overdue ones, the risk of a pending purchase order only
+    depends on its vendor and on whether it is unacknowledged for too long,
+    so instead of scoring and sorting every pending purchase order, these
+    risk levels are read riskiest first, a batch of them at a time from the
+    purchase orders of their vendors only, until `limit` purchase orders are
+    found.
+    """
+    now = timezone.now()
+    pending = PurchaseOrder.objects.filter(status=PurchaseOrder.PoStatus.PENDING)
+    if start is not None:
+        pending = pending.filter(delivery_date__gte=start)
+    if end is not None:
+        pending = pending.filter(delivery_date__lt=end)
+    features = VendorRiskFeatures.objects.all()
+    vendors = Vendor.objects.filter(risk_features__isnull=True)
+    if vendor_code is not None:
+        pending = pending.filter(vendor__code=vendor_code)
+        features = features.filter(vendor__code=vendor_code)
+        vendors = vendors.filter(code=vendor_code)
+
+    scored = [
+        (-1.0, delivery_date, id)
+        for id, delivery_date in pending.filter(delivery_date__lt=now)
+        .order_by('delivery_date', 'id').values_list('id', 'delivery_date')[:limit]
+    ]
+    levels = _levels(
+        features.values_list('vendor_id', 'late_risk', 'response_time_p90'),
+        vendors.values_list('id', flat=True),
+        now,
+    )
+    #NOTE: The delivery dates are matched in Python, a filter on them would
+    #have SQLite read every pending purchase order from the delivery date
+    #index rather than those of the vendors from the vendor indexes.
+    def due(delivery_date):
+        return delivery_date >= now and (start is None or delivery_date >= start) and (end is None or delivery_date < end)
+
+    for batch in _batches(levels):
+        if len(scored) >= limit:
+            break
+        scored.extend(heapq.nsmallest(limit - len(scored), _scored(batch, due)))
+
+    rows = {
+        row['id']: row
+        for row in PurchaseOrder.objects.filter(id__in=[id for _, _, id in scored]).values(*ROW_FIELDS)
+    }
+    return dict(
+        count=pending.count(),
+        results=[
+            dict(
+                po_number=rows[id]['po_number'],
+                vendor=rows[id]['vendor__code'],
+                delivery_date=delivery_date,
+                acknowledged=rows[id]['acknowledgment_date'] is not None,
+                overdue=delivery_date < now,
+                risk=-risk,
+                expected_days_late=rows[id]['vendor__risk_features__weighted_lateness'],
+            )
+            for risk, delivery_date, id in scored
+        ],
+    )
@@ -0,0 +1,148 @@
+"""
+Daily, weekly and monthly rollups of `HistoricalPerformance` snapshots.
+
+Each snapshot is added to the three `PerformanceRollup` rows of the periods
+it falls in when it is recorded. The rollups only ever grow: deleting
+snapshots does not change them. Snapshots compacted by `VendorInfo.retention`
+count as their `sample_count` snapshots.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import HistoricalPerformance, PerformanceRollup
+from .utils import increment_or_create
+
+SNAPSHOT_FIELDS = (
+    'on_time_delivery_rate',
+    'quality_rating_avg',
+    'average_response_time',
+    'fulfillment_rate',
+)
+
+TRUNCATE = {
+    PerformanceRollup.Granularity.DAY: TruncDay,
+    PerformanceRollup.Granularity.WEEK: TruncWeek,
+    PerformanceRollup.Granularity.MONTH: TruncMonth,
+}
+
+
+def period_start(value, granularity):
+    """Start of the period of `granularity` containing `value`, in the current time zone."""
+    day = timezone.localtime(value).date()
+    if granularity == PerformanceRollup.Granularity.WEEK:
+        day -= timedelta(days=day.weekday())
+    elif granularity == PerformanceRollup.Granularity.MONTH:
+        day = day.replace(day=1)
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def record_snapshots(snapshots):
+    """Add newly created snapshots to their rollups."""
+    for snapshot in snapshots:
+        if not snapshot.date:
+            continue
+        increments = dict(
+            sample_count=snapshot.sample_count,
+            **{
+                f'{field}_total': getattr(snapshot, field) * snapshot.sample_count
+                for field in SNAPSHOT_FIELDS
+            },
+        )
+        for granularity in PerformanceRollup.Granularity:
+            increment_or_create(
+                PerformanceRollup,
+                dict(
+                    vendor_id=snapshot.vendor_id,
+                    granularity=granularity,
+                    period_start=period_start(snapshot.date, granularity),
+                ),
+                increments,
+            )
+
+
+def _trend_rows(vendor_id, granularity, start=None, end=None):
+    rollups = PerformanceRollup.objects.filter(
+        vendor_id=vendor_id, 
+        granularity=granularity,
+    )
+    if start:
+        rollups = rollups.filter(period_start__gte=period_start(start, granularity))
+    if end:
+        rollups = rollups.filter(period_start__lt=end)
+
+    return rollups.order_by('period_start').values_list(
+        'period_start', 
+        'sample_count', 
+        *(f'{field}_total' for field in SNAPSHOT_FIELDS),
+    )
+
+
+def _trend_point(start, samples, *totals):
+    return dict(
+        period_start=start,
+        samples=samples,
+        **{
+            field: total / samples 
+            for field, total in zip(SNAPSHOT_FIELDS, totals)
+        },
+    )
+
+
+def trend(vendor_id, granularity, start=None, end=None):
+    """
+    Average metrics per period between `start` (inclusive) and `end` (exclusive).
+
+    Answered from the rollups with a single range scan of the
+    `(vendor, granularity, period_start)` unique index.
+    """
+    return [
+        _trend_point(*row)
+        for row in _trend_rows(vendor_id, granularity, start, end) if row[1]
+    ]
+
+
+async def atrend(vendor_id, granularity, start=None, end=None):
+    """Async variant of `trend`."""
+    return [
+        _trend_point(*row)
+        async for row in _trend_rows(vendor_id, granularity, start, end) if row[1]
+    ]
+
+
+def rebuild_rollups(vendor_ids=None):
+    """Recompute every rollup from the snapshots with one grouped query per granularity."""
+    snapshots = HistoricalPerformance.objects.filter(date__isnull=False)
+    rollups = PerformanceRollup.objects.all()
+    if vendor_ids is not None:
+        snapshots = snapshots.filter(vendor_id__in=vendor_ids)
+        rollups = rollups.filter(vendor_id__in=vendor_ids)
+
+    with transaction.atomic():
+        rollups.delete()
+        for granularity, truncate in TRUNCATE.items():
+            rows = (
+                snapshots.order_by()
+                .annotate(period=truncate('date'))
+                .values('vendor_id', 'period')
+                #NOTE: The totals come first, `F('sample_count')` is the
+                #column until the annotation of the same name is added.
+                .annotate(
+                    **{f'{field}_total': Sum(F(field) * F('sample_count')) for field in SNAPSHOT_FIELDS},
+                    sample_count=Sum('sample_count'),
+                )
+            )
+            PerformanceRollup.objects.bulk_create(
+                (
+                    PerformanceRollup(
+                        granularity=granularity, 
+                        period_start=row.pop('period'), 
+                        **row,
+                    )
+                    for row in rows.iterator()
+                ),
+                batch_size=500,
+            )
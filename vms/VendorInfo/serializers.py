@@ -1,9 +1,131 @@
+from django.conf import settings
+from django.db import transaction
 from rest_framework import serializers
 
-from .models import Vendor, PurchaseOrder
+from .cache import invalidate_vendors
+from .changes import record_changes
+from .instrumentation import timed
+from .line_items import sync_line_items
+from .metrics import record_purchase_order_changes
+from .models import Vendor, PurchaseOrder, HistoricalPerformance, ChangeLogEntry, save_with_identifiers
 
 
-class PurchaseOrderSerializer(serializers.ModelSerializer):
+def vendor_pk(data):
+    """The vendor primary key of `data`, `None` unless it is an integer or a string of digits."""
+    if isinstance(data, bool):
+        return None
+    if isinstance(data, int):
+        return data
+    if isinstance(data, float) and data.is_integer():
+        return int(data)
+    if isinstance(data, str) and data.isdigit():
+        return int(data)
+    return None
+
+
+class VendorPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Resolves vendors from the `vendors` prefetched into the context, if any."""
+
+    def to_internal_value(self, data):
+        #NOTE: Checked before the lookup, `Vendor.objects.get(pk=True)` or `pk=1.7` finds vendor 1.
+        pk = vendor_pk(data)
+        if pk is None:
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        vendors = self.context.get('vendors')
+        if vendors is None:
+            return super().to_internal_value(pk)
+        try:
+            return vendors[pk]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+
+
+class PurchaseOrderListSerializer(serializers.ListSerializer):
+    """
+    Validates and creates purchase orders in bulk.
+
+    Rows are validated independently: invalid rows are reported in
+    `row_errors` (keyed by their position in the input) instead of failing
+    the whole batch, and `row_indexes` holds the position of every row in
+    `validated_data`.
+    """
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            raise serializers.ValidationError(
+                {'non_field_errors': ['Expected a list of purchase orders.']}
+            )
+        if not data:
+            raise serializers.ValidationError(
+                {'non_field_errors': ['Expected at least one purchase order.']}
+            )
+
+        # Resolve every referenced vendor with one query instead of one per row.
+        vendor_ids = set()
+        for item in data:
+            pk = vendor_pk(item.get('vendor')) if isinstance(item, dict) else None
+            if pk is not None:
+                vendor_ids.add(pk)
+        self._context['vendors'] = Vendor.objects.in_bulk(vendor_ids)
+
+        self.row_errors = {}
+        self.row_indexes = []
+        validated = []
+        for index, item in enumerate(data):
+            try:
+                validated.append(self.run_child_validation(item))
+            except serializers.ValidationError as exc:
+                self.row_errors[index] = exc.detail
+            else:
+                self.row_indexes.append(index)
+        return validated
+
+    def create(self, validated_data):
+        batch_size = self.context.get('batch_size') or settings.VMS_BULK_CREATE_BATCH_SIZE
+        purchase_orders = [PurchaseOrder(**attrs) for attrs in validated_data]
+        for purchase_order in purchase_orders:
+            purchase_order.stamp_completion()
+
+        def insert():
+            PurchaseOrder.objects.bulk_create(purchase_orders, batch_size=batch_size)
+            sync_line_items(purchase_orders, created=True)
+            record_purchase_order_changes(
+                (None, purchase_order.performance_state())
+                for purchase_order in purchase_orders
+            )
+            #NOTE: `bulk_create` does not send `post_save`.
+            invalidate_vendors({purchase_order.vendor_id for purchase_order in purchase_orders})
+            record_changes(
+                ChangeLogEntry.Kind.PURCHASE_ORDER,
+                ChangeLogEntry.Action.CREATED,
+                (
+                    (purchase_order.pk, purchase_order.po_number, purchase_order.vendor_id)
+                    for purchase_order in purchase_orders
+                ),
+            )
+
+        with transaction.atomic():
+            save_with_identifiers(purchase_orders, 'po_number', insert)
+        return purchase_orders
+
+
+class SparseFieldsMixin:
+    """Serializes only the fields in the `fields` context, all of them when it is `None`."""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selected = self.context.get('fields')
+        if selected is None:
+            return fields
+        return {name: field for name, field in fields.items() if name in selected}
+
+    @timed('serialize')
+    def to_representation(self, instance):
+        return super().to_representation(instance)
+
+
+class PurchaseOrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    vendor = VendorPrimaryKeyRelatedField(queryset=Vendor.objects.all())
     vendor_name = serializers.ReadOnlyField(source='vendor.name')
     vendor_contact_details = serializers.ReadOnlyField(source='vendor.contact_details')
     vendor_address = serializers.ReadOnlyField(source='vendor.address')
@@ -20,9 +142,10 @@ class PurchaseOrderSerializer(serializers.ModelSerializer):
             'updated_at'
         )
         read_only_fields = ('po_number',) #NOTE: This should be auto-generated by the system
+        list_serializer_class = PurchaseOrderListSerializer
 
 
-class VendorSerializer(serializers.ModelSerializer):
+class VendorSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     purchase_orders = serializers.SerializerMethodField()
 
     class Meta:
@@ -31,10 +154,37 @@ class VendorSerializer(serializers.ModelSerializer):
             'created_at', 
             'updated_at'
         )
-        read_only_fields = ('code',) #NOTE: This should be auto-generated by the system
+        read_only_fields = (
+            'code', #NOTE: This should be auto-generated by the system
+            #NOTE: Metrics are derived from the purchase orders, see `VendorInfo.metrics`.
+            'on_time_delivery_rate',
+            'quality_rating_avg',
+            'average_response_time',
+            'fulfillment_rate',
+        )
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self.context.get('expand_purchase_orders', True):
+            fields.pop('purchase_orders', None)
+        return fields
     
     def get_purchase_orders(self, obj):
+        #NOTE: Views prefetch the (possibly capped) purchase orders into `purchase_orders`.
+        purchase_orders = getattr(obj, 'purchase_orders', None)
+        if purchase_orders is None:
+            purchase_orders = obj.purchaseorder_set.all()
         return PurchaseOrderSerializer(
-            obj.purchase_orders, 
+            purchase_orders, 
             many=True,
         ).data
+
+
+class HistoricalPerformanceSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = HistoricalPerformance
+        exclude = (
+            'created_at',
+            'updated_at'
+        )
@@ -1,21 +1,107 @@
-from django.utils import timezone
+from django.conf import settings
+from django.core.signals import request_started
 from django.dispatch import receiver
-from django.db.models.signals import post_save
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+
+from .authentication import invalidate_user_credentials
+from .cache import invalidate_vendor_codes, invalidate_vendors
+from .changes import record_changes
+from .instrumentation import record_query
+from .metrics import record_purchase_order_changes
+from .models import Vendor, PurchaseOrder, HistoricalPerformance, ChangeLogEntry
+from .worker import metric_refresh_worker
+
+
+@receiver(request_started)
+def start_metric_refresh_worker(sender, **kwargs):
+    #NOTE: Started by serving processes only, so pending refreshes left by a restart are picked up
+    #without management commands like `migrate` spawning the thread.
+    if settings.VMS_METRIC_REFRESH_MODE == 'thread':
+        metric_refresh_worker.start()
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    #NOTE: Installed for the lifetime of the connection, it only records while a request is timed.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def tune_sqlite_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in settings.VMS_SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+
+
+@receiver(post_save, sender=Vendor)
+@receiver(post_delete, sender=Vendor)
+def invalidate_vendor_cache(sender, instance, **kwargs):
+    invalidate_vendor_codes([instance.code])
+
+
+@receiver(post_save, sender=PurchaseOrder)
+@receiver(post_delete, sender=PurchaseOrder)
+def invalidate_purchase_order_vendor_cache(sender, instance, **kwargs):
+    #NOTE: A purchase order moved to another vendor changes both vendors.
+    previous_state = getattr(instance, '_loaded_performance_state', None) or {}
+    if PurchaseOrder.vendor.is_cached(instance) and previous_state.get('vendor_id') in (None, instance.vendor_id):
+        invalidate_vendor_codes([instance.vendor.code])
+    else:
+        invalidate_vendors([instance.vendor_id, previous_state.get('vendor_id')])
+
+
+@receiver(post_delete, sender=PurchaseOrder)
+def record_deleted_purchase_order(sender, instance, origin=None, **kwargs):
+    #NOTE: Sent for instance and queryset deletes alike. The aggregates of a deleted
+    #vendor go with it, its cascade has nothing to take out of them.
+    if isinstance(origin, Vendor) or getattr(origin, 'model', None) is Vendor:
+        return
+    previous_state = getattr(instance, '_loaded_performance_state', None)
+    if previous_state:
+        record_purchase_order_changes([(previous_state, None)])
+
+
+@receiver(post_save, sender=HistoricalPerformance)
+@receiver(post_delete, sender=HistoricalPerformance)
+def invalidate_history_vendor_cache(sender, instance, **kwargs):
+    invalidate_vendors([instance.vendor_id])
+
+
+CHANGE_KINDS = {
+    Vendor: (ChangeLogEntry.Kind.VENDOR, lambda vendor: (vendor.pk, vendor.code, vendor.pk)),
+    PurchaseOrder: (
+        ChangeLogEntry.Kind.PURCHASE_ORDER,
+        lambda purchase_order: (purchase_order.pk, purchase_order.po_number, purchase_order.vendor_id),
+    ),
+    HistoricalPerformance: (
+        ChangeLogEntry.Kind.HISTORICAL_PERFORMANCE,
+        lambda snapshot: (snapshot.pk, str(snapshot.pk), snapshot.vendor_id),
+    ),
+}
 
-from .models import Vendor
 
 @receiver(post_save, sender=Vendor)
-def create_vendor_code(sender, instance, created, **kwargs):
-    if (
-        instance.on_time_delivery_rate or 
-        instance.quality_rating_avg or 
-        instance.average_response_time or 
-        instance.fulfillment_rate
-    ):
-        instance.hisoricalperformance_set.create(
-            date=timezone.now(),
-            on_time_delivery_rate=instance.on_time_delivery_rate,
-            quality_rating_avg=instance.quality_rating_avg,
-            average_response_time=instance.average_response_time,
-            fulfillment_rate=instance.fulfillment_rate,
-        )
\ No newline at end of file
+@receiver(post_save, sender=PurchaseOrder)
+@receiver(post_save, sender=HistoricalPerformance)
+def record_saved_change(sender, instance, created, **kwargs):
+    kind, row = CHANGE_KINDS[sender]
+    action = ChangeLogEntry.Action.CREATED if created else ChangeLogEntry.Action.UPDATED
+    record_changes(kind, action, [row(instance)])
+
+
+@receiver(post_delete, sender=Vendor)
+@receiver(post_delete, sender=PurchaseOrder)
+@receiver(post_delete, sender=HistoricalPerformance)
+def record_deleted_change(sender, instance, **kwargs):
+    kind, row = CHANGE_KINDS[sender]
+    record_changes(kind, ChangeLogEntry.Action.DELETED, [row(instance)])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_cached_credentials(sender, instance, **kwargs):
+    invalidate_user_credentials(instance.pk)
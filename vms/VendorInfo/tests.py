@@ -1,3 +1,1748 @@
-from django.test import TestCase
+import gzip
+import json
+import threading
+from base64 import b64encode
+from datetime import timedelta
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Avg, Count, F
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .authentication import _bump_user_version, _credentials_key, user_version
+from .cache import get_cache, is_shared_cache
+from .checks import check_response_cache
+from .identifiers import RandomIdentifierEngine, SequenceIdentifierEngine, encode_identifier, generate_unique_identifiers
+from .instrumentation import registry
+from .metrics import AGGREGATE_FIELDS, compute_aggregates, rebuild_aggregates, rebuild_all_aggregates, verify_aggregates
+from .models import (
+    ChangeLogEntry,
+    MetricRefreshRequest,
+    Vendor,
+    PurchaseOrder,
+    PurchaseOrderLineItem,
+    HistoricalPerformance,
+    IdentifierBlock,
+    PerformanceRollup,
+    VendorPerformanceAggregate,
+    VendorRiskFeatures,
+)
+from .rankings import vendor_rank
+from .retention import compact_history
+from .risk import MAX_BATCHES, compute_risk_features, delivery_risk
+from .rollups import SNAPSHOT_FIELDS, period_start, rebuild_rollups, trend
+from .worker import metric_refresh_worker, process_metric_refreshes, retry_failed_metric_refreshes
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plans are checked with SQLite EXPLAIN QUERY PLAN')
+@override_settings(VMS_METRIC_REFRESH_MODE='manual')
+class QueryPlanTests(TestCase):
+    """Every query issued by the hot code paths must be answered from an index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('planner', password='planner')
+        cls.vendor = Vendor.objects.create(name='Acme', contact_details='-', address='-')
+        now = timezone.now()
+        cls.purchase_orders = [
+            PurchaseOrder.objects.create(
+                vendor=cls.vendor,
+                delivery_date=now + timedelta(days=index),
+                quantity=index + 1,
+                status=PurchaseOrder.PoStatus.COMPLETED if index % 2 else PurchaseOrder.PoStatus.PENDING,
+            )
+            for index in range(6)
+        ]
+        HistoricalPerformance.objects.create(
+            vendor=cls.vendor,
+            date=now,
+            on_time_delivery_rate=50,
+        )
+
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertUsesIndexes(self, func, pk_ordered=()):
+        """
+        Run `func` and check the plan of every SELECT it issued.
+
+        Tables in `pk_ordered` may be scanned in primary key order, which is
+        how keyset pages without a cursor are read.
+        """
+        with CaptureQueriesContext(connection) as context:
+            result = func()
+
+        for query in context.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = [row[-1] for row in cursor.fetchall()]
+            for step in plan:
+                words = step.split()
+                if (
+                    words[0] == 'SCAN'
+                    and words[1].startswith('VendorInfo_')
+                    and 'USING' not in words
+                    and words[1] not in pk_ordered
+                ):
+                    self.fail(f'Full table scan in {sql}\n' + '\n'.join(plan))
+        return result
+
+    def test_vendor_detail(self):
+        self.assertUsesIndexes(
+            lambda: self.client.get(f'/api/vendors/vendor/{self.vendor.code}')
+        )
+
+    def test_vendor_list_with_capped_purchase_orders(self):
+        response = self.assertUsesIndexes(
+            lambda: self.client.get('/api/vendors/vendor?page_size=1&expand=purchase_orders&po_limit=2'),
+            pk_ordered=('VendorInfo_vendor',),
+        )
+        self.assertEqual(len(response.data['results'][0]['purchase_orders']), 2)
+
+    def test_purchase_order_list_pages(self):
+        response = self.assertUsesIndexes(
+            lambda: self.client.get('/api/vendors/vendor-purchase-order?page_size=2'),
+            pk_ordered=('VendorInfo_purchaseorder',),
+        )
+        self.assertUsesIndexes(lambda: self.client.get(response.data['next']))
+
+    def test_purchase_order_list_filtered_with_fields(self):
+        response = self.assertUsesIndexes(
+            lambda: self.client.get(
+                f'/api/vendors/vendor-purchase-order?vendor={self.vendor.code}&status=COMPLETED'
+                '&ordering=-delivery_date&fields=po_number,status'
+            )
+        )
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertEqual(set(response.data['results'][0]), {'po_number', 'status'})
+
+    def test_purchase_orders_by_sku(self):
+        first, second = self.purchase_orders[:2]
+        first.items = {'SKU-1': 2, 'SKU-2': {'quantity': 1, 'unit_price': 9.5}}
+        first.save()
+        second.items = [{'sku': 'SKU-1', 'quantity': 4}]
+        second.save()
+        self.assertEqual(
+            set(PurchaseOrderLineItem.objects.values_list('purchase_order_id', 'sku', 'quantity', 'unit_price')),
+            {(first.pk, 'SKU-1', 2, None), (first.pk, 'SKU-2', 1, 9.5), (second.pk, 'SKU-1', 4, None)},
+        )
+
+        response = self.assertUsesIndexes(
+            lambda: self.client.get('/api/vendors/vendor-purchase-order?sku=SKU-1&fields=-items')
+        )
+        self.assertEqual([row['po_number'] for row in response.data['results']], [first.po_number, second.po_number])
+        self.assertNotIn('items', response.data['results'][0])
+        self.assertIn('vendor_name', response.data['results'][0])
+
+        first.items = {'SKU-2': 1}
+        first.save()
+        response = self.client.get('/api/vendors/vendor-purchase-order?sku=SKU-1')
+        self.assertEqual([row['po_number'] for row in response.data['results']], [second.po_number])
+
+    def test_purchase_order_detail(self):
+        po_number = self.purchase_orders[0].po_number
+        self.assertUsesIndexes(
+            lambda: self.client.get(f'/api/vendors/vendor-purchase-order/{po_number}')
+        )
+
+    def test_performance_trend(self):
+        self.assertUsesIndexes(
+            lambda: self.client.get(
+                f'/api/vendors/vendor-performance/{self.vendor.code}/performance'
+                '?granularity=week&from=2024-01-01'
+            )
+        )
+
+    def test_vendor_comparison(self):
+        other = Vendor.objects.create(name='Other', contact_details='-', address='-')
+        response = self.assertUsesIndexes(
+            lambda: self.client.get(
+                f'/api/vendors/vendor-performance/compare?vendors={other.code},missing,{self.vendor.code}'
+            )
+        )
+        self.assertEqual([row['code'] for row in response.data['results']], [other.code, self.vendor.code])
+        self.assertEqual(response.data['not_found'], ['missing'])
+        performance = self.client.get(f'/api/vendors/vendor-performance/{self.vendor.code}/performance').data
+        self.assertEqual({key: response.data['results'][1][key] for key in performance}, performance)
+
+        response = self.assertUsesIndexes(
+            lambda: self.client.get('/api/vendors/vendor-performance/compare?limit=1&min_quality_rating=0'),
+            pk_ordered=('VendorInfo_vendor',),
+        )
+        self.assertEqual([row['code'] for row in response.data['results']], [self.vendor.code])
+        for query in ('limit=0', 'min_quality_rating=high', 'vendors=' + ','.join(map(str, range(501)))):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'/api/vendors/vendor-performance/compare?{query}').status_code, 400)
+
+    def test_change_feed(self):
+        response = self.assertUsesIndexes(
+            lambda: self.client.get('/api/vendors/changes?since=1&kinds=purchase_order,vendor')
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_vendor_ranking(self):
+        for query in (
+            'metric=on_time_delivery_rate&limit=3',
+            'metric=average_response_time&order=bottom&limit=3',
+            f'metric=quality_rating_avg&vendor={self.vendor.code}',
+        ):
+            with self.subTest(query=query):
+                response = self.assertUsesIndexes(
+                    lambda: self.client.get(f'/api/vendors/vendor-performance/ranking?{query}')
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_acknowledgement(self):
+        po_number = self.purchase_orders[0].po_number
+        self.assertUsesIndexes(
+            lambda: self.client.patch(
+                f'/api/vendors/vendor-performance/{po_number}/acknowledgement',
+                dict(acknowledged=True),
+                format='json',
+            )
+        )
+
+    def test_bulk_acknowledgement(self):
+        po_numbers = [purchase_order.po_number for purchase_order in self.purchase_orders[:3]]
+        response = self.assertUsesIndexes(
+            lambda: self.client.post(
+                '/api/vendors/vendor-performance/acknowledgements',
+                dict(po_numbers=po_numbers + ['missing']),
+                format='json',
+            )
+        )
+        self.assertEqual(response.data['acknowledged'], po_numbers)
+        self.assertEqual(response.data['not_found'], ['missing'])
+
+    def test_purchase_order_export_of_vendor(self):
+        content = self.assertUsesIndexes(
+            lambda: b''.join(
+                self.client.get(
+                    f'/api/vendors/export/purchase-orders?vendor={self.vendor.code}&status=COMPLETED'
+                ).streaming_content
+            )
+        )
+        self.assertEqual(len(content.splitlines()), 4)
+
+    def test_metric_refresh_worker(self):
+        self.assertUsesIndexes(lambda: process_metric_refreshes(window=0))
+
+    def test_aggregate_recompute(self):
+        self.assertUsesIndexes(lambda: compute_aggregates([self.vendor.pk]))
+
+    def test_chunked_aggregate_rebuild(self):
+        Vendor.objects.create(name='Idle', contact_details='-', address='-')
+        self.assertEqual(self.assertUsesIndexes(lambda: list(rebuild_all_aggregates(chunk_size=1))), [1, 2])
+        self.assertEqual(verify_aggregates(), [])
+
+    def test_delivery_risk(self):
+        for query in ('limit=3', f'vendor={self.vendor.code}&from=2024-01-01'):
+            with self.subTest(query=query):
+                response = self.assertUsesIndexes(
+                    lambda: self.client.get(f'/api/vendors/vendor-performance/delivery-risk?{query}'),
+                    pk_ordered=('VendorInfo_vendor', 'VendorInfo_vendorriskfeatures'),
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_completed_purchase_orders_of_vendor(self):
+        self.assertUsesIndexes(
+            lambda: list(
+                PurchaseOrder.objects.filter(
+                    vendor=self.vendor,
+                    status=PurchaseOrder.PoStatus.COMPLETED,
+                ).order_by('-completion_date')[:50]
+            )
+        )
+
+    def test_unacknowledged_purchase_orders_of_vendor(self):
+        self.assertUsesIndexes(
+            lambda: list(
+                PurchaseOrder.objects.filter(
+                    vendor=self.vendor,
+                    acknowledgment_date__isnull=True,
+                ).order_by('issue_date')
+            )
+        )
+
+    def test_pending_purchase_orders_by_delivery_date(self):
+        now = timezone.now()
+        self.assertUsesIndexes(
+            lambda: list(
+                PurchaseOrder.objects.filter(
+                    status=PurchaseOrder.PoStatus.PENDING,
+                    delivery_date__range=(now, now + timedelta(days=7)),
+                )
+            )
+        )
+
+
+@override_settings(VMS_METRIC_REFRESH_MODE='manual')
+@override_settings(
+    VMS_IDENTIFIER_ENGINE='VendorInfo.identifiers.SequenceIdentifierEngine',
+    VMS_IDENTIFIER_BLOCK_SIZE=4,
+)
+class IdentifierEngineTests(TestCase):
+
+    def next_value(self, _for):
+        block = IdentifierBlock.objects.filter(name=_for).first()
+        return block.next_value if block else 0
+
+    def test_block_allocation(self):
+        engine = SequenceIdentifierEngine()
+        #NOTE: Created with the first block otherwise.
+        IdentifierBlock.objects.create(name='code')
+        #NOTE: A savepoint, the `UPDATE` reserving the block and the read of its end.
+        with self.assertNumQueries(4):
+            first = engine.generate('code', 3)
+        self.assertEqual(self.next_value('code'), 4)
+        with self.assertNumQueries(0):
+            second = engine.generate('code')
+        with self.assertNumQueries(4):
+            third = engine.generate('code', 2)
+        self.assertEqual(self.next_value('code'), 8)
+        self.assertEqual(first + second + third, [encode_identifier('code', value) for value in range(6)])
+
+        #NOTE: The rest of the block is used first, the remainder of a request
+        #larger than a block is reserved at once.
+        with self.assertNumQueries(4):
+            fourth = engine.generate('code', 10)
+        self.assertEqual(fourth, [encode_identifier('code', value) for value in range(6, 16)])
+        self.assertEqual(self.next_value('code'), 16)
+
+    def test_unique_across_blocks(self):
+        engines = [SequenceIdentifierEngine(), SequenceIdentifierEngine()]
+        identifiers = []
+        for count in range(1, 8):
+            for engine in engines:
+                identifiers.extend(engine.generate('code', count))
+        self.assertEqual(len(identifiers), 56)
+        self.assertEqual(len(set(identifiers)), 56)
+        self.assertTrue(all(len(identifier) == 6 for identifier in identifiers))
+
+        po_numbers = engines[0].generate('po_number', 5)
+        self.assertEqual(len(set(po_numbers)), 5)
+        self.assertRegex(po_numbers[0], r'^\d{4}[A-Z][a-z]{2}-[A-Za-z0-9]{6}$')
+
+    def test_sequences_do_not_collide(self):
+        codes = [encode_identifier('code', value) for value in range(1000)]
+        suffixes = [encode_identifier('po_number', value).partition('-')[2] for value in range(1000)]
+        self.assertTrue(all(code != suffix for code, suffix in zip(codes, suffixes)))
+        self.assertFalse(set(codes) & set(suffixes))
+        with self.settings(SECRET_KEY='another'):
+            self.assertNotEqual(encode_identifier('code', 0), codes[0])
+
+    def test_fallback_on_collision(self):
+        start = self.next_value('code')
+        #NOTE: Taken before the engine issues it, e.g. by an older engine.
+        Vendor.objects.create(name='Old', contact_details='-', address='-', code=encode_identifier('code', start))
+        self.assertEqual(self.next_value('code'), start)
+
+        vendor = Vendor.objects.create(name='New', contact_details='-', address='-')
+        #NOTE: The block of the taken code is discarded, the next one is used.
+        self.assertEqual(vendor.code, encode_identifier('code', start + 4))
+        self.assertEqual(self.next_value('code'), start + 8)
+
+    def test_random_engine_skips_taken(self):
+        taken = Vendor.objects.create(name='Old', contact_details='-', address='-', code='aaaaaa').code
+        with mock.patch.object(RandomIdentifierEngine, 'generate', side_effect=[[taken], ['bbbbbb'], ['cccccc']]):
+            with self.settings(VMS_IDENTIFIER_ENGINE='VendorInfo.identifiers.RandomIdentifierEngine'):
+                identifiers = generate_unique_identifiers('code', 2, Vendor.objects.all(), 'code')
+        self.assertEqual(sorted(identifiers), ['bbbbbb', 'cccccc'])
+
+
+class AggregateAssertionsMixin:
+    """Compares the stored aggregate counters with a full recompute."""
+
+    def assertAggregatesMatch(self, *vendors):
+        for vendor in vendors:
+            stored = (
+                VendorPerformanceAggregate.objects.filter(vendor_id=vendor.pk).values(*AGGREGATE_FIELDS).first()
+                or dict.fromkeys(AGGREGATE_FIELDS, 0)
+            )
+            expected = compute_aggregates([vendor.pk]).get(vendor.pk, dict.fromkeys(AGGREGATE_FIELDS, 0))
+            for field in AGGREGATE_FIELDS:
+                with self.subTest(vendor=vendor.code, field=field):
+                    self.assertAlmostEqual(stored[field], expected[field])
+
+
+@override_settings(VMS_METRIC_REFRESH_MODE='manual')
+class AggregateTests(AggregateAssertionsMixin, TestCase):
+
+    def setUp(self):
+        self.vendor = Vendor.objects.create(name='Acme', contact_details='-', address='-')
+        self.purchase_orders = [
+            PurchaseOrder.objects.create(
+                vendor=self.vendor,
+                delivery_date=timezone.now() + timedelta(days=1),
+                quantity=1,
+                status=PurchaseOrder.PoStatus.COMPLETED,
+                quality_rating=index + 1,
+            )
+            for index in range(3)
+        ]
+        process_metric_refreshes(window=0)
+
+    def test_incremental_writes(self):
+        other = Vendor.objects.create(name='Other', contact_details='-', address='-')
+        pending = PurchaseOrder.objects.create(
+            vendor=self.vendor,
+            delivery_date=timezone.now() + timedelta(days=1),
+            quantity=1,
+            acknowledgment_date=timezone.now() + timedelta(hours=5),
+        )
+        self.assertAggregatesMatch(self.vendor, other)
+
+        updated = self.purchase_orders[0]
+        updated.status = PurchaseOrder.PoStatus.PENDING
+        updated.save()
+        pending.quality_rating = 4
+        pending.status = PurchaseOrder.PoStatus.COMPLETED
+        pending.save()
+        self.assertAggregatesMatch(self.vendor, other)
+
+        moved = self.purchase_orders[1]
+        moved.vendor = other
+        moved.save()
+        self.assertAggregatesMatch(self.vendor, other)
+
+        self.purchase_orders[2].delete()
+        self.assertAggregatesMatch(self.vendor, other)
+        process_metric_refreshes(window=0)
+        self.assertEqual(verify_aggregates(), [])
+
+    def test_update_fields_status(self):
+        pending = PurchaseOrder.objects.create(
+            vendor=self.vendor,
+            delivery_date=timezone.now() + timedelta(days=1),
+            quantity=1,
+        )
+        pending.status = PurchaseOrder.PoStatus.COMPLETED
+        pending.save(update_fields=['status'])
+        self.assertIsNotNone(PurchaseOrder.objects.get(pk=pending.pk).completion_date)
+        self.assertAggregatesMatch(self.vendor)
+        process_metric_refreshes(window=0)
+        self.assertEqual(verify_aggregates([self.vendor.pk]), [])
+
+    def test_update_fields_unsaved_changes(self):
+        pending = PurchaseOrder.objects.create(
+            vendor=self.vendor,
+            delivery_date=timezone.now() + timedelta(days=1),
+            quantity=1,
+        )
+        pending.status = PurchaseOrder.PoStatus.COMPLETED
+        pending.quality_rating = 5
+        pending.acknowledgment_date = timezone.now()
+        pending.quantity = 2
+        pending.save(update_fields=['quantity'])
+        stored = PurchaseOrder.objects.get(pk=pending.pk)
+        self.assertEqual((stored.status, stored.quantity), (PurchaseOrder.PoStatus.PENDING, 2))
+        self.assertAggregatesMatch(self.vendor)
+
+        other = Vendor.objects.create(name='Other', contact_details='-', address='-')
+        stored.vendor = other
+        stored.quality_rating = 5
+        stored.save(update_fields=['vendor'])
+        self.assertAggregatesMatch(self.vendor, other)
+        process_metric_refreshes(window=0)
+        self.assertEqual(verify_aggregates([self.vendor.pk, other.pk]), [])
+
+    def test_queryset_updates(self):
+        other = Vendor.objects.create(name='Other', contact_details='-', address='-')
+        self.assertEqual(PurchaseOrder.objects.filter(quality_rating=1).update(vendor=other), 1)
+        self.assertEqual(
+            PurchaseOrder.objects.filter(vendor=self.vendor).update(status=PurchaseOrder.PoStatus.PENDING), 2,
+        )
+        self.assertFalse(PurchaseOrder.objects.filter(vendor=self.vendor, completion_date__isnull=False).exists())
+        PurchaseOrder.objects.filter(vendor=other).update(quality_rating=F('quality_rating') + 1)
+        self.assertAggregatesMatch(self.vendor, other)
+
+        PurchaseOrder.objects.filter(vendor=self.vendor).update(status=PurchaseOrder.PoStatus.COMPLETED)
+        self.assertFalse(PurchaseOrder.objects.filter(completion_date__isnull=True).exists())
+        self.assertAggregatesMatch(self.vendor, other)
+        process_metric_refreshes(window=0)
+        self.assertEqual(verify_aggregates([self.vendor.pk, other.pk]), [])
+
+        #NOTE: Updates of other fields leave the aggregates alone.
+        with self.assertNumQueries(1):
+            PurchaseOrder.objects.filter(vendor=other).update(quantity=2)
+
+    def test_queryset_deletes(self):
+        other = Vendor.objects.create(name='Other', contact_details='-', address='-')
+        PurchaseOrder.objects.create(
+            vendor=other,
+            delivery_date=timezone.now() - timedelta(days=1),
+            quantity=1,
+            status=PurchaseOrder.PoStatus.COMPLETED,
+        )
+        PurchaseOrder.objects.filter(pk=self.purchase_orders[0].pk).delete()
+        self.assertAggregatesMatch(self.vendor, other)
+        PurchaseOrder.objects.filter(pk=self.purchase_orders[1].pk).only('id').delete()
+        self.assertAggregatesMatch(self.vendor, other)
+        other.purchaseorder_set.all().delete()
+        self.assertAggregatesMatch(self.vendor, other)
+
+        process_metric_refreshes(window=0)
+        self.assertEqual(verify_aggregates(), [])
+
+    def test_vendor_cascade(self):
+        self.vendor.delete()
+        self.assertFalse(VendorPerformanceAggregate.objects.exists())
+        self.assertFalse(PurchaseOrder.objects.exists())
+
+    def test_verify_reports_drift(self):
+        self.assertEqual(verify_aggregates([self.vendor.pk]), [])
+        VendorPerformanceAggregate.objects.filter(vendor=self.vendor).update(total_po_count=F('total_po_count') + 1)
+        self.assertIn((self.vendor.code, 'total_po_count', 4, 3), verify_aggregates([self.vendor.pk]))
+
+
+class FastReadTests(TestCase):
+    """Reads served from `values()` rows must match the DRF serializers byte for byte."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader', password='reader')
+        now = timezone.now()
+        cls.vendors = [
+            Vendor.objects.create(name=f'Vendor {index}', contact_details='-', address='-')
+            for index in range(2)
+        ]
+        for vendor in cls.vendors:
+            for index in range(3):
+                PurchaseOrder.objects.create(
+                    vendor=vendor,
+                    delivery_date=now + timedelta(days=index),
+                    items={'SKU-1': index},
+                    quantity=index + 1,
+                    status=PurchaseOrder.PoStatus.COMPLETED if index % 2 else PurchaseOrder.PoStatus.PENDING,
+                )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertSameResponses(self, path):
+        responses = []
+        for fast_reads in (False, True):
+            get_cache().clear()
+            with self.settings(VMS_FAST_READS=fast_reads):
+                response = self.client.get(path)
+            responses.append((response.status_code, response.content))
+        self.assertEqual(responses[0], responses[1])
+
+    def test_vendors(self):
+        code = self.vendors[0].code
+        for path in (
+            '/api/vendors/vendor?expand=purchase_orders&po_limit=2',
+            '/api/vendors/vendor?fields=code,name&ordering=-name',
+            f'/api/vendors/vendor/{code}',
+            '/api/vendors/vendor/missing',
+        ):
+            with self.subTest(path=path):
+                self.assertSameResponses(path)
+
+    def test_purchase_orders(self):
+        po_number = PurchaseOrder.objects.first().po_number
+        for path in (
+            '/api/vendors/vendor-purchase-order?page_size=4',
+            '/api/vendors/vendor-purchase-order?status=COMPLETED&fields=po_number,vendor_name,delivery_date',
+            f'/api/vendors/vendor-purchase-order/{po_number}',
+        ):
+            with self.subTest(path=path):
+                self.assertSameResponses(path)
+
+
+@override_settings(VMS_METRIC_REFRESH_MODE='manual', VMS_RESPONSE_CACHE=True)
+class ResponseCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cached', password='cached')
+        cls.vendor = Vendor.objects.create(name='Acme', contact_details='-', address='-')
+        cls.purchase_order = PurchaseOrder.objects.create(
+            vendor=cls.vendor,
+            delivery_date=timezone.now() + timedelta(days=1),
+            quantity=1,
+        )
+
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.paths = (
+            f'/api/vendors/vendor/{self.vendor.code}',
+            f'/api/vendors/vendor-performance/{self.vendor.code}/performance',
+        )
+
+    def etags(self):
+        return [self.client.get(path)['ETag'] for path in self.paths]
+
+    def assertInvalidatedBy(self, write):
+        etags = self.etags()
+        for path, etag in zip(self.paths, etags):
+            self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+        for path, etag in zip(self.paths, etags):
+            response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+
+    def test_invalidated_by_writes(self):
+        delivery_date = (timezone.now() + timedelta(days=2)).isoformat()
+        writes = dict(
+            vendor_update=lambda: self.client.patch(
+                f'/api/vendors/vendor/{self.vendor.code}', dict(name='Acme Ltd'), format='json',
+            ),
+            purchase_order_create=lambda: PurchaseOrder.objects.create(
+                vendor=self.vendor, delivery_date=timezone.now(), quantity=2,
+            ),
+            bulk_create=lambda: self.client.post(
+                '/api/vendors/vendor-purchase-order/bulk',
+                [dict(vendor=self.vendor.pk, delivery_date=delivery_date, quantity=1)],
+                format='json',
+            ),
+            acknowledgements=lambda: self.client.post(
+                '/api/vendors/vendor-performance/acknowledgements',
+                dict(po_numbers=[self.purchase_order.po_number]),
+                format='json',
+            ),
+            metric_refresh=lambda: process_metric_refreshes(window=0),
+            queryset_delete=lambda: PurchaseOrder.objects.exclude(pk=self.purchase_order.pk).delete(),
+        )
+        for name, write in writes.items():
+            with self.subTest(write=name):
+                self.assertInvalidatedBy(write)
+        self.assertEqual(self.client.get(self.paths[0]).data['name'], 'Acme Ltd')
+
+    def test_not_invalidated_before_commit(self):
+        etags = self.etags()
+        with self.captureOnCommitCallbacks() as callbacks:
+            PurchaseOrder.objects.create(vendor=self.vendor, delivery_date=timezone.now(), quantity=2)
+            self.assertEqual(self.etags(), etags)
+        self.assertTrue(callbacks)
+
+    def test_local_memory_cache_check(self):
+        self.assertEqual([warning.id for warning in check_response_cache(None)], ['VendorInfo.W001'])
+        with self.settings(VMS_RESPONSE_CACHE=None):
+            self.assertEqual(check_response_cache(None), [])
+
+    @override_settings(VMS_RESPONSE_CACHE=None)
+    def test_local_memory_cache(self):
+        self.assertFalse(is_shared_cache())
+        response = self.client.get(self.paths[0])
+        self.assertNotIn('ETag', response)
+        #NOTE: Not signalled, a cached response would still have the old name.
+        Vendor.objects.filter(pk=self.vendor.pk).update(name='Renamed')
+        self.assertEqual(self.client.get(self.paths[0]).data['name'], 'Renamed')
+
+    def test_shared_cache(self):
+        with TemporaryDirectory() as directory:
+            with self.settings(
+                VMS_RESPONSE_CACHE=None,
+                CACHES={'default': {
+                    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                    'LOCATION': directory,
+                }},
+            ):
+                self.assertTrue(is_shared_cache())
+                self.assertInvalidatedBy(lambda: process_metric_refreshes(window=0))
+
+
+@override_settings(VMS_METRIC_REFRESH_MODE='manual')
+class ListEndpointTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('lister', password='lister')
+        now = timezone.now()
+        cls.vendors = [
+            Vendor.objects.create(name=name, contact_details='-', address='-')
+            for name in ('Delta', 'Alpha', 'Echo', 'Charlie', 'Bravo')
+        ]
+        cls.purchase_orders = [
+            PurchaseOrder.objects.create(
+                vendor=cls.vendors[0],
+                delivery_date=now + timedelta(days=(index * 3) % 5),
+                quantity=index + 1,
+            )
+            for index in range(5)
+        ]
+
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def pages(self, path):
+        results = []
+        while path:
+            response = self.client.get(path)
+            self.assertEqual(response.status_code, 200)
+            results.extend(response.data['results'])
+            path = response.data['next']
+        return results
+
+    def test_cursor_pages_with_ordering(self):
+        for fast_reads in (False, True):
+            with self.subTest(fast_reads=fast_reads), self.settings(VMS_FAST_READS=fast_reads):
+                self.assertEqual(
+                    [vendor['name'] for vendor in self.pages('/api/vendors/vendor?ordering=name&page_size=2')],
+                    ['Alpha', 'Bravo', 'Charlie', 'Delta', 'Echo'],
+                )
+                self.assertEqual(
+                    [vendor['name'] for vendor in self.pages('/api/vendors/vendor?ordering=-name&page_size=2')],
+                    ['Echo', 'Delta', 'Charlie', 'Bravo', 'Alpha'],
+                )
+                self.assertEqual(
+                    [
+                        purchase_order['po_number'] for purchase_order in
+                        self.pages('/api/vendors/vendor-purchase-order?ordering=delivery_date&page_size=2')
+                    ],
+                    [
+                        purchase_order.po_number for purchase_order in
+                        sorted(self.purchase_orders, key=lambda purchase_order: (purchase_order.delivery_date, purchase_order.pk))
+                    ],
+                )
+                self.assertEqual(
+                    [vendor['code'] for vendor in self.pages('/api/vendors/vendor?page_size=3')],
+                    [vendor.code for vendor in self.vendors],
+                )
+
+    def test_expand_purchase_orders(self):
+        code = self.vendors[0].code
+        newest_first = [purchase_order.po_number for purchase_order in reversed(self.purchase_orders)]
+        for fast_reads in (False, True):
+            with self.subTest(fast_reads=fast_reads), self.settings(VMS_FAST_READS=fast_reads):
+                listed = self.client.get('/api/vendors/vendor').data['results']
+                self.assertNotIn('purchase_orders', listed[0])
+
+                expanded = self.client.get('/api/vendors/vendor?expand=purchase_orders').data['results']
+                self.assertEqual(
+                    [purchase_order['po_number'] for purchase_order in expanded[0]['purchase_orders']],
+                    newest_first,
+                )
+                self.assertEqual(expanded[1]['purchase_orders'], [])
+
+                capped = self.client.get('/api/vendors/vendor?expand=purchase_orders&po_limit=2').data['results']
+                self.assertEqual(
+                    [purchase_order['po_number'] for purchase_order in capped[0]['purchase_orders']],
+                    newest_first[:2],
+                )
+
+                get_cache().clear()
+                detail = self.client.get(f'/api/vendors/vendor/{code}').data
+                self.assertEqual(len(detail['purchase_orders']), 5)
+                get_cache().clear()
+                self.assertNotIn('purchase_orders', self.client.get(f'/api/vendors/vendor/{code}?expand=').data)
+
+                response = self.client.get('/api/vendors/vendor?expand=purchase_orders&po_limit=-1')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('po_limit', response.data)
+
+    def test_fields(self):
+        code = self.vendors[0].code
+        for fast_reads in (False, True):
+            with self.subTest(fast_reads=fast_reads), self.settings(VMS_FAST_READS=fast_reads):
+                listed = self.client.get('/api/vendors/vendor?fields=code,name').data['results']
+                self.assertEqual(set(listed[0]), {'code', 'name'})
+
+                get_cache().clear()
+                detail = self.client.get(f'/api/vendors/vendor/{code}?fields=-purchase_orders,-address').data
+                self.assertNotIn('purchase_orders', detail)
+                self.assertNotIn('address', detail)
+                self.assertIn('contact_details', detail)
+
+                purchase_order = self.client.get(
+                    f'/api/vendors/vendor-purchase-order/{self.purchase_orders[0].po_number}?fields=po_number,quantity'
+                ).data
+                self.assertEqual(purchase_order, dict(po_number=self.purchase_orders[0].po_number, quantity=1))
+
+                for path in (
+                    '/api/vendors/vendor?fields=name,secret',
+                    '/api/vendors/vendor-purchase-order?fields=-nothing',
+                ):
+                    response = self.client.get(path)
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn('Unknown fields', response.data['fields'])
+
+    def test_invalid_filters(self):
+        for path, param in (
+            ('/api/vendors/vendor?min_quality_rating=high', 'min_quality_rating'),
+            ('/api/vendors/vendor-purchase-order?status=LOST', 'status'),
+            ('/api/vendors/vendor-purchase-order?delivery_from=yesterday', 'delivery_from'),
+        ):
+            with self.subTest(path=path):
+                response = self.client.get(path)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(param, response.data)
+
+
+@override_settings(VMS_METRIC_REFRESH_MODE='manual')
+class BulkCreateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('bulk', password='bulk')
+        cls.vendor = Vendor.objects.create(name='Acme', contact_details='-', address='-')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def row(self, **fields):
+        return dict(dict(vendor=self.vendor.pk, delivery_date=timezone.now().isoformat(), quantity=1), **fields)
+
+    def post(self, data, query='', **kwargs):
+        kwargs.setdefault('format', 'json')
+        return self.client.post(f'/api/vendors/vendor-purchase-order/bulk{query}', data, **kwargs)
+
+    def test_row_errors(self):
+        response = self.post([
+            self.row(),
+            self.row(quantity='many'),
+            self.row(vendor=True),
+            self.row(vendor=1.7),
+            self.row(vendor=self.vendor.pk + 1),
+            self.row(quantity=2),
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([created['index'] for created in response.data['created']], [0, 5])
+        errors = {error['index']: error['errors'] for error in response.data['errors']}
+        self.assertEqual(set(errors), {1, 2, 3, 4})
+        self.assertIn('quantity', errors[1])
+        for index in (2, 3, 4):
+            self.assertIn('vendor', errors[index])
+        self.assertEqual(
+            sorted(PurchaseOrder.objects.values_list('po_number', flat=True)),
+            sorted(created['po_number'] for created in response.data['created']),
+        )
+
+    def test_invalid_bodies(self):
+        response = self.post([self.row(quantity='many')])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['created'], [])
+        for data in ([], {}):
+            with self.subTest(data=data):
+                response = self.post(data)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('non_field_errors', response.data)
+        self.assertFalse(PurchaseOrder.objects.exists())
+
+    def test_ndjson(self):
+        body = '\n'.join(json.dumps(row) for row in (self.row(), self.row(delivery_date='soon'), self.row(quantity=3)))
+        response = self.post(body + '\n\n', format=None, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([created['index'] for created in response.data['created']], [0, 2])
+        self.assertEqual([error['index'] for error in response.data['errors']], [1])
+        self.assertEqual(sorted(PurchaseOrder.objects.values_list('quantity', flat=True)), [1, 3])
+
+        response = self.post('{"vendor": 1\n', format=None, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch_size(self):
+        table = PurchaseOrder._meta.db_table
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post([self.row() for _ in range(5)], '?batch_size=2')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            sum(query['sql'].startswith(f'INSERT INTO "{table}"') for query in queries.captured_queries),
+            3,
+        )
+        self.assertEqual(PurchaseOrder.objects.count(), 5)
+        for batch_size in ('0', '-1', 'two'):
+            with self.subTest(batch_size=batch_size):
+                self.assertEqual(self.post([self.row()], f'?batch_size={batch_size}').status_code, 400)
+
+    def test_identifier_collision(self):
+        taken = PurchaseOrder.objects.create(
+            vendor=self.vendor, delivery_date=timezone.now(), quantity=1,
+        ).po_number
+        from . import models
+        generate = models.generate_unique_identifiers
+        drawn = []
+
+        def collide_once(_for, count, *args, **kwargs):
+            identifiers = generate(_for, count, *args, **kwargs)
+            if not drawn:
+                identifiers[-1] = taken
+            drawn.append(identifiers)
+            return identifiers
+
+        with mock.patch.object(models, 'generate_unique_identifiers', side_effect=collide_once):
+            response = self.post([self.row() for _ in range(3)], '?batch_size=2')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(drawn), 2)
+        self.assertEqual(
+            [created['po_number'] for created in response.data['created']],
+            drawn[1],
+        )
+        self.assertEqual(PurchaseOrder.objects.count(), 4)
+        self.assertEqual(VendorPerformanceAggregate.objects.get(vendor=self.vendor).total_po_count, 4)
+
+
+class RankingTests(TestCase):
+
+    def test_vendor_rank(self):
+        ratings = [5, 4, 4, 3, 2, 2, 2, 1, 0]
+        vendors = [
+            Vendor.objects.create(name=f'V{index}', contact_details='-', address='-', quality_rating_avg=rating)
+            for index, rating in enumerate(ratings)
+        ]
+        for vendor, rating in zip(vendors, ratings):
+            with self.subTest(rating=rating):
+                ranking = vendor_rank('quality_rating_avg', vendor.code)
+                self.assertEqual(ranking['total'], len(ratings))
+                self.assertEqual(ranking['results'][0]['rank'], ratings.index(rating) + 1)
+        self.assertIsNone(vendor_rank('quality_rating_avg', 'missing'))
+
+
+@override_settings(VMS_METRIC_REFRESH_MODE='manual')
+class DeliveryRiskTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('risk', password='risk')
+        now = timezone.now()
+        cls.late, cls.punctual, cls.new = [
+            Vendor.objects.create(name=name, contact_details='-', address='-')
+            for name in ('Late', 'Punctual', 'New')
+        ]
+        for vendor, late in ((cls.late, 3), (cls.punctual, 0)):
+            for index in range(4):
+                PurchaseOrder.objects.create(
+                    vendor=vendor,
+                    delivery_date=now - timedelta(days=10),
+                    quantity=1,
+                    status=PurchaseOrder.PoStatus.COMPLETED,
+                    acknowledgment_date=now + timedelta(days=1),
+                    completion_date=now - timedelta(days=10 - 2 * (index < late)),
+                )
+
+        def pending(vendor, days, acknowledged=True):
+            return PurchaseOrder.objects.create(
+                vendor=vendor,
+                delivery_date=now + timedelta(days=days),
+                quantity=1,
+                acknowledgment_date=now if acknowledged else None,
+            ).po_number
+
+        cls.expected = [
+            (pending(cls.punctual, -1), 1.0),
+            (pending(cls.punctual, 4, acknowledged=False), 1 / 9 + 8 / 9 * 0.5),
+            (pending(cls.late, 5), 4 / 9),
+            (pending(cls.new, 3), 0.2),
+            (pending(cls.punctual, 2), 1 / 9),
+        ]
+        PurchaseOrder.objects.filter(po_number=cls.expected[1][0]).update(issue_date=now - timedelta(days=3))
+        process_metric_refreshes(window=0)
+        VendorRiskFeatures.objects.filter(vendor=cls.new).delete()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_features(self):
+        features = VendorRiskFeatures.objects.get(vendor=self.late)
+        self.assertEqual(features.completed_count, 4)
+        self.assertEqual(features.on_time_rate, 25.0)
+        self.assertAlmostEqual(features.weighted_lateness, 1.5)
+        self.assertAlmostEqual(features.response_time_p90, timedelta(days=1), delta=timedelta(minutes=1))
+
+    def test_features_without_completion_date(self):
+        PurchaseOrder.objects.filter(
+            pk=PurchaseOrder.objects.filter(vendor=self.late).order_by('pk').values('pk')[:1],
+        ).update(completion_date=None)
+        features = compute_risk_features(self.late.pk)
+        self.assertEqual(features['completed_count'], 3)
+        self.assertAlmostEqual(features['on_time_rate'], 100 / 3)
+        self.assertAlmostEqual(features['weighted_lateness'], 4 / 3)
+
+    def test_ranking(self):
+        response = self.client.get('/api/vendors/vendor-performance/delivery-risk')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual([row['po_number'] for row in response.data['results']], [po for po, _ in self.expected])
+        for row, (_, risk) in zip(response.data['results'], self.expected):
+            self.assertAlmostEqual(row['risk'], risk)
+        self.assertEqual(
+            [(row['overdue'], row['acknowledged']) for row in response.data['results'][:2]],
+            [(True, True), (False, False)],
+        )
+
+    def test_limit_and_filters(self):
+        url = '/api/vendors/vendor-performance/delivery-risk'
+        response = self.client.get(f'{url}?limit=2&from={(timezone.now() + timedelta(days=3)).isoformat()}'.replace('+', '%2B'))
+        self.assertEqual([row['po_number'] for row in response.data['results']], [self.expected[1][0], self.expected[2][0]])
+        self.assertEqual(response.data['count'], 2)
+
+        response = self.client.get(f'{url}?vendor={self.punctual.code}')
+        self.assertEqual(
+            [row['po_number'] for row in response.data['results']],
+            [self.expected[0][0], self.expected[1][0], self.expected[4][0]],
+        )
+        for query in ('limit=0', 'limit=1001', 'from=soon'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'{url}?{query}').status_code, 400)
+
+    def test_queries_do_not_depend_on_vendors(self):
+        now = timezone.now()
+        for index in range(60):
+            vendor = Vendor.objects.create(name=f'Vendor {index}', contact_details='-', address='-')
+            VendorRiskFeatures.objects.create(
+                vendor=vendor,
+                completed_count=10,
+                on_time_rate=50.0,
+                weighted_lateness=1.0,
+                response_time_p90=timedelta(days=1) if index % 2 else None,
+                late_risk=0.3 + index / 200,
+            )
+            PurchaseOrder.objects.create(
+                vendor=vendor,
+                delivery_date=now + timedelta(days=1),
+                quantity=1,
+                acknowledgment_date=now,
+            )
+        #NOTE: Fewer pending purchase orders than the limit, every risk level is read.
+        with CaptureQueriesContext(connection) as queries:
+            results = delivery_risk(100)['results']
+        self.assertLessEqual(len(queries), 5 + 2 * MAX_BATCHES)
+        self.assertEqual(len(results), 65)
+        risks = [row['risk'] for row in results]
+        self.assertEqual(risks, sorted(risks, reverse=True))
+
+
+@override_settings(VMS_METRIC_REFRESH_MODE='manual')
+class AsyncViewTests(TestCase):
+    """The async endpoints must answer like their synchronous counterparts."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('async', password='async')
+        now = timezone.now()
+        cls.vendors = [
+            Vendor.objects.create(name=f'Vendor {index}', contact_details='-', address='-')
+            for index in range(3)
+        ]
+        for index in range(4):
+            PurchaseOrder.objects.create(
+                vendor=cls.vendors[0],
+                delivery_date=now + timedelta(days=index),
+                items={'SKU-1': index},
+                quantity=index + 1,
+                status=PurchaseOrder.PoStatus.COMPLETED if index % 2 else PurchaseOrder.PoStatus.PENDING,
+                quality_rating=index + 1,
+            )
+        process_metric_refreshes(window=0)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        #NOTE: Not basic credentials, they are hashed on every request.
+        self.token = Token.objects.create(user=self.user)
+
+    def aget(self, path, **headers):
+        async def get():
+            return await AsyncClient().get(path, **headers)
+        return async_to_sync(get)()
+
+    def assertSameResponses(self, path, key=None):
+        get_cache().clear()
+        expected = self.client.get(f'/api/vendors/{path}')
+        get_cache().clear()
+        actual = self.aget(f'/api/vendors/async/{path}', AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(actual.status_code, expected.status_code)
+        expected, actual = json.loads(expected.content), json.loads(actual.content)
+        if key:
+            expected, actual = expected[key], actual[key]
+        self.assertEqual(actual, expected)
+
+    def test_vendors(self):
+        code = self.vendors[0].code
+        for path in (
+            'vendor?page_size=2',
+            'vendor?fields=code,name',
+            'vendor?expand=purchase_orders&po_limit=2',
+            'vendor?min_quality_rating=3',
+        ):
+            with self.subTest(path=path):
+                #NOTE: The page links point to their own endpoint.
+                self.assertSameResponses(path, 'results')
+        for path in (
+            f'vendor/{code}',
+            f'vendor/{code}?po_limit=2',
+            f'vendor/{code}?expand=',
+            f'vendor/{code}?fields=code,name,purchase_orders',
+            f'vendor/{code}?fields=-purchase_orders,-address',
+            f'vendor/{code}?fields=secret',
+            'vendor/missing',
+        ):
+            with self.subTest(path=path):
+                self.assertSameResponses(path)
+
+    def test_purchase_orders(self):
+        po_number = PurchaseOrder.objects.order_by('id').last().po_number
+        for path in (
+            f'vendor-purchase-order/{po_number}',
+            f'vendor-purchase-order/{po_number}?fields=po_number,vendor_name,quality_rating',
+            f'vendor-purchase-order/{po_number}?fields=-items',
+            f'vendor-purchase-order/{po_number}?fields=-nothing',
+            'vendor-purchase-order/missing',
+        ):
+            with self.subTest(path=path):
+                self.assertSameResponses(path)
+
+    def test_performance(self):
+        code = self.vendors[0].code
+        for path in (
+            f'vendor-performance/{code}/performance',
+            f'vendor-performance/{code}/performance?granularity=day',
+            f'vendor-performance/{code}/performance?granularity=year',
+            'vendor-performance/missing/performance',
+        ):
+            with self.subTest(path=path):
+                self.assertSameResponses(path)
+
+    def test_authentication(self):
+        path = f'/api/vendors/async/vendor/{self.vendors[0].code}'
+        self.assertEqual(self.aget(path).status_code, 401)
+        response = self.aget(path, AUTHORIZATION='Basic ' + b64encode(b'async:wrong').decode())
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.aget(path, AUTHORIZATION='Basic ' + b64encode(b'async:async').decode()).status_code, 200)
+
+
+@override_settings(VMS_METRIC_REFRESH_MODE='manual')
+class ChangeFeedTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('feed', password='feed')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.vendor = Vendor.objects.create(name='Acme', contact_details='-', address='-')
+        self.purchase_order = PurchaseOrder.objects.create(
+            vendor=self.vendor,
+            delivery_date=timezone.now() + timedelta(days=1),
+            quantity=1,
+        )
+
+    def changes(self, query=''):
+        response = self.client.get(f'/api/vendors/changes?{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_writes_are_logged(self):
+        since = self.changes()['next']
+        created = self.client.post(
+            '/api/vendors/vendor-purchase-order/bulk',
+            [dict(vendor=self.vendor.pk, delivery_date=timezone.now().isoformat(), quantity=2)],
+            format='json',
+        ).data['created'][0]['po_number']
+        self.client.post(
+            '/api/vendors/vendor-performance/acknowledgements',
+            dict(po_numbers=[self.purchase_order.po_number]),
+            format='json',
+        )
+        process_metric_refreshes(window=0)
+        PurchaseOrder.objects.get(po_number=created).delete()
+
+        page = self.changes(f'since={since}')
+        self.assertFalse(page['has_more'])
+        changes = {(change['kind'], change['key']): change for change in page['results']}
+        self.assertEqual(
+            {key: change['action'] for key, change in changes.items()},
+            {
+                ('purchase_order', created): 'deleted',
+                ('purchase_order', self.purchase_order.po_number): 'updated',
+                ('vendor', self.vendor.code): 'updated',
+                ('historical_performance', str(HistoricalPerformance.objects.get().pk)): 'created',
+            },
+        )
+        self.assertIsNone(changes[('purchase_order', created)]['data'])
+        self.assertIsNotNone(changes[('purchase_order', self.purchase_order.po_number)]['data']['acknowledgment_date'])
+        self.assertEqual(
+            changes[('vendor', self.vendor.code)]['data'],
+            self.client.get(f'/api/vendors/vendor/{self.vendor.code}?expand=').data,
+        )
+        self.assertEqual(self.changes(f'since={page["next"]}'), dict(results=[], next=page['next'], has_more=False))
+
+    def test_pages(self):
+        first = self.changes('limit=1')
+        self.assertEqual([change['kind'] for change in first['results']], ['vendor'])
+        self.assertTrue(first['has_more'])
+        second = self.changes(f'since={first["next"]}&limit=1')
+        self.assertEqual([change['key'] for change in second['results']], [self.purchase_order.po_number])
+        self.assertEqual(self.changes('kinds=purchase_order')['results'], second['results'])
+        for query in ('since=-1', 'limit=0', 'kinds=user'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'/api/vendors/changes?{query}').status_code, 400)
+
+    @override_settings(VMS_CHANGE_SETTLE_SECONDS=60)
+    def test_settle(self):
+        self.assertEqual(self.changes(), dict(results=[], next=0, has_more=False))
+
+        vendor_entry, purchase_order_entry = ChangeLogEntry.objects.order_by('id')
+        ChangeLogEntry.objects.filter(pk=purchase_order_entry.pk).update(
+            changed_at=timezone.now() - timedelta(minutes=2),
+        )
+        #NOTE: Not past the vendor entry, it may be followed by entries still uncommitted.
+        self.assertEqual(self.changes()['next'], 0)
+
+        ChangeLogEntry.objects.filter(pk=vendor_entry.pk).update(
+            changed_at=timezone.now() - timedelta(minutes=2),
+        )
+        page = self.changes('limit=1')
+        self.assertEqual([change['kind'] for change in page['results']], ['vendor'])
+        self.assertTrue(page['has_more'])
+        self.assertEqual(self.changes()['next'], purchase_order_entry.pk)
+
+        PurchaseOrder.objects.create(vendor=self.vendor, delivery_date=timezone.now(), quantity=1)
+        page = self.changes(f'since={purchase_order_entry.pk}')
+        self.assertEqual(page, dict(results=[], next=purchase_order_entry.pk, has_more=False))
+
+    @override_settings(VMS_CHANGE_STREAM_TIMEOUT=0.05, VMS_CHANGE_STREAM_POLL_INTERVAL=0.01)
+    def test_stream(self):
+        last_event_id = ChangeLogEntry.objects.get(kind=ChangeLogEntry.Kind.VENDOR).pk
+
+        async def stream():
+            response = await AsyncClient().get(
+                '/api/vendors/async/changes/stream',
+                AUTHORIZATION='Basic ' + b64encode(b'feed:feed').decode(),
+                LAST_EVENT_ID=str(last_event_id),
+            )
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        events = async_to_sync(stream)().decode().split('\n\n')
+        self.assertEqual(events[0], ': connected')
+        event = events[1].split('\n')
+        self.assertEqual(event[:2], [f'id: {last_event_id + 1}', 'event: change'])
+        self.assertIn(self.purchase_order.po_number, event[2])
+        self.assertEqual(events[2:], [''])
+
+
+@override_settings(VMS_METRIC_REFRESH_MODE='manual')
+class MetricRefreshWorkerTests(TestCase):
+
+    def setUp(self):
+        self.vendors = [
+            Vendor.objects.create(name=name, contact_details='-', address='-')
+            for name in ('Acme', 'Globex')
+        ]
+
+    def complete(self, vendor, quality_rating=4):
+        return PurchaseOrder.objects.create(
+            vendor=vendor,
+            delivery_date=timezone.now() + timedelta(days=1),
+            quantity=1,
+            status=PurchaseOrder.PoStatus.COMPLETED,
+            quality_rating=quality_rating,
+        )
+
+    def test_coalescing(self):
+        first = self.complete(self.vendors[0], 2)
+        requested_at = MetricRefreshRequest.objects.get(vendor=self.vendors[0]).requested_at
+        self.complete(self.vendors[0], 4)
+        first.quality_rating = 3
+        first.save()
+        self.complete(self.vendors[1])
+        #NOTE: One request per vendor, keeping the time of the first write.
+        self.assertEqual(MetricRefreshRequest.objects.count(), 2)
+        self.assertEqual(MetricRefreshRequest.objects.get(vendor=self.vendors[0]).requested_at, requested_at)
+
+        #NOTE: Not due before the window has passed.
+        delay = process_metric_refreshes(window=60)
+        self.assertTrue(0 < delay <= 60)
+        self.assertEqual(MetricRefreshRequest.objects.count(), 2)
+
+        self.assertIsNone(process_metric_refreshes(window=0))
+        self.assertFalse(MetricRefreshRequest.objects.exists())
+        self.assertEqual(
+            sorted(HistoricalPerformance.objects.values_list('vendor_id', flat=True)),
+            [vendor.pk for vendor in self.vendors],
+        )
+        self.assertEqual(Vendor.objects.get(pk=self.vendors[0].pk).quality_rating_avg, 3.5)
+
+    def test_vendor_ids(self):
+        for vendor in self.vendors:
+            self.complete(vendor)
+        process_metric_refreshes([self.vendors[1].pk], window=0)
+        self.assertEqual(
+            list(MetricRefreshRequest.objects.values_list('vendor_id', flat=True)),
+            [self.vendors[0].pk],
+        )
+
+    def test_retry(self):
+        self.complete(self.vendors[0])
+        requested_at = MetricRefreshRequest.objects.get().requested_at
+        with mock.patch('VendorInfo.worker.refresh_risk_features', side_effect=RuntimeError('risk')):
+            with self.assertLogs('VendorInfo.worker', 'ERROR'):
+                self.assertIsNotNone(process_metric_refreshes(window=0))
+        request = MetricRefreshRequest.objects.get()
+        self.assertEqual(request.attempts, 1)
+        self.assertGreater(request.requested_at, requested_at)
+        #NOTE: The refresh is rolled back along with the claim of the request.
+        self.assertEqual(Vendor.objects.get(pk=self.vendors[0].pk).quality_rating_avg, 0)
+        self.assertFalse(HistoricalPerformance.objects.exists())
+
+        #NOTE: Retried after another window only.
+        self.assertGreater(process_metric_refreshes(window=60), 0)
+        self.assertTrue(MetricRefreshRequest.objects.exists())
+
+        self.assertIsNone(process_metric_refreshes(window=0))
+        self.assertEqual(Vendor.objects.get(pk=self.vendors[0].pk).quality_rating_avg, 4)
+        self.assertEqual(HistoricalPerformance.objects.count(), 1)
+
+    @override_settings(VMS_METRIC_REFRESH_MAX_ATTEMPTS=2)
+    def test_max_attempts(self):
+        self.complete(self.vendors[0])
+        with mock.patch('VendorInfo.worker.refresh_risk_features', side_effect=RuntimeError('risk')):
+            with self.assertLogs('VendorInfo.worker', 'ERROR') as logs:
+                process_metric_refreshes(window=0)
+                #NOTE: Given up on, the request no longer keeps the worker busy.
+                self.assertIsNone(process_metric_refreshes(window=0))
+        self.assertIn('Giving up', logs.output[-1])
+        self.assertEqual(MetricRefreshRequest.objects.get().attempts, 2)
+        self.assertIsNone(process_metric_refreshes(window=0))
+        self.assertEqual(MetricRefreshRequest.objects.get().attempts, 2)
+
+        self.assertEqual(retry_failed_metric_refreshes(), 1)
+        self.assertIsNone(process_metric_refreshes(window=0))
+        self.assertFalse(MetricRefreshRequest.objects.exists())
+        self.assertEqual(Vendor.objects.get(pk=self.vendors[0].pk).quality_rating_avg, 4)
+
+    def test_modes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.complete(self.vendors[0])
+        self.assertTrue(MetricRefreshRequest.objects.exists())
+        self.assertEqual(Vendor.objects.get(pk=self.vendors[0].pk).quality_rating_avg, 0)
+
+        with self.settings(VMS_METRIC_REFRESH_MODE='sync'):
+            with self.captureOnCommitCallbacks() as callbacks:
+                self.complete(self.vendors[1])
+            #NOTE: Refreshed once the write commits, not in its transaction.
+            self.assertEqual(Vendor.objects.get(pk=self.vendors[1].pk).quality_rating_avg, 0)
+            for callback in callbacks:
+                callback()
+        self.assertEqual(Vendor.objects.get(pk=self.vendors[1].pk).quality_rating_avg, 4)
+        #NOTE: Only the vendors written are refreshed in the writing thread.
+        self.assertEqual(
+            list(MetricRefreshRequest.objects.values_list('vendor_id', flat=True)),
+            [self.vendors[0].pk],
+        )
+
+        with self.settings(VMS_METRIC_REFRESH_MODE='thread'):
+            with mock.patch.object(metric_refresh_worker, 'wake') as wake:
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.complete(self.vendors[1])
+        wake.assert_called_once_with()
+
+
+@override_settings(VMS_METRIC_REFRESH_MODE='manual')
+class RollupTests(TestCase):
+    """Trends read from the rollups must match an aggregation over the snapshots."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('trend', password='trend')
+        cls.vendor = Vendor.objects.create(name='Acme', contact_details='-', address='-')
+        other = Vendor.objects.create(name='Other', contact_details='-', address='-')
+        start = timezone.make_aware(timezone.datetime(2024, 1, 27, 22, 30))
+        for index in range(60):
+            HistoricalPerformance.objects.create(
+                vendor=cls.vendor if index % 4 else other,
+                date=start + timedelta(hours=19 * index),
+                on_time_delivery_rate=index % 7 / 7,
+                quality_rating_avg=1 + index % 5,
+                average_response_time=index * 1.5,
+                fulfillment_rate=index % 3 / 3,
+            )
+
+    def expected(self, granularity, start=None, end=None):
+        truncate = dict(day=TruncDay, week=TruncWeek, month=TruncMonth)[granularity]
+        snapshots = HistoricalPerformance.objects.filter(vendor=self.vendor)
+        if start:
+            snapshots = snapshots.filter(date__gte=period_start(start, granularity))
+        if end:
+            snapshots = snapshots.annotate(period=truncate('date')).filter(period__lt=end)
+        rows = (
+            snapshots.order_by().annotate(period=truncate('date')).values('period')
+            .annotate(samples=Count('id'), **{field: Avg(field) for field in SNAPSHOT_FIELDS})
+            .order_by('period')
+        )
+        return [dict(row, period_start=row.pop('period')) for row in rows]
+
+    def assertTrendsMatch(self, granularity, start=None, end=None):
+        actual = trend(self.vendor.pk, granularity, start, end)
+        expected = self.expected(granularity, start, end)
+        self.assertGreater(len(expected), 1)
+        self.assertEqual(
+            [(point['period_start'], point['samples']) for point in actual],
+            [(point['period_start'], point['samples']) for point in expected],
+        )
+        for actual_point, expected_point in zip(actual, expected):
+            for field in SNAPSHOT_FIELDS:
+                self.assertAlmostEqual(actual_point[field], expected_point[field])
+
+    def test_trends(self):
+        for granularity in PerformanceRollup.Granularity.values:
+            with self.subTest(granularity=granularity):
+                self.assertTrendsMatch(granularity)
+                self.assertTrendsMatch(
+                    granularity,
+                    timezone.make_aware(timezone.datetime(2024, 2, 7, 12)),
+                    timezone.make_aware(timezone.datetime(2024, 3, 10)),
+                )
+
+    def test_rebuild(self):
+        recorded = list(PerformanceRollup.objects.order_by('id').values())
+        rebuild_rollups([self.vendor.pk])
+        for granularity in PerformanceRollup.Granularity.values:
+            with self.subTest(granularity=granularity):
+                self.assertTrendsMatch(granularity)
+        self.assertEqual(PerformanceRollup.objects.count(), len(recorded))
+
+    def test_api(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(
+            f'/api/vendors/vendor-performance/{self.vendor.code}/performance'
+            '?granularity=week&from=2024-02-01T00:00:00Z&to=2024-02-20T00:00:00Z'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(point['period_start'], point['samples']) for point in response.data['trend']],
+            [
+                (point['period_start'], point['samples']) for point in self.expected(
+                    'week',
+                    timezone.make_aware(timezone.datetime(2024, 2, 1)),
+                    timezone.make_aware(timezone.datetime(2024, 2, 20)),
+                )
+            ],
+        )
+        response = client.get(f'/api/vendors/vendor-performance/{self.vendor.code}/performance?granularity=year')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(VMS_METRIC_REFRESH_MODE='manual')
+class HistoryRetentionTests(TransactionTestCase):
+    """Compactions commit their own transactions, the archive is written when they do."""
+
+    def setUp(self):
+        self.vendor = Vendor.objects.create(name='Acme', contact_details='-', address='-')
+        self.now = timezone.now()
+
+    def snapshots(self, start, count, **fields):
+        return HistoricalPerformance.objects.bulk_create(
+            HistoricalPerformance(
+                vendor=self.vendor,
+                date=start + timedelta(hours=hour),
+                on_time_delivery_rate=hour * 10,
+                **fields,
+            )
+            for hour in range(count)
+        )
+
+    def rollups(self):
+        return list(
+            PerformanceRollup.objects.filter(granularity=PerformanceRollup.Granularity.MONTH)
+            .order_by('period_start')
+            .values_list('granularity', 'period_start', 'sample_count', 'on_time_delivery_rate_total')
+        )
+
+    def test_compaction(self):
+        recent = self.snapshots(self.now - timedelta(days=5), 3)
+        day = period_start(self.now - timedelta(days=100), PerformanceRollup.Granularity.DAY)
+        daily = self.snapshots(day + timedelta(hours=1), 3) + self.snapshots(day + timedelta(days=1), 1)
+        month = period_start(self.now - timedelta(days=500), PerformanceRollup.Granularity.MONTH)
+        monthly = self.snapshots(month + timedelta(days=2), 2, sample_count=3) + self.snapshots(month + timedelta(days=3), 5)
+        rebuild_rollups()
+        rollups = self.rollups()
+
+        with TemporaryDirectory() as directory:
+            result = compact_history(archive_dir=directory, now=self.now, chunk_size=2)
+            with gzip.open(result['archive'], 'rt') as archive:
+                archived = [json.loads(line) for line in archive]
+
+        replaced = daily[:3] + monthly
+        self.assertEqual(result['replaced'], len(replaced))
+        self.assertEqual(sorted(row['id'] for row in archived), sorted(snapshot.pk for snapshot in replaced))
+        self.assertEqual({row['vendor_code'] for row in archived}, {self.vendor.code})
+        self.assertEqual(
+            list(
+                HistoricalPerformance.objects.order_by('date')
+                .values_list('date', 'sample_count', 'on_time_delivery_rate')
+            ),
+            [
+                (monthly[0].date, 11, (0 * 3 + 10 * 3 + 0 + 10 + 20 + 30 + 40) / 11),
+                (daily[0].date, 3, 10.0),
+                (daily[3].date, 1, 0.0),
+            ] + [(snapshot.date, 1, snapshot.on_time_delivery_rate) for snapshot in recent],
+        )
+        self.assertEqual(
+            HistoricalPerformance.objects.exclude(pk__in=[snapshot.pk for snapshot in replaced]).count(),
+            HistoricalPerformance.objects.count(),
+        )
+
+        #NOTE: Compacted snapshots weigh as many as they replace, the rollups of periods
+        #no finer than the compaction's rebuilt from them do not change.
+        rebuild_rollups()
+        for (*key, samples, total), (*expected_key, expected_samples, expected_total) in zip(self.rollups(), rollups):
+            self.assertEqual((key, samples), (expected_key, expected_samples))
+            self.assertAlmostEqual(total, expected_total)
+        self.assertEqual(compact_history(archive=False, now=self.now, chunk_size=2)['replaced'], 0)
+
+    def test_rollback_is_not_archived(self):
+        day = period_start(self.now - timedelta(days=100), PerformanceRollup.Granularity.DAY)
+        snapshots = self.snapshots(day, 4) + self.snapshots(day + timedelta(days=1), 4)
+
+        with TemporaryDirectory() as directory:
+            #NOTE: The second chunk fails after its snapshots are deleted.
+            with mock.patch('VendorInfo.retention.record_changes', side_effect=[None, None, RuntimeError]):
+                with self.assertRaises(RuntimeError):
+                    compact_history(archive_dir=directory, now=self.now, chunk_size=4)
+            self.assertEqual(HistoricalPerformance.objects.count(), 5)
+
+            result = compact_history(archive_dir=directory, now=self.now, chunk_size=4)
+            self.assertEqual(result['replaced'], 4)
+            archived = []
+            for path in sorted(Path(directory).iterdir()):
+                with gzip.open(path, 'rt') as archive:
+                    archived.extend(json.loads(line)['id'] for line in archive)
+        self.assertEqual(sorted(archived), sorted(snapshot.pk for snapshot in snapshots))
+
+    def test_archived_on_commit(self):
+        day = period_start(self.now - timedelta(days=100), PerformanceRollup.Granularity.DAY)
+        self.snapshots(day, 3)
+        with TemporaryDirectory() as directory:
+            with transaction.atomic():
+                result = compact_history(archive_dir=directory, now=self.now)
+                self.assertEqual((result['replaced'], result['archived']), (3, 0))
+                self.assertEqual(list(Path(directory).iterdir()), [])
+            self.assertEqual(len(list(Path(directory).iterdir())), 1)
+
+
+@override_settings(VMS_METRIC_REFRESH_MODE='manual')
+class ConcurrentWriteTests(AggregateAssertionsMixin, TransactionTestCase):
+    THREADS = 8
+    PURCHASE_ORDERS = 1000
+
+    def setUp(self):
+        self.vendor = Vendor.objects.create(name='Acme', contact_details='-', address='-')
+
+    def run_threads(self, target):
+        barrier = threading.Barrier(self.THREADS)
+        errors = []
+
+        def run(index):
+            try:
+                barrier.wait()
+                target(index)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(index,)) for index in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_concurrent_completions(self):
+        PurchaseOrder.objects.bulk_create(
+            PurchaseOrder(
+                vendor=self.vendor,
+                po_number=f'PO-{index}',
+                delivery_date=timezone.now() + timedelta(days=index % 3 - 1),
+                quantity=1,
+            )
+            for index in range(self.PURCHASE_ORDERS)
+        )
+        rebuild_aggregates([self.vendor.pk])
+        ids = list(PurchaseOrder.objects.order_by('id').values_list('id', flat=True))
+        #NOTE: Every purchase order is completed by two threads at once, with different ratings.
+        pairs = self.THREADS // 2
+
+        def complete(index):
+            for pk in ids[index % pairs::pairs]:
+                purchase_order = PurchaseOrder.objects.get(pk=pk)
+                purchase_order.status = PurchaseOrder.PoStatus.COMPLETED
+                purchase_order.quality_rating = 1 + index % 5
+                purchase_order.save()
+
+        self.run_threads(complete)
+        process_metric_refreshes(window=0)
+        self.assertAggregatesMatch(self.vendor)
+        self.assertEqual(verify_aggregates([self.vendor.pk]), [])
+        self.assertEqual(
+            PurchaseOrder.objects.filter(status=PurchaseOrder.PoStatus.COMPLETED).count(),
+            self.PURCHASE_ORDERS,
+        )
+        self.assertEqual(
+            VendorPerformanceAggregate.objects.get(vendor=self.vendor).completed_po_count,
+            self.PURCHASE_ORDERS,
+        )
+
+    def test_vendor_save_keeps_metrics(self):
+        stale = Vendor.objects.get(pk=self.vendor.pk)
+        PurchaseOrder.objects.create(
+            vendor=self.vendor,
+            delivery_date=timezone.now() + timedelta(days=1),
+            quantity=1,
+            status=PurchaseOrder.PoStatus.COMPLETED,
+        )
+        process_metric_refreshes(window=0)
+        stale.contact_details = 'sales@acme.example'
+        stale.save()
+        self.assertAggregatesMatch(self.vendor)
+        self.assertEqual(verify_aggregates([self.vendor.pk]), [])
+        self.assertEqual(Vendor.objects.get(pk=self.vendor.pk).fulfillment_rate, 100.0)
+        self.assertEqual(Vendor.objects.get(pk=self.vendor.pk).contact_details, 'sales@acme.example')
+
+
+    def test_deferred_vendor_save(self):
+        vendor = Vendor.objects.only('name').get(pk=self.vendor.pk)
+        vendor.name = 'Renamed'
+        with CaptureQueriesContext(connection) as queries:
+            vendor.save()
+        #NOTE: The deferred fields are neither loaded nor written, but for the code
+        #the cache and the change log are keyed by.
+        selects = [query['sql'] for query in queries if query['sql'].startswith('SELECT')]
+        self.assertEqual(len(selects), 1)
+        self.assertIn('"VendorInfo_vendor"."code" FROM', selects[0])
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "VendorInfo_vendor"')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('"contact_details"', updates[0])
+        saved = Vendor.objects.get(pk=self.vendor.pk)
+        self.assertEqual((saved.name, saved.contact_details), ('Renamed', '-'))
+
+class RequestMetricsTests(TestCase):
+
+    def setUp(self):
+        registry.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('reader', password='reader'))
+        Vendor.objects.create(name='Vendor', contact_details='-', address='-')
+
+    @override_settings(VMS_METRICS_TOKEN='scraper')
+    def test_metrics(self):
+        self.client.get('/api/vendors/vendor')
+        self.client.get('/api/vendors/vendor')
+        metrics = self.client.get('/internal/metrics', HTTP_AUTHORIZATION='Bearer scraper').content.decode()
+
+        labels = 'endpoint="vendor-list",method="GET"'
+        self.assertIn(f'vms_request_duration_seconds_count{{{labels}}} 2', metrics)
+        self.assertIn(f'vms_request_queries_bucket{{{labels},le="+Inf"}} 2', metrics)
+        for phase in ('db', 'serialize', 'render'):
+            total = next(
+                line for line in metrics.splitlines()
+                if line.startswith(f'vms_request_{phase}_seconds_sum{{{labels}}}')
+            )
+            self.assertGreater(float(total.rsplit(' ', 1)[1]), 0)
+
+    @override_settings(VMS_METRICS_TOKEN='scraper')
+    def test_metrics_are_internal(self):
+        client = APIClient()
+        for authorization in ('', 'Bearer', 'Bearer other', 'Token scraper'):
+            with self.subTest(authorization=authorization):
+                response = client.get('/internal/metrics', HTTP_AUTHORIZATION=authorization)
+                self.assertEqual(response.status_code, 404)
+        #NOTE: Authenticated for the API only, not a staff user.
+        self.assertEqual(self.client.get('/internal/metrics').status_code, 404)
+
+        client.force_login(User.objects.create_user('staff', is_staff=True))
+        self.assertEqual(client.get('/internal/metrics').status_code, 200)
+        with self.settings(VMS_METRICS_TOKEN=''):
+            self.assertEqual(APIClient().get('/internal/metrics', HTTP_AUTHORIZATION='Bearer ').status_code, 404)
+
+
+@override_settings(VMS_METRIC_REFRESH_MODE='manual', VMS_AUTH_CACHE=True)
+class CachedAuthenticationTests(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        self.user = User.objects.create_user('integration', password='secret')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+
+    def assertAuthenticates(self, expected=True, **credentials):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/vendors/vendor-purchase-order', **credentials)
+        self.assertEqual(response.status_code, 200 if expected else 401)
+        return [query['sql'] for query in queries if 'auth' in query['sql']]
+
+    def assertCached(self, queries):
+        """A user authenticated from the cache is only loaded by its primary key."""
+        self.assertEqual(len(queries), 1)
+        self.assertIn('FROM "auth_user" WHERE', queries[0])
+        self.assertIn(f'"auth_user"."id" = {self.user.pk}', queries[0])
+
+    def basic(self, password):
+        return dict(HTTP_AUTHORIZATION='Basic ' + b64encode(f'integration:{password}'.encode()).decode())
+
+    def test_basic(self):
+        with mock.patch.object(User, 'check_password', autospec=True, side_effect=User.check_password) as check:
+            self.assertAuthenticates(**self.basic('secret'))
+            self.assertCached(self.assertAuthenticates(**self.basic('secret')))
+        self.assertEqual(check.call_count, 1)
+        self.assertAuthenticates(False, **self.basic('wrong'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('changed')
+            self.user.save()
+        self.assertAuthenticates(False, **self.basic('secret'))
+        self.assertAuthenticates(**self.basic('changed'))
+
+    def test_token(self):
+        credentials = dict(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertAuthenticates(**credentials)
+        self.token.delete()
+        self.assertAuthenticates(False, **credentials)
+
+    def test_change_during_verification(self):
+        verify = User.check_password
+
+        def check_password(user, password):
+            #NOTE: E.g. the password changed by another process meanwhile.
+            _bump_user_version(user.pk)
+            return verify(user, password)
+
+        with mock.patch.object(User, 'check_password', autospec=True, side_effect=check_password) as check:
+            self.assertAuthenticates(**self.basic('secret'))
+            self.assertAuthenticates(**self.basic('secret'))
+        self.assertEqual(check.call_count, 2)
+
+    def test_cached_value(self):
+        self.assertAuthenticates(**self.basic('secret'))
+        self.assertEqual(
+            get_cache().get(_credentials_key('basic', 'integration', 'secret')),
+            (self.user.pk, user_version(self.user.pk)),
+        )
+
+    def test_deactivated(self):
+        self.assertAuthenticates(**self.basic('secret'))
+        #NOTE: Not signalled, the account is read again on every request.
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertAuthenticates(False, **self.basic('secret'))
+
+    @override_settings(VMS_AUTH_CACHE=None)
+    def test_local_memory_cache(self):
+        with mock.patch.object(User, 'check_password', autospec=True, side_effect=User.check_password) as check:
+            self.assertAuthenticates(**self.basic('secret'))
+            self.assertAuthenticates(**self.basic('secret'))
+        self.assertEqual(check.call_count, 2)
@@ -1,10 +1,36 @@
+from django.urls import path
 from rest_framework import routers
 
-from .views import VendorViewSet, PurchaseOrderViewSet, VenderPerformanceViewSet
+from . import async_views
+from .views import (
+    VendorViewSet,
+    PurchaseOrderViewSet,
+    VenderPerformanceViewSet,
+    ExportViewSet,
+    ChangeFeedViewSet,
+)
 
 router = routers.DefaultRouter(trailing_slash=False)
 router.register('vendor', VendorViewSet)
 router.register('vendor-purchase-order', PurchaseOrderViewSet)   
 router.register('vendor-performance', VenderPerformanceViewSet, basename='vendor-performance')
+router.register('export', ExportViewSet, basename='export')
+router.register('changes', ChangeFeedViewSet, basename='changes')
 
-urlpatterns = router.urls
\ No newline at end of file
+urlpatterns = router.urls + [
+    #NOTE: Native async variants of the read endpoints, see `VendorInfo.async_views`.
+    path('async/vendor', async_views.VendorListView.as_view(), name='async-vendor-list'),
+    path('async/vendor/<str:code>', async_views.VendorDetailView.as_view(), name='async-vendor-detail'),
+    path(
+        'async/vendor-purchase-order/<str:po_number>',
+        async_views.PurchaseOrderDetailView.as_view(),
+        name='async-purchase-order-detail',
+    ),
+    path(
+        'async/vendor-performance/<str:code>/performance',
+        async_views.VendorPerformanceView.as_view(),
+        name='async-vendor-performance',
+    ),
+    #NOTE: Server-sent events only stream under ASGI, under WSGI the response is sent when the stream ends.
+    path('async/changes/stream', async_views.ChangeStreamView.as_view(), name='async-change-stream'),
+]
@@ -1,7 +1,11 @@
 import random
 import string
+from datetime import datetime, time
 
+from django.db import connections, transaction
+from django.db.models import F
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 
 def generate_random_identifier(_for=None):
     if not _for:
@@ -19,4 +23,57 @@ def generate_random_identifier(_for=None):
         curr_month = timezone.now().strftime('%b')
         characters = string.ascii_letters + string.digits
         code = ''.join(random.choice(characters) for _ in range(6))
-        return f'{str(curr_year)}{curr_month}-{code}' # This would return: '2024Apr-iNRCNW'
\ No newline at end of file
+        return f'{str(curr_year)}{curr_month}-{code}' # This would return: '2024Apr-iNRCNW'
+
+def increment_or_create(model, lookup, increments):
+    """
+    Add `increments` to the counters of the `model` row matching `lookup`.
+
+    The row is updated with `F()` expressions, so concurrent writers never
+    overwrite each other, and created first if it does not exist yet.
+    """
+    updates = {
+        field: F(field) + value for field, value in increments.items() if value
+    }
+    if not updates:
+        return
+    rows = model.objects.filter(**lookup)
+    if rows.update(**updates):
+        return
+    with transaction.atomic():
+        model.objects.get_or_create(**lookup)
+        rows.update(**updates)
+
+
+def lock_rows(queryset):
+    """
+    `queryset.select_for_update()`, which SQLite ignores: there the rows are
+    set to themselves instead, which takes the database write lock until the
+    transaction ends. Must run inside a transaction and, on SQLite, before it
+    reads anything, or a concurrent writer fails it with "database is locked".
+    """
+    if connections[queryset.db].vendor != 'sqlite':
+        return queryset.select_for_update()
+    pk = queryset.model._meta.pk.attname
+    queryset.update(**{pk: F(pk)})
+    return queryset
+
+
+def parse_query_datetime(value):
+    """
+    Parse an ISO 8601 date or datetime from a query parameter.
+
+    Dates are read as midnight and naive values as the current time zone.
+    Returns `None` for empty values and raises `ValueError` for invalid ones.
+    """
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Invalid date: {value}')
+        parsed = datetime.combine(day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
@@ -1,10 +1,17 @@
+from functools import cached_property
+
+from django.conf import settings
 from django.db.models import Prefetch
-from django.utils import timezone
+from django.http import StreamingHttpResponse
+from rest_framework.parsers import JSONParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from rest_framework.status import (
     HTTP_200_OK, 
+    HTTP_201_CREATED,
     HTTP_404_NOT_FOUND, 
     HTTP_400_BAD_REQUEST
 )
@@ -17,10 +24,174 @@ from rest_framework.mixins import (
     DestroyModelMixin,
 )
 
-from .models import Vendor, PurchaseOrder, HistoricalPerformance
+from . import changes, exports, rankings, risk
+from .acknowledgements import acknowledge_purchase_orders
+from .cache import cached_vendor_response
+from .fastpath import purchase_orders_by_vendor, row_serializer
+from .filters import (
+    KeysetOrderingFilter,
+    QueryParameterFilter,
+    choice,
+    number,
+    only_fields,
+    parse_fields,
+)
+from .metrics import METRIC_FIELDS
+from .models import Vendor, PurchaseOrder, PerformanceRollup, ChangeLogEntry
+from .pagination import IdCursorPagination
+from .parsers import NDJSONParser
+from .rollups import trend
 from .serializers import VendorSerializer, PurchaseOrderSerializer
+from .utils import parse_query_datetime
+
+
+def parse_expand(query_params, default):
+    #NOTE: Nested purchase orders are only fetched when asked for with `?expand=purchase_orders`,
+    #except on the detail routes, which always returned them.
+    expand = query_params.get('expand')
+    if expand is None:
+        return default
+    return 'purchase_orders' in expand.split(',')
+
+
+def parse_po_limit(query_params):
+    po_limit = query_params.get('po_limit')
+    if po_limit is None:
+        return None
+    if not po_limit.isdigit():
+        raise ValidationError(dict(po_limit='Must be a non-negative integer.'))
+    return int(po_limit)
+
+
+def purchase_orders_prefetch(po_limit=None):
+    """Newest first purchase orders of each vendor into `purchase_orders`, at most `po_limit`."""
+    purchase_orders = PurchaseOrder.objects.order_by('-id')
+    if po_limit is not None:
+        # Sliced prefetches are limited per vendor in SQL with a window function.
+        purchase_orders = purchase_orders[:po_limit]
+    return Prefetch(
+        'purchaseorder_set',
+        queryset=purchase_orders,
+        to_attr='purchase_orders',
+    )
+
+
+def parse_trend_query(query_params):
+    """
+    `(granularity, start, end)` of the performance trend asked for.
+
+    Raises `ValueError` with a message for the client on invalid values.
+    """
+    granularity = query_params.get('granularity')
+    start = query_params.get('from')
+    end = query_params.get('to')
+    if (start or end) and not granularity:
+        granularity = PerformanceRollup.Granularity.DAY
+    if granularity and granularity not in PerformanceRollup.Granularity.values:
+        raise ValueError(f'granularity must be one of {", ".join(PerformanceRollup.Granularity.values)}')
+    try:
+        return granularity, parse_query_datetime(start), parse_query_datetime(end)
+    except ValueError:
+        raise ValueError('from and to must be ISO 8601 dates or datetimes') from None
+
+
+def parse_change_query(query_params, last_event_id=None):
+    """
+    `(since, limit, kinds)` of the changes asked for, `since` defaulting to
+    `last_event_id`.
+
+    Raises `ValueError` with a message for the client on invalid values.
+    """
+    since = query_params.get('since') or last_event_id or '0'
+    limit = query_params.get('limit', '100')
+    kinds = query_params.get('kinds')
+    if not since.isdigit():
+        raise ValueError('since must be a sequence number')
+    if not (limit.isdigit() and 0 < int(limit) <= changes.MAX_LIMIT):
+        raise ValueError(f'limit must be an integer between 1 and {changes.MAX_LIMIT}')
+    if kinds:
+        kinds = kinds.split(',')
+        if not set(kinds) <= set(ChangeLogEntry.Kind.values):
+            raise ValueError(f'kinds must be among {", ".join(ChangeLogEntry.Kind.values)}')
+    return int(since), int(limit), kinds or None
+
+
+class FieldSelectionMixin:
+    """
+    Sparse fieldsets, `?fields=a,b` on the list and retrieve actions.
+
+    Only the columns the selected fields read are fetched, see `VendorInfo.filters`.
+    """
+
+    @cached_property
+    def selected_fields(self):
+        #NOTE: Writes always validate every field.
+        if self.action not in ('list', 'retrieve'):
+            return None
+        return parse_fields(self.request.query_params, self.get_serializer_class()().fields)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.selected_fields is None:
+            return queryset
+        #NOTE: The pagination cursor is read from the ordering field.
+        ordering = KeysetOrderingFilter().get_ordering(self.request, queryset, self) or ()
+        return only_fields(
+            queryset,
+            self.get_serializer_class()(),
+            self.selected_fields,
+            always=[field.lstrip('-') for field in ordering],
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.selected_fields
+        return context
+
+
+class FastReadMixin:
+    """
+    Serve list and retrieve from `values()` rows when `VMS_FAST_READS` is on,
+    see `VendorInfo.fastpath`.
+
+    Subclasses add the items of fields reading the whole instance in `add_related`.
+    """
+
+    def add_related(self, rows):
+        return rows
+
+    def fast_queryset(self):
+        #NOTE: `values()` querysets cannot prefetch.
+        return self.filter_queryset(self.get_queryset()).prefetch_related(None)
+
+    def list(self, request, *args, **kwargs):
+        if not settings.VMS_FAST_READS:
+            return super().list(request, *args, **kwargs)
+        serializer = row_serializer(self.get_serializer_class(), self.get_serializer_context())
+        queryset = self.fast_queryset()
+        #NOTE: The pagination cursor is read from the ordering field.
+        ordering = self.paginator.get_ordering(request, queryset, self)
+        rows = self.paginate_queryset(
+            serializer.values(queryset, 'id', *(field.lstrip('-') for field in ordering)),
+        )
+        return self.get_paginated_response(serializer.serialize(self.add_related(rows)))
+
+    def retrieve(self, request, *args, **kwargs):
+        if not settings.VMS_FAST_READS:
+            return super().retrieve(request, *args, **kwargs)
+        serializer = row_serializer(self.get_serializer_class(), self.get_serializer_context())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(
+            serializer.values(self.fast_queryset(), 'id'),
+            **{self.lookup_field: kwargs[lookup_url_kwarg]},
+        )
+        self.check_object_permissions(request, row)
+        return Response(serializer.serialize(self.add_related([row]))[0])
+
 
 class VendorViewSet(
+    FastReadMixin,
+    FieldSelectionMixin,
     GenericViewSet,
     CreateModelMixin,
     RetrieveModelMixin,
@@ -31,21 +202,58 @@ class VendorViewSet(
     permission_classes = [IsAuthenticated]
     #NOTE: Ideally `DestroyModelMixin` should'nt be used for Vendor because it's a sensitive operation. 
     #The better option is to use a custom action to deactivate the vendor.
-    queryset = (
-        Vendor.objects.all()
-        .prefetch_related(
-            Prefetch(
-                'purchaseorder_set',
-                queryset=PurchaseOrder.objects.all(),
-                to_attr='purchase_orders',
-            ),
-        )
-    )
+    queryset = Vendor.objects.all()
     serializer_class = VendorSerializer
+    pagination_class = IdCursorPagination
+    filter_backends = [QueryParameterFilter, KeysetOrderingFilter]
+    query_filters = {
+        'min_quality_rating': ('quality_rating_avg__gte', number),
+        'max_quality_rating': ('quality_rating_avg__lte', number),
+        'min_on_time_delivery_rate': ('on_time_delivery_rate__gte', number),
+        'min_fulfillment_rate': ('fulfillment_rate__gte', number),
+        'max_average_response_time': ('average_response_time__lte', number),
+    }
+    ordering_fields = ('id', 'name', *METRIC_FIELDS)
     lookup_field = 'code'
 
+    def expand_purchase_orders(self):
+        if self.selected_fields is not None and 'purchase_orders' not in self.selected_fields:
+            return False
+        return parse_expand(self.request.query_params, default=self.detail)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if not self.expand_purchase_orders():
+            return queryset
+        return queryset.prefetch_related(
+            purchase_orders_prefetch(parse_po_limit(self.request.query_params)),
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['expand_purchase_orders'] = self.expand_purchase_orders()
+        return context
+
+    def add_related(self, rows):
+        if not self.expand_purchase_orders():
+            return rows
+        purchase_orders = purchase_orders_by_vendor(
+            row_serializer(PurchaseOrderSerializer, {}),
+            [row['id'] for row in rows],
+            parse_po_limit(self.request.query_params),
+        )
+        for row in rows:
+            row['purchase_orders'] = purchase_orders.get(row['id'], [])
+        return rows
+
+    @cached_vendor_response('vendor-detail')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
 
 class PurchaseOrderViewSet(
+    FastReadMixin,
+    FieldSelectionMixin,
     GenericViewSet,
     CreateModelMixin,
     RetrieveModelMixin,
@@ -61,97 +269,210 @@ class PurchaseOrderViewSet(
         .select_related('vendor')
     )
     serializer_class = PurchaseOrderSerializer
+    pagination_class = IdCursorPagination
+    filter_backends = [QueryParameterFilter, KeysetOrderingFilter]
+    #NOTE: Date ranges include `from` and exclude `to`, like the exports.
+    query_filters = {
+        'vendor': ('vendor__code', str),
+        'status': ('status', choice(PurchaseOrder.PoStatus.values)),
+        'delivery_from': ('delivery_date__gte', parse_query_datetime),
+        'delivery_to': ('delivery_date__lt', parse_query_datetime),
+        'ordered_from': ('order_date__gte', parse_query_datetime),
+        'ordered_to': ('order_date__lt', parse_query_datetime),
+        'min_quality_rating': ('quality_rating__gte', number),
+        'max_quality_rating': ('quality_rating__lte', number),
+        #NOTE: Looked up in the line items, see `VendorInfo.line_items`.
+        'sku': ('line_items__sku', str),
+    }
+    ordering_fields = ('id', 'order_date', 'delivery_date', 'quality_rating', 'quantity')
     lookup_field = 'po_number'
 
+    @action(methods=['post'], detail=False, url_path='bulk', parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request, *args, **kwargs):
+        """
+        Create purchase orders from a JSON array or an NDJSON body.
+
+        Valid rows are inserted in one transaction, `?batch_size=` rows per
+        INSERT. Invalid rows are skipped and reported by their position.
+        """
+        batch_size = request.query_params.get('batch_size')
+        if batch_size is not None and not (batch_size.isdigit() and int(batch_size)):
+            return Response(
+                dict(message='batch_size must be a positive integer'),
+                status=HTTP_400_BAD_REQUEST,
+            )
+
+        context = self.get_serializer_context()
+        context['batch_size'] = batch_size and int(batch_size)
+        serializer = PurchaseOrderSerializer(data=request.data, many=True, context=context)
+        serializer.is_valid(raise_exception=True)
+        purchase_orders = serializer.save()
+
+        errors = [
+            dict(index=index, errors=row_errors)
+            for index, row_errors in serializer.row_errors.items()
+        ]
+        return Response(
+            dict(
+                created=[
+                    dict(index=index, po_number=purchase_order.po_number)
+                    for index, purchase_order in zip(serializer.row_indexes, purchase_orders)
+                ],
+                errors=errors,
+            ),
+            status=HTTP_201_CREATED if purchase_orders else HTTP_400_BAD_REQUEST,
+        )
+
 
 class VenderPerformanceViewSet(GenericViewSet):
     permission_classes = [IsAuthenticated]
     @action(methods=['get'], detail=False, url_path=r'(?P<code>.+)/performance')
+    @cached_vendor_response('vendor-performance')
     def performance(self, request, *args, **kwargs):
-        vendor = Vendor.objects.filter(
-            code=kwargs.get('code'),
-        ).prefetch_related(
-            Prefetch(
-                'purchaseorder_set',
-                queryset=PurchaseOrder.objects.all(),
-                to_attr='purchase_orders',
-            ),
-            Prefetch(
-                'historicalperformance_set',
-                queryset=HistoricalPerformance.objects.all(),
-                to_attr='historical_performance_records',
+        """
+        Current metrics of the vendor.
+
+        With `?granularity=day|week|month` (and optional ISO `from`/`to`
+        bounds) the response also has a `trend` of the average historical
+        metrics per period, read from the performance rollups.
+        """
+        try:
+            granularity, start, end = parse_trend_query(request.query_params)
+        except ValueError as error:
+            return Response(
+                dict(message=str(error)),
+                status=HTTP_400_BAD_REQUEST,
             )
-        ).first()
 
-        if not vendor:
+        #NOTE: The metrics are maintained incrementally on every purchase order write,
+        #see `VendorInfo.metrics`, so this is a single row lookup.
+        performance = Vendor.objects.filter(
+            code=kwargs.get('code'),
+        ).values('id', *METRIC_FIELDS).first()
+
+        if not performance:
             return Response(
                 dict(message='Vendor not found'),
                 status=HTTP_404_NOT_FOUND,
             )
-         
-        total_purchase_orders = len(vendor.purchase_orders)
 
-        if not (vendor.historical_performance_records or vendor.purchase_orders):
+        vendor_id = performance.pop('id')
+        if granularity:
+            performance['trend'] = trend(vendor_id, granularity, start, end)
+        return Response(
+            performance,
+            status=HTTP_200_OK,
+        )
+
+    @action(methods=['get'], detail=False, url_path='compare')
+    def compare(self, request, *args, **kwargs):
+        """
+        Current metrics of many vendors at once: those of
+        `?vendors=<code>,<code>` in that order, or the first `?limit=` (default
+        100) by id matching the filters of the vendor list, e.g.
+        `?min_quality_rating=4`. Unknown codes are reported as `not_found`.
+        """
+        limit = settings.VMS_COMPARISON_LIMIT
+        codes = list(dict.fromkeys(
+            code for code in request.query_params.get('vendors', '').split(',') if code
+        ))
+        if len(codes) > limit:
+            return Response(
+                dict(message=f'At most {limit} vendors can be compared at once'),
+                status=HTTP_400_BAD_REQUEST,
+            )
+
+        #NOTE: The metrics are columns of `Vendor`, see `performance`, so every
+        #vendor is read by the same single query.
+        vendors = Vendor.objects.values('code', 'name', *METRIC_FIELDS)
+        if codes:
+            rows = {row['code']: row for row in vendors.filter(code__in=codes)}
             return Response(
                 dict(
-                    on_time_delivery_rate=0,
-                    quality_rating_avg=0,
-                    average_response_time=0,
-                    fulfillment_rate=0,
+                    results=[rows[code] for code in codes if code in rows],
+                    not_found=[code for code in codes if code not in rows],
                 ),
                 status=HTTP_200_OK,
             )
 
-        on_time_delivery_rate = [
-            record.on_time_delivery_rate for record in vendor.historical_performance_records
-            if record.on_time_delivery_rate
-        ]
-        if not on_time_delivery_rate:
-            on_time_delivery_rate = 0
-        else:
-            on_time_delivery_rate = sum(on_time_delivery_rate) / len(on_time_delivery_rate)
-
-        avg_quality_rating = [
-            record.quality_rating_avg for record in vendor.historical_performance_records
-            if record.quality_rating_avg
-        ]
-        if not avg_quality_rating:
-            avg_quality_rating = 0
-        else:
-            avg_quality_rating = sum(avg_quality_rating) / len(avg_quality_rating)
-
-        avg_response_time = [
-            record.average_response_time for record in vendor.historical_performance_records
-            if record.average_response_time
-        ]
-        if not avg_response_time:
-            avg_response_time = 0
-        else:
-            avg_response_time = [
-                record.average_response_time for record in vendor.historical_performance_records
-                if record.average_response_time
-                ]
-            avg_response_time = sum(avg_response_time) / len(avg_response_time)
-
-        completed_po = [
-            po for po in vendor.purchase_orders if 
-            po.status == 'COMPLETED' and 
-            po.fulfillment_rate
-        ]
-        if not completed_po:
-            fulfillment_rate = 0
-        else:
-            fulfillment_rate = sum([po.fulfillment_rate for po in completed_po]) / len(completed_po)
-            fulfillment_rate = fulfillment_rate if fulfillment_rate else 0
-            fulfillment_rate = fulfillment_rate / total_purchase_orders
-                
+        count = request.query_params.get('limit', '100')
+        if not (count.isdigit() and 0 < int(count) <= limit):
+            return Response(
+                dict(message=f'limit must be an integer between 1 and {limit}'),
+                status=HTTP_400_BAD_REQUEST,
+            )
+        vendors = QueryParameterFilter().filter_queryset(request, vendors.order_by('id'), VendorViewSet)
         return Response(
-            dict(
-                on_time_delivery_rate=on_time_delivery_rate,
-                quality_rating_avg=avg_quality_rating,
-                average_response_time=avg_response_time,
-                fulfillment_rate=fulfillment_rate,
-            ),
+            dict(results=list(vendors[:int(count)]), not_found=[]),
+            status=HTTP_200_OK,
+        )
+
+    @action(methods=['get'], detail=False, url_path='ranking')
+    def ranking(self, request, *args, **kwargs):
+        """
+        Vendors ranked by `?metric=`, one of the vendor performance metrics.
+
+        The `?limit=` (default 10) best vendors, the worst ones with
+        `?order=bottom`, or only the vendor `?vendor=<code>`; each with its
+        rank and percentile, see `VendorInfo.rankings`.
+        """
+        metric = request.query_params.get('metric')
+        if metric not in METRIC_FIELDS:
+            return Response(
+                dict(message=f'metric must be one of {", ".join(METRIC_FIELDS)}'),
+                status=HTTP_400_BAD_REQUEST,
+            )
+
+        code = request.query_params.get('vendor')
+        if code:
+            ranking = rankings.vendor_rank(metric, code)
+            if ranking is None:
+                return Response(
+                    dict(message='Vendor not found or not ranked by this metric'),
+                    status=HTTP_404_NOT_FOUND,
+                )
+            return Response(ranking, status=HTTP_200_OK)
+
+        order = request.query_params.get('order', 'top')
+        limit = request.query_params.get('limit', '10')
+        if order not in ('top', 'bottom'):
+            return Response(
+                dict(message='order must be one of top, bottom'),
+                status=HTTP_400_BAD_REQUEST,
+            )
+        if not (limit.isdigit() and 0 < int(limit) <= rankings.MAX_LIMIT):
+            return Response(
+                dict(message=f'limit must be an integer between 1 and {rankings.MAX_LIMIT}'),
+                status=HTTP_400_BAD_REQUEST,
+            )
+        return Response(
+            rankings.leaderboard(metric, int(limit), best_first=order == 'top'),
+            status=HTTP_200_OK,
+        )
+
+    @action(methods=['get'], detail=False, url_path='delivery-risk')
+    def delivery_risk(self, request, *args, **kwargs):
+        """
+        The `?limit=` (default 50) pending purchase orders most at risk of a
+        late delivery, riskiest first, optionally only those of `?vendor=<code>`
+        or due in an ISO `?from=`/`?to=` range, see `VendorInfo.risk`.
+        """
+        limit = request.query_params.get('limit', '50')
+        if not (limit.isdigit() and 0 < int(limit) <= risk.MAX_LIMIT):
+            return Response(
+                dict(message=f'limit must be an integer between 1 and {risk.MAX_LIMIT}'),
+                status=HTTP_400_BAD_REQUEST,
+            )
+        try:
+            start = parse_query_datetime(request.query_params.get('from'))
+            end = parse_query_datetime(request.query_params.get('to'))
+        except ValueError:
+            return Response(
+                dict(message='from and to must be ISO 8601 dates or datetimes'),
+                status=HTTP_400_BAD_REQUEST,
+            )
+        return Response(
+            risk.delivery_risk(int(limit), start, end, request.query_params.get('vendor') or None),
             status=HTTP_200_OK,
         )
 
@@ -163,16 +484,13 @@ class VenderPerformanceViewSet(GenericViewSet):
                 dict(message='Cannot undo acknowledge purchase order'),
                 status=HTTP_400_BAD_REQUEST,
             )
-        try:
-            purchase_order = PurchaseOrder.objects.get(po_number=kwargs.get('po_number'))
-        except PurchaseOrder.DoesNotExist:
+        acknowledged, _, not_found = acknowledge_purchase_orders([kwargs.get('po_number')])
+        if not_found:
             return Response(
                 {'message': 'Purchase order does not exist'},
                 status=HTTP_400_BAD_REQUEST,
             )
-        if not purchase_order.acknowledgment_date:
-            purchase_order.acknowledgment_date = timezone.now()
-            purchase_order.save()
+        if acknowledged:
             return Response(
                 dict(message='Purchase order acknowledged successfully'),
                 status=HTTP_200_OK,
@@ -180,4 +498,130 @@ class VenderPerformanceViewSet(GenericViewSet):
         return Response(
             dict(message='Purchase order already acknowledged'),
             status=HTTP_200_OK,
-        )
\ No newline at end of file
+        )
+
+    @action(methods=['post'], detail=False, url_path='acknowledgements')
+    def acknowledgements(self, request, *args, **kwargs):
+        """
+        Acknowledge the purchase orders of `{"po_numbers": [...]}` at once.
+
+        Reports which were `acknowledged` by this request, which were
+        `already_acknowledged` and which were `not_found`.
+        """
+        po_numbers = request.data.get('po_numbers') if isinstance(request.data, dict) else None
+        limit = settings.VMS_ACKNOWLEDGEMENT_BATCH_LIMIT
+        if (
+            not isinstance(po_numbers, list)
+            or not po_numbers
+            or not all(isinstance(po_number, str) for po_number in po_numbers)
+        ):
+            return Response(
+                dict(message='po_numbers must be a non-empty list of purchase order numbers'),
+                status=HTTP_400_BAD_REQUEST,
+            )
+        if len(po_numbers) > limit:
+            return Response(
+                dict(message=f'At most {limit} purchase orders can be acknowledged at once'),
+                status=HTTP_400_BAD_REQUEST,
+            )
+
+        acknowledged, already_acknowledged, not_found = acknowledge_purchase_orders(po_numbers)
+        return Response(
+            dict(
+                acknowledged=acknowledged,
+                already_acknowledged=already_acknowledged,
+                not_found=not_found,
+            ),
+            status=HTTP_200_OK,
+        )
+
+
+class ChangeFeedViewSet(GenericViewSet):
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request, *args, **kwargs):
+        """
+        Vendors, purchase orders and performance snapshots changed after the
+        sequence number `?since=` (default 0), `?limit=` (default 100) log
+        entries at a time, optionally only of `?kinds=vendor,purchase_order`.
+        Ask again from `next` for further changes, see `VendorInfo.changes`.
+        """
+        try:
+            since, limit, kinds = parse_change_query(request.query_params)
+        except ValueError as error:
+            return Response(
+                dict(message=str(error)),
+                status=HTTP_400_BAD_REQUEST,
+            )
+        return Response(
+            changes.changes_since(since, limit, kinds),
+            status=HTTP_200_OK,
+        )
+
+
+class ExportViewSet(GenericViewSet):
+    permission_classes = [IsAuthenticated]
+
+    def export(self, request, filename, columns, rows):
+        """
+        Stream `rows` as `?output=csv` (the default) or `?output=ndjson`.
+
+        `format` is not used for this because DRF reserves it for content
+        negotiation.
+        """
+        output = request.query_params.get('output', 'csv')
+        if output not in exports.FORMATS:
+            return Response(
+                dict(message=f'output must be one of {", ".join(exports.FORMATS)}'),
+                status=HTTP_400_BAD_REQUEST,
+            )
+        stream, content_type = exports.FORMATS[output]
+        response = StreamingHttpResponse(stream(columns, rows), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}.{output}"'
+        return response
+
+    def date_range(self, request):
+        return (
+            parse_query_datetime(request.query_params.get('from')),
+            parse_query_datetime(request.query_params.get('to')),
+        )
+
+    @action(methods=['get'], detail=False, url_path='purchase-orders')
+    def purchase_orders(self, request, *args, **kwargs):
+        """
+        Purchase orders, optionally filtered by `?vendor=<code>`, `?status=`
+        and an ISO `?from=`/`?to=` range of the order date.
+        """
+        status = request.query_params.get('status')
+        if status and status not in PurchaseOrder.PoStatus.values:
+            return Response(
+                dict(message=f'status must be one of {", ".join(PurchaseOrder.PoStatus.values)}'),
+                status=HTTP_400_BAD_REQUEST,
+            )
+        try:
+            start, end = self.date_range(request)
+        except ValueError:
+            return Response(
+                dict(message='from and to must be ISO 8601 dates or datetimes'),
+                status=HTTP_400_BAD_REQUEST,
+            )
+        rows = exports.purchase_order_rows(request.query_params.get('vendor'), status, start, end)
+        return self.export(request, 'purchase-orders', exports.PURCHASE_ORDER_COLUMNS, rows)
+
+    @action(methods=['get'], detail=False, url_path='historical-performance')
+    def historical_performance(self, request, *args, **kwargs):
+        """
+        Performance snapshots, optionally filtered by `?vendor=<code>` and an
+        ISO `?from=`/`?to=` range of the snapshot date.
+        """
+        try:
+            start, end = self.date_range(request)
+        except ValueError:
+            return Response(
+                dict(message='from and to must be ISO 8601 dates or datetimes'),
+                status=HTTP_400_BAD_REQUEST,
+            )
+        rows = exports.historical_performance_rows(request.query_params.get('vendor'), start, end)
+        return self.export(
+            request, 'historical-performance', exports.HISTORICAL_PERFORMANCE_COLUMNS, rows,
+        )
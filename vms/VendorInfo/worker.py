@@ -0,0 +1,166 @@
+"""
+Background refresh of vendor metrics and performance history.
+
+Purchase order writes only adjust the aggregate counters and leave a
+`MetricRefreshRequest` in the outbox. The worker picks up requests once they
+are `VMS_METRIC_REFRESH_WINDOW` seconds old, so every write to a vendor within
+the window is covered by one refresh, derives the `Vendor` metrics from the
+aggregates, the delivery risk features (see `VendorInfo.risk`) and records a
+`HistoricalPerformance` snapshot.
+
+`VMS_METRIC_REFRESH_MODE` selects who processes the outbox:
+
+- `thread`: a daemon thread of the serving process, started with the first
+  request or write.
+- `sync`: the writing thread, as soon as the transaction commits.
+- `manual`: only the `process_metric_refreshes` management command.
+
+Requests survive restarts in the database and are picked up by the next
+worker that runs. A request whose refresh failed
+`VMS_METRIC_REFRESH_MAX_ATTEMPTS` times is left in the outbox for
+inspection and only retried after `retry_failed_metric_refreshes`.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Min
+from django.utils import timezone
+
+from .metrics import METRIC_FIELDS, refresh_vendor_metrics
+from .models import HistoricalPerformance, MetricRefreshRequest, Vendor
+from .risk import refresh_risk_features
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_metric_refresh(vendor_ids):
+    """Request a refresh of the vendors, in the transaction of the write."""
+    vendor_ids = set(vendor_ids)
+    if not vendor_ids:
+        return
+    now = timezone.now()
+    # Conflicts mean a refresh is already pending, it keeps its earlier timestamp.
+    MetricRefreshRequest.objects.bulk_create(
+        [
+            MetricRefreshRequest(vendor_id=vendor_id, requested_at=now)
+            for vendor_id in vendor_ids
+        ],
+        ignore_conflicts=True,
+    )
+
+    mode = settings.VMS_METRIC_REFRESH_MODE
+    if mode == 'sync':
+        transaction.on_commit(lambda: process_metric_refreshes(vendor_ids, window=0))
+    elif mode == 'thread':
+        transaction.on_commit(metric_refresh_worker.wake)
+
+
+def snapshot_vendor_performance(vendor_id):
+    performance = Vendor.objects.filter(pk=vendor_id).values(*METRIC_FIELDS).first()
+    if performance and any(performance.values()):
+        HistoricalPerformance.objects.create(
+            vendor_id=vendor_id,
+            date=timezone.now(),
+            **performance,
+        )
+
+
+def process_metric_refreshes(vendor_ids=None, window=None):
+    """
+    Process the pending requests that are at least `window` seconds old.
+
+    Returns the number of seconds until the next pending request is due, or
+    `None` if the outbox is empty.
+    """
+    if window is None:
+        window = settings.VMS_METRIC_REFRESH_WINDOW
+    pending = MetricRefreshRequest.objects.filter(attempts__lt=settings.VMS_METRIC_REFRESH_MAX_ATTEMPTS)
+    if vendor_ids is not None:
+        pending = pending.filter(vendor_id__in=vendor_ids)
+
+    due = pending.filter(requested_at__lte=timezone.now() - timedelta(seconds=window))
+    for request in due.order_by('requested_at'):
+        try:
+            with transaction.atomic():
+                # Claiming the request by deleting it means a write committed
+                # after this point leaves a new request for the next round.
+                claimed, _ = MetricRefreshRequest.objects.filter(
+                    pk=request.pk,
+                    requested_at=request.requested_at,
+                ).delete()
+                if not claimed:
+                    continue
+                refresh_vendor_metrics([request.vendor_id])
+                refresh_risk_features([request.vendor_id])
+                snapshot_vendor_performance(request.vendor_id)
+        except Exception:
+            logger.exception('Refreshing the metrics of vendor %s failed', request.vendor_id)
+            # Retry after another window instead of spinning on the same request.
+            MetricRefreshRequest.objects.filter(pk=request.pk).update(
+                requested_at=timezone.now(),
+                attempts=F('attempts') + 1,
+            )
+            if request.attempts + 1 >= settings.VMS_METRIC_REFRESH_MAX_ATTEMPTS:
+                logger.error(
+                    'Giving up refreshing the metrics of vendor %s after %s attempts',
+                    request.vendor_id,
+                    request.attempts + 1,
+                )
+
+    earliest = pending.aggregate(earliest=Min('requested_at'))['earliest']
+    if earliest is None:
+        return None
+    due_at = earliest + timedelta(seconds=window)
+    return max((due_at - timezone.now()).total_seconds(), 0)
+
+
+def retry_failed_metric_refreshes(vendor_ids=None):
+    """Reset the attempts of the requests given up on, returns their number."""
+    failed = MetricRefreshRequest.objects.filter(attempts__gte=settings.VMS_METRIC_REFRESH_MAX_ATTEMPTS)
+    if vendor_ids is not None:
+        failed = failed.filter(vendor_id__in=vendor_ids)
+    return failed.update(attempts=0)
+
+
+class MetricRefreshWorker:
+    """Daemon thread draining the outbox, woken up by new requests."""
+
+    def __init__(self):
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run,
+                name='vms-metric-refresh',
+                daemon=True,
+            )
+            self._thread.start()
+
+    def wake(self):
+        self.start()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                delay = process_metric_refreshes()
+            except Exception:
+                logger.exception('Processing metric refresh requests failed')
+                delay = settings.VMS_METRIC_REFRESH_WINDOW
+            finally:
+                close_old_connections()
+            self._wake.wait(None if delay is None else max(delay, 0.05))
+
+
+metric_refresh_worker = MetricRefreshWorker()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'VendorInfo.instrumentation.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,13 +56,17 @@ MIDDLEWARE = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.BasicAuthentication',
+        'VendorInfo.authentication.CachedBasicAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.TokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES':(
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'VendorInfo.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 
 }
 
@@ -88,10 +94,60 @@ WSGI_APPLICATION = 'vms.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
+# `VMS_DATABASE` selects the backend: 'sqlite' (the default) for single-node
+# deployments, or 'postgresql' (needs psycopg) configured by `VMS_DB_*` variables.
+
+VMS_DATABASE = os.environ.get('VMS_DATABASE', 'sqlite')
+
+if VMS_DATABASE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('VMS_DB_NAME', 'vms'),
+            'USER': os.environ.get('VMS_DB_USER', 'vms'),
+            'PASSWORD': os.environ.get('VMS_DB_PASSWORD', ''),
+            'HOST': os.environ.get('VMS_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('VMS_DB_PORT', '5432'),
+            # Connections are reused across requests for this many seconds,
+            # and checked before being reused.
+            'CONN_MAX_AGE': int(os.environ.get('VMS_DB_CONN_MAX_AGE', '600')),
+            'CONN_HEALTH_CHECKS': True,
+            # Behind a transaction pooler like PgBouncer (`VMS_DB_POOLER=pgbouncer`)
+            # consecutive transactions may run on different server connections,
+            # which server-side cursors do not survive.
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('VMS_DB_POOLER') == 'pgbouncer',
+            'OPTIONS': {
+                'connect_timeout': int(os.environ.get('VMS_DB_CONNECT_TIMEOUT', '5')),
+            },
+        }
+    }
+elif VMS_DATABASE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('VMS_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # Seconds a write waits for the write lock before failing with "database is locked".
+                'timeout': int(os.environ.get('VMS_DB_BUSY_TIMEOUT', '20')),
+            },
+            # Tests use a file: the tables of SQLite's shared in-memory database are
+            # locked per connection, failing concurrent writers instead of queueing them.
+            'TEST': {
+                'NAME': os.environ.get('VMS_TEST_DB_NAME', BASE_DIR / 'test_db.sqlite3'),
+            },
+        }
+    }
+else:
+    raise ValueError(f'Unknown VMS_DATABASE: {VMS_DATABASE}')
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'vms',
     }
 }
 
@@ -136,3 +192,101 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Vendor management
+
+# Number of rows per INSERT statement when purchase orders are created in bulk.
+VMS_BULK_CREATE_BATCH_SIZE = 500
+
+# Most purchase orders acknowledged by one bulk acknowledgement request.
+VMS_ACKNOWLEDGEMENT_BATCH_LIMIT = 1000
+
+# Most vendors compared by one performance comparison request.
+VMS_COMPARISON_LIMIT = 500
+
+# Engine generating vendor codes and purchase order numbers, see `VendorInfo.identifiers`.
+VMS_IDENTIFIER_ENGINE = 'VendorInfo.identifiers.SequenceIdentifierEngine'
+
+# Number of sequence values a process reserves at once with the sequence engine.
+VMS_IDENTIFIER_BLOCK_SIZE = 1000
+
+# Cache (from `CACHES`) holding vendor responses, see `VendorInfo.cache`. It must be shared
+# by every process (Redis, Memcached, database or file based) for writes to invalidate it.
+VMS_CACHE_ALIAS = 'default'
+
+# Whether vendor responses are cached: `None` only if `VMS_CACHE_ALIAS` is a shared cache,
+# `True` with any cache (e.g. a single process, the check VendorInfo.W001 warns), `False` never.
+VMS_RESPONSE_CACHE = True
+
+# Seconds a cached vendor response is kept, invalidation does not depend on it.
+VMS_RESPONSE_CACHE_TIMEOUT = 300
+
+# Whether verified API credentials are cached, see `VendorInfo.authentication`: `None` only
+# if `VMS_CACHE_ALIAS` is a shared cache, `True` with any cache (e.g. a single process), `False` never.
+VMS_AUTH_CACHE = None
+
+# Seconds verified API credentials are cached.
+VMS_AUTH_CACHE_TIMEOUT = 60
+
+# Who processes vendor metric refreshes: 'thread', 'sync' or 'manual', see `VendorInfo.worker`.
+VMS_METRIC_REFRESH_MODE = 'thread'
+
+# Seconds writes to the same vendor are coalesced into one metric refresh.
+VMS_METRIC_REFRESH_WINDOW = 2.0
+
+# Failed refreshes of a vendor after which its request is left in the outbox for inspection.
+VMS_METRIC_REFRESH_MAX_ATTEMPTS = 5
+
+# Rows fetched from the database per round-trip by the streaming exports.
+VMS_EXPORT_CHUNK_SIZE = 2000
+
+# Serve vendor and purchase order reads from `values()` rows, see `VendorInfo.fastpath`.
+VMS_FAST_READS = True
+
+# Log vendor, purchase order and performance snapshot writes for the change feed, see `VendorInfo.changes`.
+VMS_CHANGE_LOG = True
+
+# Seconds change log entries are held back from the change feed, so that those of concurrent
+# transactions are committed first, see `VendorInfo.changes`. SQLite serializes writes.
+VMS_CHANGE_SETTLE_SECONDS = 0 if VMS_DATABASE == 'sqlite' else 5
+
+# Seconds between reads of the change log by the server-sent change stream.
+VMS_CHANGE_STREAM_POLL_INTERVAL = 1.0
+
+# Seconds a server-sent change stream stays open, clients reconnect with `Last-Event-ID`.
+VMS_CHANGE_STREAM_TIMEOUT = 300
+
+# `(days, granularity)` tiers of performance snapshot retention: snapshots older than
+# `days` are compacted into one per 'day', 'week' or 'month', see `VendorInfo.retention`.
+VMS_HISTORY_RETENTION = ((30, 'day'), (365, 'month'))
+
+# Directory of the gzipped NDJSON archives of compacted performance snapshots.
+VMS_HISTORY_ARCHIVE_DIR = BASE_DIR / 'archive'
+
+# Store purchase order items as line items searchable by SKU, see `VendorInfo.line_items`.
+VMS_LINE_ITEMS = True
+
+# PRAGMAs set on every SQLite connection, see `VendorInfo.signals`. WAL lets reads
+# run alongside the writer, and with it `synchronous=NORMAL` only syncs at
+# checkpoints: a power loss can lose the last commits but not corrupt the database.
+# `VMS_SQLITE_TUNED=0` keeps SQLite's defaults.
+VMS_SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 2 ** 20,
+    'cache_size': -64 * 2 ** 10,
+    'temp_store': 'memory',
+} if os.environ.get('VMS_SQLITE_TUNED', '1') == '1' else {}
+
+# Bearer token the scraper of /internal/metrics sends, see `VendorInfo.instrumentation`.
+# Staff users logged in to a session are served the metrics as well.
+VMS_METRICS_TOKEN = os.environ.get('VMS_METRICS_TOKEN', '')
+
+# Share of requests run under cProfile, 0 disables profiling.
+VMS_PROFILE_SAMPLE_RATE = float(os.environ.get('VMS_PROFILE_SAMPLE_RATE', '0'))
+
+# Profiled requests slower than this many milliseconds are dumped to `VMS_PROFILE_DIR`.
+VMS_PROFILE_THRESHOLD_MS = 500
+
+VMS_PROFILE_DIR = BASE_DIR / 'profiles'
@@ -18,7 +18,10 @@ from django.contrib import admin
 from django.urls import path
 from django.urls.conf import include
 
+from VendorInfo.instrumentation import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/vendors/', include('VendorInfo.urls')),
+    path('internal/metrics', metrics_view, name='metrics'),
 ]